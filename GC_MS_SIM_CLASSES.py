@@ -178,29 +178,8 @@ class GCMSSimulation(ParametersInterface):
     def get_particle_count(self):
         return self.sliders['count'].value
 
-    def get_solvent_rf(self):
-        return self.sliders['solvent'].value
-
-    def get_nonpolar1_rf(self):
-        return self.sliders['nonpolar1'].value
-
-    def get_nonpolar2_rf(self):
-        return self.sliders['nonpolar2'].value
-
-    def get_semipolar1_rf(self):
-        return self.sliders['semipolar1'].value
-
-    def get_semipolar2_rf(self):
-        return self.sliders['semipolar2'].value
-
-    def get_polar1_rf(self):
-        return self.sliders['polar1'].value
-
-    def get_polar2_rf(self):
-        return self.sliders['polar2'].value
-
-    def get_verypolar_rf(self):
-        return self.sliders['verypolar'].value
+    def get_retention_factor(self, analyte):
+        return self.sliders[analyte].value
 
     def get_column_length(self):
         return self.sliders['column_length'].value
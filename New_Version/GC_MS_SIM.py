@@ -28,7 +28,7 @@ class DebugController:
         }
 
     def apply_settings(self, settings):
-        """Apply debug settings to simulation"""
+        """Queue debug settings for the simulation loop to apply between ticks"""
         self.settings.update(settings)
 
         if self.simulation:
@@ -36,13 +36,17 @@ class DebugController:
             speed_factor = settings["speed"] / 5.0  # normalize to base speed of 5
 
             # Modify simulation parameters
+            commands = self.simulation.commands
             if 'start_temp' in self.simulation.sliders:
-                self.simulation.sliders['start_temp'].value = settings["temperature"]
+                commands.put('set_slider', 'start_temp', settings["temperature"])
 
             # Adjust separation efficiency by modifying relevant parameters
             efficiency_factor = settings["efficiency"] / 50.0  # normalize to base efficiency of 50
-            if hasattr(self.simulation, 'gc_params'):
-                self.simulation.gc_params.default_delta_H *= efficiency_factor
+            commands.put('scale_param', 'default_delta_H', efficiency_factor)
+
+    def current_parameters(self):
+        """Parameters of the last completed tick, or None before the first one"""
+        return self.simulation.snapshot if self.simulation else None
 
 def create_debug_controls(simulation):
     """Create debug control window"""
@@ -111,7 +115,10 @@ def run_simulation(debug_mode=False):
         # Add stop button
         def stop_simulation():
             if global_simulation:
-                pygame.quit()
+                # The loop quits pygame on its own thread once it sees the command;
+                # give it the chance before Tk exits and takes the daemon thread down
+                global_simulation.commands.put('quit')
+                sim_thread.join(timeout=5.0)
                 root.quit()
 
         ttk.Button(main_window, text="Stop Simulation", command=stop_simulation).pack(pady=10)
@@ -1,12 +1,70 @@
 # gc_simulation.py
+import os
+import tempfile
+import time
 import pygame
-import math
-import random
 from gc_ui import *
-from gc_core import GCParameters, ParticleManager
+from gc_commands import CommandQueue, TickSnapshot
+from gc_engine import SimulationEngine
+from gc_preview import PreviewWorker
+from gc_recorder import Recording, RunRecorder
+from gc_detector import FID
+from gc_signal import SignalGenerator
+from gc_vandeemter import VanDeemterTable
+
+MAX_RF_SLIDERS = 8  # Further analytes keep the RF from the registry
+SPEEDS = ((1, "1x"), (10, "10x"), (100, "100x"), (None, "Max"))  # Steps per frame
+TARGET_FRAME_TIME = 1 / 60
+
+
+class StepPacer:
+    """Physics steps per rendered frame for the chosen time acceleration
+
+    Keeps running averages of the cost of one step and of the rest of a frame
+    (events, drawing) and only allows as many steps as fit in the target frame
+    time, so high speeds degrade to the fastest rate that still renders smoothly.
+    """
+
+    def __init__(self, target_frame_time=TARGET_FRAME_TIME, smoothing=0.2):
+        self.target_frame_time = target_frame_time
+        self.smoothing = smoothing
+        self.speed_index = 0
+        self.step_time = None
+        self.overhead = 0.0
+        self.last_steps = 1
+
+    @property
+    def text(self):
+        """Button caption; shows the steps actually taken when the budget caps them"""
+        speed, label = SPEEDS[self.speed_index]
+        if speed is not None and self.last_steps >= speed:
+            return f"Speed {label}"
+        return f"{label} ({self.last_steps}x)"
+
+    def cycle(self):
+        self.speed_index = (self.speed_index + 1) % len(SPEEDS)
+
+    def steps(self):
+        """Steps to take this frame: the requested speed, capped by the time budget"""
+        speed = SPEEDS[self.speed_index][0]
+        if self.step_time is None:
+            cap = 1
+        else:
+            budget = max(self.target_frame_time - self.overhead, 0)
+            # Grow at most twofold per frame, so a stale estimate can't stall a frame
+            cap = min(max(1, int(budget / self.step_time)), 2 * self.last_steps)
+        self.last_steps = cap if speed is None else min(speed, cap)
+        return self.last_steps
+
+    def measure(self, steps, step_seconds, frame_seconds):
+        """Fold one frame's timings into the averages"""
+        a = self.smoothing
+        per_step = step_seconds / max(steps, 1)
+        self.step_time = per_step if self.step_time is None else (1 - a) * self.step_time + a * per_step
+        self.overhead = (1 - a) * self.overhead + a * max(frame_seconds - step_seconds, 0)
 
 
-class GCMSSimulation:
+class GCMSSimulation(SimulationEngine):
     """Main simulation class for GC/MS"""
 
     def __init__(self):
@@ -18,48 +76,43 @@ class GCMSSimulation:
         self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
         pygame.display.set_caption("GCMS Simulation ALPHA 0.1")
 
-        # Initialize core components
-        self.gc_params = GCParameters()
-        self.particle_manager = ParticleManager(self.gc_params)
-
-        # Column parameters
-        self.BASE_COLUMN_START_X = 300
-        self.BASE_COLUMN_END_X = 800
-        self.column_start_x = self.BASE_COLUMN_START_X
-        self.column_end_x = self.BASE_COLUMN_END_X
-        self.column_y = 700  # Base Y position for column
+        # Initialize core components and simulation state
+        super().__init__()
 
         # Initialize UI components
         self.init_ui_components()
+        self.chromatogram_display = ChromatogramDisplay()
+        self.density_strip = DensityStrip()
+        self.font = pygame.font.SysFont(None, 24)
 
-        # Initialize simulation state
-        self.particles = []
-        self.chromatogram = []
-        self.detector_counts = {
-            'solvent': [], 'nonpolar1': [], 'nonpolar2': [], 'semipolar1': [],
-            'semipolar2': [], 'polar1': [], 'polar2': [], 'verypolar': []
-        }
+        # Analytic preview, recomputed off the render thread as sliders move
+        self.preview_worker = PreviewWorker()
+        self.preview_worker.start()
+        self.preview_key = None
 
-        # Simulation control
-        self.running = False
-        self.paused = False
-        self.simulation_time = 0
-        self.initial_hold_complete = False
-        self.final_hold_started = False
-        self.chromatogram_display = ChromatogramDisplay()
+        # Run recording for the timeline scrubber
+        self.recorder = RunRecorder(os.path.join(tempfile.gettempdir(), 'gc_sim_recording'))
+        self.recording = None
+        self.shown_frame = None
+
+        # Sampled FID trace with bleed, drift and noise, shown by the Baseline toggle
+        self.detector = FID(self.registry, rate=10.0, signal=SignalGenerator())
+
+        # Other threads talk to the loop only through commands and snapshots
+        self.commands = CommandQueue()
+        self.snapshot = None
+        self.tick = 0
+        self.quit_requested = False
 
     def init_ui_components(self):
         """Initialize all UI components"""
         self.sliders = {
-            'count': Slider(50, 50, 200, 20, 100, 1000, 500, "Particle Count"),
-            'solvent': Slider(50, 100, 200, 20, 0.05, 1.0, .1, "Solvent RF"),
-            'nonpolar1': Slider(50, 150, 200, 20, 0.1, 1.0, .5, "Nonpolar 1 RF"),
-            'nonpolar2': Slider(50, 200, 200, 20, .2, 1.2, .7, "Nonpolar 2 RF"),
-            'semipolar1': Slider(50, 250, 200, 20, 1.0, 2, 1.2, "Semipolar 1 RF"),
-            'semipolar2': Slider(50, 300, 200, 20, 1.5, 3.5, 2.5, "Semipolar 2 RF"),
-            'polar1': Slider(50, 350, 200, 20, 2.0, 4.0, 2.8, "Polar 1 RF"),
-            'polar2': Slider(50, 400, 200, 20, 2.0, 4.0, 3.2, "Polar 2 RF"),
-            'verypolar': Slider(50, 450, 200, 20, 2.5, 5.0, 3.5, "Very Polar RF"),
+            'count': Slider(50, 50, 200, 20, 1000, 50000, 25000, "Sample Load"),
+        }
+        rf_sliders = self.rf_sliders()
+        self.rf_names = list(rf_sliders)
+        self.sliders.update(rf_sliders)
+        self.sliders.update({
             'column_length': Slider(50, 500, 200, 20, 0.1, 1.25, 1.0, "Column Length"),
             'start_temp': Slider(300, 50, 200, 20, 50, 300, 60, "Start Temp (°C)"),
             'end_temp': Slider(300, 100, 200, 20, 50, 300, 280, "End Temp (°C)"),
@@ -68,136 +121,179 @@ class GCMSSimulation:
             'split_ratio': Slider(300, 250, 200, 20, 1, 100, 50, "Split Ratio"),
             'initial_hold': Slider(300, 300, 200, 20, 0, 5, 1, "Initial Hold (min)"),
             'final_hold': Slider(300, 350, 200, 20, 0, 5, 1, "Final Hold (min)")
-        }
+        })
 
         # Create buttons
         self.inject_button = Button(50, 550, 100, 40, "Inject")
         self.pause_button = Button(160, 550, 100, 40, "Pause")
         self.reset_button = Button(270, 550, 100, 40, "Reset")
         self.uniform_toggle = ToggleButton(380, 550, 100, 40, "Uniform", False)
-
-    def inject_particles(self):
-        """Initialize particle injection"""
-        # Calculate base parameters
-        base_velocity, diffusion_base = self.gc_params.calculate_flow_parameters(
-            self.sliders['carrier_pressure'].value,
-            'He',  # Default to Helium
-            self.sliders['column_length'].value
-        )
-
-        # Get temperature factors
-        temp_factor = self.calculate_temp_factor()[0]
-
-        # Calculate injection band width
-        injection_width = 20 / self.sliders['split_ratio'].value
-
-        self.particles = []
-        count = int(self.sliders['count'].value)
-        particle_types = list(self.detector_counts.keys())
-
-        if self.uniform_toggle.state:
-            # Uniform distribution
-            per_type = count // len(particle_types)
-            remainder = count % len(particle_types)
-            for p_type in particle_types:
-                type_count = per_type + (1 if remainder > 0 else 0)
-                remainder -= 1
-
-                particles = self.particle_manager.create_particle_group(
-                    type_count, p_type, self.column_start_x, self.column_y,
-                    injection_width, base_velocity, diffusion_base,
-                    self.sliders[p_type].value, temp_factor
-                )
-                self.particles.extend(particles)
+        self.flow_toggle = ToggleButton(490, 550, 100, 40, "Const P", False)
+        self.weighted_toggle = ToggleButton(600, 550, 100, 40, "Weighted", False)
+        self.log_toggle = ToggleButton(710, 550, 100, 40, "Log", False)
+        self.continuum_toggle = ToggleButton(820, 550, 100, 40, "Continuum", False)
+        self.dots_toggle = ToggleButton(930, 550, 100, 40, "Dots", True)
+        self.record_toggle = ToggleButton(1040, 550, 100, 40, "Record", False)
+        self.speed_button = Button(1150, 550, 110, 40, "Speed 1x")
+        self.pacer = StepPacer()
+        self.gas_button = Button(1270, 550, 100, 40, "Gas He")
+        self.overload_toggle = ToggleButton(1380, 550, 100, 40, "Overload", False)
+        self.baseline_toggle = ToggleButton(1490, 550, 100, 40, "Baseline", False)
+        self.timeline = Slider(50, 800, 750, 20, 0, 1, 0, "Timeline (s)")
+
+    def rf_sliders(self):
+        """One RF slider per registered analyte, as many as fit the panel"""
+        # Thermodynamic analytes take their RF from delta_H and delta_S instead
+        tunable = [analyte for analyte in self.registry if analyte.delta_S is None]
+        sliders = {}
+        for i, analyte in enumerate(tunable[:MAX_RF_SLIDERS]):
+            low, high = analyte.rf_range
+            sliders[analyte.name] = Slider(50, 100 + 50 * i, 200, 20, low, high,
+                                           analyte.rf, analyte.label)
+        return sliders
+
+    def rebuild_rf_sliders(self):
+        """Replace the RF sliders if the registry now holds different analytes"""
+        rf_sliders = self.rf_sliders()
+        if list(rf_sliders) == self.rf_names:
+            return
+        others = {name: slider for name, slider in self.sliders.items()
+                  if name not in self.rf_names}
+        self.sliders = {'count': others.pop('count'), **rf_sliders, **others}
+        self.rf_names = list(rf_sliders)
+
+    def read_settings(self):
+        """Copy the current slider positions into the engine settings"""
+        # RF sliders left over from an earlier registry must not become overrides
+        self.settings.update({name: slider.value for name, slider in self.sliders.items()
+                              if name not in self.rf_names or name in self.registry.codes})
+        self.uniform = self.uniform_toggle.state
+        self.flow_mode = 'constant_pressure' if self.flow_toggle.state else 'constant_flow'
+        self.weighted = self.weighted_toggle.state
+        self.solver = 'continuum' if self.continuum_toggle.state else 'particles'
+        if not self.overload_toggle.state:
+            self.isotherm = 'linear'
+        elif self.isotherm == 'linear':
+            self.isotherm = 'langmuir'  # A method may have chosen anti_langmuir
+
+    def apply_command(self, action, *args):
+        """Carry out one queued command on the simulation thread"""
+        if action == 'set_slider':
+            name, value = args
+            slider = self.sliders[name]
+            slider.value = min(max(value, slider.min_val), slider.max_val)
+            slider.update_handle()
+        elif action == 'set_param':
+            name, value = args
+            setattr(self.gc_params, name, value)
+        elif action == 'scale_param':
+            name, factor = args
+            setattr(self.gc_params, name, getattr(self.gc_params, name) * factor)
+        elif action == 'quit':
+            self.quit_requested = True
         else:
-            # Random distribution
-            for _ in range(count):
-                p_type = random.choice(particle_types)
-                particles = self.particle_manager.create_particle_group(
-                    1, p_type, self.column_start_x, self.column_y,
-                    injection_width, base_velocity, diffusion_base,
-                    self.sliders[p_type].value, temp_factor
-                )
-                self.particles.extend(particles)
-
-        # Reset simulation parameters
-        self.reset_simulation_parameters()
-
-    def reset_simulation_parameters(self):
-        """Reset all simulation parameters"""
-        self.chromatogram = []
-        self.detector_counts = {k: [] for k in self.detector_counts.keys()}
-        self.running = True
-        self.paused = False
-        self.simulation_time = 0
-        self.initial_hold_complete = False
-        self.final_hold_started = False
-
-    def calculate_temp_factor(self):
-        """Calculate temperature factor and current temperature"""
-        current_temp, initial_complete, final_started = self.gc_params.calculate_temp_program(
-            self.simulation_time,
-            self.sliders['start_temp'].value,
-            self.sliders['end_temp'].value,
-            self.sliders['ramp_rate'].value,
-            self.sliders['initial_hold'].value,
-            self.sliders['final_hold'].value
-        )
-
-        temp_factor = self.gc_params.calculate_van_t_hoff(
-            current_temp,
-            self.sliders['start_temp'].value
-        )
-
-        return temp_factor, current_temp
-
-    def update(self, dt):
-        """Update simulation state"""
-        # Update column dimensions based on length
-        length_factor = self.sliders['column_length'].value
-        self.column_start_x = int(self.BASE_COLUMN_START_X * length_factor)
-        self.column_end_x = int(self.BASE_COLUMN_END_X * length_factor)
+            raise ValueError(f"Unknown command '{action}'")
+
+    def publish_snapshot(self):
+        """Expose the parameters this tick ran with to other threads"""
+        self.tick += 1
+        program = self.temperature_program
+        temperature = (program.temperature(self.simulation_time) if program
+                       else self.settings['start_temp'])
+        self.snapshot = TickSnapshot(self.tick, self.simulation_time, temperature,
+                                     self.settings, self.gc_params)
+
+    def sync_controls(self):
+        """Move sliders and toggles to the engine's current settings and registry"""
+        self.rebuild_rf_sliders()
+        rf = self.registry.retention_factors(self.settings)
+        for name, slider in self.sliders.items():
+            if name in self.rf_names:
+                slider.value = rf[self.registry.code(name)]
+            else:
+                slider.value = self.settings[name]
+            slider.update_handle()
+        self.uniform_toggle.state = self.uniform
+        self.flow_toggle.state = self.flow_mode == 'constant_pressure'
+        self.weighted_toggle.state = self.weighted
+        self.continuum_toggle.state = self.solver == 'continuum'
+        self.overload_toggle.state = self.isotherm != 'linear'
+        self.gas_button.text = f"Gas {self.carrier_gas}"
+
+    def cycle_carrier_gas(self):
+        """Switch to the next carrier gas in GCParameters.carrier_gases"""
+        gases = list(self.gc_params.carrier_gases)
+        self.carrier_gas = gases[(gases.index(self.carrier_gas) + 1) % len(gases)]
+        self.gas_button.text = f"Gas {self.carrier_gas}"
 
-        if not self.running or self.paused:
+    def inject_particles(self):
+        """Initialize particle injection from the current slider positions"""
+        self.read_settings()
+        super().inject_particles()
+        self.detector = FID(self.registry, rate=self.detector.rate,
+                            time_constant=self.detector.time_constant, signal=self.detector.signal)
+        self.recorder.close()
+        self.recording = None
+        if self.record_toggle.state and self.continuum is None:
+            self.recorder.start(self)
+            self.recording = Recording(self.recorder.path)
+
+    def clear(self):
+        """Remove all particles and start over"""
+        super().clear()
+        self.detector.start()
+
+    def scrub(self):
+        """While the timeline is dragged, pause and show the snapshot under the handle
+
+        Scrubbing rewinds the engine itself, so un-pausing resumes from that
+        snapshot; recording stops, since the run no longer follows the file.
+        """
+        if self.recording is None:
             return
-
-        self.simulation_time += dt
-        temp_factor, current_temp = self.calculate_temp_factor()
-
-        # Update particles
-        for particle in self.particles:
-            if not particle.detected:
-                particle.move(dt, temp_factor, current_temp, self.column_y)
-                if (self.column_end_x <= particle.x <= self.column_end_x + DETECTOR_WIDTH and
-                        not particle.detected):
-                    particle.detected = True
-                    self.detector_counts[particle.particle_type].append(particle.time)
-
-        self.update_chromatogram()
-
-    def update_chromatogram(self):
-        """Update chromatogram data"""
-        if not self.running:
+        self.recorder.close()
+        self.recording.refresh()
+        i = self.recording.seek(self.timeline.value)
+        if i != self.shown_frame:
+            self.recording.restore(self, i)
+            self.shown_frame = i
+            # Re-acquire the restored event log; the noise sequence replays identically
+            self.detector.start()
+            self.detector.acquire(self.detections, self.simulation_time, self.temperature_program)
+            self.sync_controls()
+        self.paused = True
+
+    def request_preview(self):
+        """Ask for a new predicted chromatogram if anything changed since the last one"""
+        run_config = self.run_config()
+        key = (tuple(sorted(self.settings.items())), repr(run_config))
+        if key != self.preview_key:
+            self.preview_key = key
+            self.preview_worker.request(self.settings, run_config)
+
+    def update(self, dt, steps=1):
+        """Update simulation state"""
+        if self.timeline.active:
+            self.scrub()
             return
-
-        current_time = max([p.time for p in self.particles]) if self.particles else 0
-        time_window = 1.0
-        max_time = current_time + 1
-        histogram = {t: 0 for t in range(int(max_time / time_window) + 1)}
-
-        for particle_type, times in self.detector_counts.items():
-            for t in times:
-                bin_index = int(t / time_window)
-                histogram[bin_index] = histogram.get(bin_index, 0) + 1
-
-        self.chromatogram = []
-        smoothing_window = 3
-        for t in sorted(histogram.keys()):
-            start_idx = max(0, t - smoothing_window)
-            end_idx = t + smoothing_window + 1
-            count = sum(histogram.get(i, 0) for i in range(start_idx, end_idx))
-            count = count / (end_idx - start_idx)
-            self.chromatogram.append((t * time_window, count))
+        self.read_settings()
+        self.request_preview()
+        super().update(dt, steps)
+        if self.running and not self.paused:
+            self.detector.acquire(self.detections, self.simulation_time, self.temperature_program)
+        if self.recording is not None:
+            if self.recorder.files is not None:
+                self.recording.refresh()
+            self.timeline.max_val = max(self.recording.duration, 1)
+            self.timeline.value = min(self.simulation_time, self.timeline.max_val)
+            self.timeline.update_handle()
+            self.shown_frame = None
+
+    def step(self, dt):
+        """One physics step; the recorder sees every step, not just rendered ones"""
+        advanced = super().step(dt)
+        self.recorder.record(self)
+        return advanced
 
     def draw(self):
         """Draw all simulation components"""
@@ -210,6 +306,25 @@ class GCMSSimulation:
         self.pause_button.draw(self.screen)
         self.reset_button.draw(self.screen)
         self.uniform_toggle.draw(self.screen)
+        self.flow_toggle.draw(self.screen)
+        self.weighted_toggle.draw(self.screen)
+        self.log_toggle.draw(self.screen)
+        self.continuum_toggle.draw(self.screen)
+        self.dots_toggle.draw(self.screen)
+        self.record_toggle.draw(self.screen)
+        self.speed_button.draw(self.screen)
+        self.gas_button.draw(self.screen)
+        self.overload_toggle.draw(self.screen)
+        self.baseline_toggle.draw(self.screen)
+        if self.recording is not None:
+            self.timeline.draw(self.screen)
+
+        # Van Deemter optimum for the selected gas, beside the carrier pressure slider
+        codes = [self.registry.code(name) for name in self.particle_types]
+        velocity, hetp = self.hetp_table().gas_optimum(codes)
+        optimum = self.font.render(f"Optimum: {VanDeemterTable.pressure(velocity[0]):.1f} psi "
+                                   f"(HETP {hetp[0]:.3f})", True, BLACK)
+        self.screen.blit(optimum, (520, 200))
 
         # Draw column
         pygame.draw.line(self.screen, BLACK,
@@ -221,14 +336,27 @@ class GCMSSimulation:
                          (self.column_end_x, self.column_y - DETECTOR_HEIGHT / 2,
                           DETECTOR_WIDTH, DETECTOR_HEIGHT))
 
-        # Draw particles
-        for particle in self.particles:
-            pygame.draw.circle(self.screen, particle.get_color(),
-                               (int(particle.x), int(particle.y)), 3)
+        # Draw the band occupancy strip, then the particles themselves if wanted
+        palette = [tuple(color) for color in self.registry.colors.tolist()]
+        bins = max(1, (self.column_end_x - self.column_start_x) // DENSITY_BIN_WIDTH)
+        self.density_strip.draw(self.screen, self.column_density(bins), palette,
+                                self.column_start_x, self.column_end_x, self.column_y)
+        if self.dots_toggle.state:
+            particles = self.particles
+            for x, y, code in zip(particles.x.astype(int).tolist(),
+                                  particles.y.astype(int).tolist(),
+                                  particles.type_code.tolist()):
+                pygame.draw.circle(self.screen, palette[code], (x, y), 3)
 
         # Draw chromatogram
-        self.chromatogram_display.draw(self.screen, self.chromatogram)
-        pygame.display.flip()
+        trace = self.chromatogram
+        if self.baseline_toggle.state:
+            times, values = self.detector.trace()
+            trace = list(zip(times.tolist(), values.tolist()))
+        self.chromatogram_display.draw(self.screen, trace, self.preview_worker.result,
+                                       self.log_toggle.state)
+        if self.screen is pygame.display.get_surface():  # Offscreen frame export skips the flip
+            pygame.display.flip()
 
     def run(self):
         """Main simulation loop"""
@@ -236,6 +364,11 @@ class GCMSSimulation:
         running = True
 
         while running:
+            # Commands only ever land between ticks
+            self.commands.drain(self.apply_command)
+            if self.quit_requested:
+                break
+
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
@@ -249,13 +382,35 @@ class GCMSSimulation:
                 elif self.pause_button.handle_event(event):
                     self.paused = not self.paused
                 elif self.reset_button.handle_event(event):
-                    self.particles = []
-                    self.reset_simulation_parameters()
+                    self.clear()
                 self.uniform_toggle.handle_event(event)
+                self.flow_toggle.handle_event(event)
+                self.weighted_toggle.handle_event(event)
+                self.log_toggle.handle_event(event)
+                self.continuum_toggle.handle_event(event)
+                self.overload_toggle.handle_event(event)
+                self.baseline_toggle.handle_event(event)
+                self.dots_toggle.handle_event(event)
+                self.record_toggle.handle_event(event)
+                if self.speed_button.handle_event(event):
+                    self.pacer.cycle()
+                if self.gas_button.handle_event(event):
+                    self.cycle_carrier_gas()
+                if self.recording is not None:
+                    self.timeline.handle_event(event)
 
             dt = 0.5
-            self.update(dt)
+            frame_start = time.perf_counter()
+            # Speed up only while there is something left to watch
+            steps = 1 if self.paused or self.is_complete() else self.pacer.steps()
+            self.update(dt, steps)
+            step_seconds = time.perf_counter() - frame_start
+            self.speed_button.text = self.pacer.text
             self.draw()
+            self.publish_snapshot()
+            self.pacer.measure(steps, step_seconds, time.perf_counter() - frame_start)
             clock.tick(60)
 
+        self.preview_worker.stop()
+        self.recorder.close()
         pygame.quit()
\ No newline at end of file
@@ -0,0 +1,200 @@
+# gc_analytes.py
+import colorsys
+import json
+import os
+import tomllib
+import numpy as np
+
+
+class Analyte:
+    """Properties of one compound in the sample
+
+    delta_H of None falls back to GCParameters.default_delta_H. Giving delta_S
+    as well makes the analyte thermodynamic: delta_H (J/mol) and delta_S
+    (J/mol·K) are the enthalpy and entropy released on sorption, its retention
+    factor is k(T) = exp(delta_H / (R T) - delta_S / R) and rf is not used, so
+    compounds can swap elution order as the oven heats. diffusivity is
+    relative to the carrier gas diffusion coefficient; spectrum is a list of
+    (m/z, relative intensity) pairs; rf_range bounds the GUI slider; abundance is
+    the relative amount in the sample, used by weighted (super-particle) runs.
+    """
+
+    def __init__(self, name, rf, delta_H=None, diffusivity=1.0, color=None,
+                 spectrum=(), label=None, rf_range=None, abundance=1.0, delta_S=None):
+        self.name = name
+        self.rf = rf
+        self.delta_H = delta_H
+        self.delta_S = delta_S
+        self.diffusivity = diffusivity
+        self.color = tuple(color) if color is not None else None
+        self.spectrum = [tuple(peak) for peak in spectrum]
+        self.label = label or name
+        self.rf_range = tuple(rf_range) if rf_range is not None else (rf * 0.5, rf * 2.0)
+        self.abundance = abundance
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['name'], data['rf'],
+            delta_H=data.get('delta_H'),
+            diffusivity=data.get('diffusivity', 1.0),
+            color=data.get('color'),
+            spectrum=data.get('spectrum', ()),
+            label=data.get('label'),
+            rf_range=data.get('rf_range'),
+            abundance=data.get('abundance', 1.0),
+            delta_S=data.get('delta_S'),
+        )
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'rf': self.rf,
+            'delta_H': self.delta_H,
+            'diffusivity': self.diffusivity,
+            'color': list(self.color) if self.color is not None else None,
+            'spectrum': [list(peak) for peak in self.spectrum],
+            'label': self.label,
+            'rf_range': list(self.rf_range),
+            'abundance': self.abundance,
+            'delta_S': self.delta_S,
+        }
+
+
+class AnalyteRegistry:
+    """Assigns each compound an integer type code and keeps its properties in arrays
+
+    The code is the analyte's index, so the engines, detector and renderer can
+    look properties up with a single fancy index (e.g. registry.rf[type_code])
+    no matter how many compounds the sample contains.
+    """
+
+    def __init__(self, analytes=()):
+        self.analytes = []
+        self.codes = {}
+        self._arrays = None
+        for analyte in analytes:
+            self.add(analyte)
+
+    def add(self, analyte):
+        """Register an Analyte and return its type code"""
+        if analyte.name in self.codes:
+            raise ValueError(f"Analyte '{analyte.name}' is already registered")
+        self.codes[analyte.name] = len(self.analytes)
+        self.analytes.append(analyte)
+        self._arrays = None
+        return self.codes[analyte.name]
+
+    def code(self, name):
+        return self.codes[name]
+
+    def __getitem__(self, name):
+        return self.analytes[self.codes[name]]
+
+    def __contains__(self, name):
+        return name in self.codes
+
+    def __iter__(self):
+        return iter(self.analytes)
+
+    def __len__(self):
+        return len(self.analytes)
+
+    @property
+    def names(self):
+        return [analyte.name for analyte in self.analytes]
+
+    def arrays(self):
+        """Per-code property arrays, rebuilt only after the registry changes"""
+        if self._arrays is None:
+            colors = [analyte.color or default_color(code)
+                      for code, analyte in enumerate(self.analytes)]
+            self._arrays = {
+                'rf': np.array([a.rf for a in self.analytes], dtype=float),
+                'delta_H': np.array([np.nan if a.delta_H is None else a.delta_H
+                                     for a in self.analytes], dtype=float),
+                'delta_S': np.array([np.nan if a.delta_S is None else a.delta_S
+                                     for a in self.analytes], dtype=float),
+                'diffusivity': np.array([a.diffusivity for a in self.analytes], dtype=float),
+                'abundance': np.array([a.abundance for a in self.analytes], dtype=float),
+                'colors': np.array(colors, dtype=np.uint8).reshape(-1, 3),
+            }
+        return self._arrays
+
+    @property
+    def rf(self):
+        return self.arrays()['rf']
+
+    @property
+    def delta_H(self):
+        return self.arrays()['delta_H']
+
+    @property
+    def delta_S(self):
+        return self.arrays()['delta_S']
+
+    @property
+    def thermodynamic(self):
+        """True for codes whose retention follows delta_H and delta_S"""
+        return ~np.isnan(self.delta_H) & ~np.isnan(self.delta_S)
+
+    @property
+    def diffusivity(self):
+        return self.arrays()['diffusivity']
+
+    @property
+    def abundance(self):
+        return self.arrays()['abundance']
+
+    @property
+    def colors(self):
+        return self.arrays()['colors']
+
+    def retention_factors(self, overrides):
+        """RF per code, with any entries of overrides keyed by analyte name applied"""
+        rf = self.rf.copy()
+        for name, value in overrides.items():
+            if name in self.codes:
+                rf[self.codes[name]] = value
+        return rf
+
+    def to_list(self):
+        return [analyte.to_dict() for analyte in self.analytes]
+
+    @classmethod
+    def from_list(cls, records):
+        return cls(Analyte.from_dict(record) for record in records)
+
+    @classmethod
+    def load(cls, path):
+        """Read {"analytes": [...]} from a .json or .toml file"""
+        if os.path.splitext(path)[1].lower() == '.toml':
+            with open(path, 'rb') as f:
+                return cls.from_list(tomllib.load(f)['analytes'])
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_list(json.load(f)['analytes'])
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'analytes': self.to_list()}, f, indent=2)
+
+
+def default_color(code):
+    """Well-spread color for analytes that do not define one (golden-ratio hues)"""
+    hue = (code * 0.618033988749895) % 1.0
+    r, g, b = colorsys.hsv_to_rgb(hue, 0.85, 0.9)
+    return int(r * 255), int(g * 255), int(b * 255)
+
+
+def default_registry():
+    """The eight teaching compounds the simulator has always shipped with"""
+    return AnalyteRegistry([
+        Analyte('solvent', 0.1, color=(255, 0, 0), label="Solvent RF", rf_range=(0.05, 1.0)),
+        Analyte('nonpolar1', 0.5, color=(0, 255, 0), label="Nonpolar 1 RF", rf_range=(0.1, 1.0)),
+        Analyte('nonpolar2', 0.7, color=(0, 0, 255), label="Nonpolar 2 RF", rf_range=(0.2, 1.2)),
+        Analyte('semipolar1', 1.2, color=(255, 255, 0), label="Semipolar 1 RF", rf_range=(1.0, 2.0)),
+        Analyte('semipolar2', 2.5, color=(255, 0, 255), label="Semipolar 2 RF", rf_range=(1.5, 3.5)),
+        Analyte('polar1', 2.8, color=(0, 255, 255), label="Polar 1 RF", rf_range=(2.0, 4.0)),
+        Analyte('polar2', 3.2, color=(128, 0, 0), label="Polar 2 RF", rf_range=(2.0, 4.0)),
+        Analyte('verypolar', 3.5, color=(0, 128, 0), label="Very Polar RF", rf_range=(2.5, 5.0)),
+    ])
@@ -0,0 +1,133 @@
+# gc_cache.py
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+from gc_engine import ENGINE_VERSION, SimulationResult
+
+
+def run_key(gc_params, settings, seed, **extra):
+    """Canonical hash of everything that determines a run's output"""
+    params = dict(vars(gc_params))
+    params['random_spread'] = gc_params.random_spread  # Instance value or class default
+    payload = {
+        'engine_version': ENGINE_VERSION,
+        'gc_params': params,
+        'settings': settings,
+        'seed': seed,
+        'extra': extra,
+    }
+    # sort_keys and repr-exact floats make the encoding independent of dict order
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Content-addressed on-disk store of finished runs with size-bounded LRU eviction
+
+    Each entry is one uncompressed .npz file named by its key. Writes go to a
+    temporary file that is atomically renamed into place, so concurrent worker
+    processes only ever see complete entries; file mtime doubles as the LRU clock.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def get(self, key):
+        """Return the cached SimulationResult for key, or None on a miss"""
+        path = self.path_for(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                result = self.decode(data)
+        except (FileNotFoundError, ValueError, OSError):
+            # Missing, evicted mid-read or truncated: all are misses
+            return None
+        try:
+            os.utime(path)  # Mark as recently used
+        except FileNotFoundError:
+            pass
+        return result
+
+    def put(self, key, result):
+        """Store a SimulationResult under key and evict down to max_bytes"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **self.encode(result))
+            os.replace(tmp_path, self.path_for(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.npz'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # Another worker evicted it first
+            total -= size
+
+    def encode(self, result):
+        """Flatten a SimulationResult into typed arrays; times and weights stay float64"""
+        return {
+            'chromatogram': np.asarray(result.chromatogram, dtype=np.float64).reshape(-1, 2),
+            'event_times': np.asarray(result.event_times, dtype=np.float64),
+            'event_types': np.asarray(result.event_types, dtype=np.uint16),
+            'event_weights': np.asarray(result.event_weights, dtype=np.float64),
+            'type_names': np.asarray(result.type_names, dtype=str),
+            'simulation_time': np.float64(result.simulation_time),
+            'vented': np.asarray(result.vented, dtype=np.float64),
+        }
+
+    def decode(self, data):
+        """Rebuild a SimulationResult from arrays written by encode"""
+        chromatogram = [tuple(point) for point in data['chromatogram'].tolist()]
+        return SimulationResult(
+            chromatogram,
+            data['event_times'].astype(float),
+            data['event_types'].astype(np.int32),
+            [str(name) for name in data['type_names']],
+            float(data['simulation_time']),
+            data['event_weights'].astype(float),
+            data['vented'].astype(float)
+        )
+
+
+def cached_run(cache, engine, dt=0.5, max_time=3600):
+    """Run a configured engine headless, or return the stored result of an identical run
+
+    Unseeded runs are not reproducible, so they are never looked up or stored.
+    """
+    if engine.seed is None:
+        return engine.run_headless(dt, max_time)
+    key = run_key(engine.gc_params, engine.settings, engine.seed,
+                  dt=dt, max_time=max_time, **engine.run_config())
+    result = cache.get(key)
+    if result is None:
+        result = engine.run_headless(dt, max_time)
+        cache.put(key, result)
+    return result
@@ -0,0 +1,205 @@
+# gc_checkpoint.py
+"""
+Crash-safe checkpointing for long headless runs.
+
+A checkpoint is one compressed .npz holding the complete engine state:
+particle arrays, detector log, histogram, clocks and flags, the split-vent
+tally, any continuum profiles and the exact state of both random generators
+(the noise buffer is regenerated from the state it was filled from).
+Restoring it and carrying on produces output bit-identical to a run that was
+never interrupted. Checkpoints are written to a temporary file, fsynced and
+atomically renamed, so a crash mid-write leaves the previous one intact.
+
+Usage: python gc_checkpoint.py method.toml --seed 1 --out result.json \\
+           --checkpoint run.ckpt.npz --every 60
+Run the same command again after a crash to resume from the checkpoint.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import numpy as np
+from gc_cache import run_key
+from gc_continuum import ContinuumColumn
+from gc_core import ParticleArrays
+from gc_engine import DetectorLog, SimulationEngine
+from gc_method import Method
+
+CHECKPOINT_VERSION = 1
+ENGINE_FLAGS = ('simulation_time', 'step_count', 'running', 'paused', 'physics_only',
+                'initial_hold_complete', 'final_hold_started', 'time_window',
+                'column_start_x', 'column_end_x')
+
+
+def engine_state(engine, **extra):
+    """Flatten the engine into named arrays for np.savez"""
+    meta = {
+        'version': CHECKPOINT_VERSION,
+        'settings': engine.settings,
+        'run_config': engine.run_config(),
+        'seed': engine.seed,
+        'gc_params': vars(engine.gc_params),
+        'random_spread': engine.gc_params.random_spread,
+        'flags': {name: getattr(engine, name) for name in ENGINE_FLAGS},
+        'rng': engine.rng.bit_generator.state,
+        'noise_fill_state': engine.noise.fill_state,
+        'noise_position': engine.noise.position,
+        'base_velocity': engine.particles.base_velocity,
+        'continuum': engine.continuum is not None,
+        'extra': extra,
+    }
+    arrays = {
+        'meta': np.array(json.dumps(meta, default=float)),
+        'histogram': engine.histogram,
+        'vented': engine.vented,
+        'event_times': engine.detections.times,
+        'event_types': engine.detections.types,
+        'event_weights': engine.detections.weights,
+    }
+    for field in ParticleArrays.FIELDS:
+        arrays['particles_' + field] = getattr(engine.particles, field)
+    if engine.continuum is not None:
+        for name, value in vars(engine.continuum).items():
+            arrays['continuum_' + name] = np.asarray(value)
+    return arrays
+
+
+def save_checkpoint(engine, path, **extra):
+    """Atomically write the engine state to path; extra values go in the metadata"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez_compressed(f, **engine_state(engine, **extra))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_checkpoint(engine, path):
+    """Restore the state saved by save_checkpoint into engine; returns the extra values"""
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data['meta']))
+        if meta['version'] != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version {meta['version']}")
+
+        engine.settings = dict(meta['settings'])
+        engine.apply_run_config(meta['run_config'])
+        engine.seed = meta['seed']
+        for name, value in meta['gc_params'].items():
+            setattr(engine.gc_params, name, value)
+        engine.gc_params.random_spread = meta['random_spread']
+        for name, value in meta['flags'].items():
+            setattr(engine, name, value)
+
+        engine.rng.bit_generator.state = meta['rng']
+        engine.noise.restore(meta['noise_fill_state'], meta['noise_position'])
+
+        fields = {field: data['particles_' + field].copy() for field in ParticleArrays.FIELDS}
+        particles = ParticleArrays(fields['x'], fields['y'], fields['retention_factor'],
+                                   fields['type_code'], fields['diffusion_coeff'],
+                                   meta['base_velocity'], fields['weight'])
+        particles.peak_width = fields['peak_width']
+        particles.detected = fields['detected']
+        engine.particles = particles
+
+        engine.continuum = None
+        if meta['continuum']:
+            continuum = ContinuumColumn.__new__(ContinuumColumn)
+            for key in data.files:
+                if key.startswith('continuum_'):
+                    value = data[key]
+                    setattr(continuum, key[len('continuum_'):],
+                            value.item() if value.ndim == 0 else value.copy())
+            engine.continuum = continuum
+
+        engine.detections = DetectorLog(max(1024, len(data['event_times'])))
+        engine.detections.append(data['event_times'], data['event_types'], data['event_weights'])
+        engine.histogram = data['histogram'].copy()
+        engine.vented = data['vented'].copy()
+
+    engine.programs_key = None
+    engine.compile_programs()
+    engine.update_chromatogram()
+    return meta['extra']
+
+
+def checkpoint_extra(path):
+    """The extra values saved with a checkpoint, without restoring it"""
+    with np.load(path, allow_pickle=False) as data:
+        return json.loads(str(data['meta']))['extra']
+
+
+def run_checkpointed(engine, path, dt=0.5, max_time=3600, interval=60.0):
+    """run_headless that checkpoints to path every `interval` wall-clock seconds
+
+    If path already holds a checkpoint of the same run (same run_key), it is
+    resumed instead of injecting again; a checkpoint of any other run is refused.
+    Checkpoints never touch the simulation, so the result is bit-identical
+    however many times the run is interrupted.
+    """
+    key = run_key(engine.gc_params, engine.settings, engine.seed,
+                  dt=dt, max_time=max_time, **engine.run_config())
+    if os.path.exists(path):
+        if checkpoint_extra(path).get('key') != key:
+            raise ValueError(f"Checkpoint {path} belongs to a different run; "
+                             "delete it to start again")
+        load_checkpoint(engine, path)
+    else:
+        engine.physics_only = True
+        engine.inject_particles()
+        save_checkpoint(engine, path, key=key)
+
+    last = time.monotonic()
+    while engine.simulation_time < max_time and not engine.is_complete():
+        engine.update(dt)
+        if time.monotonic() - last >= interval:
+            save_checkpoint(engine, path, key=key)
+            last = time.monotonic()
+    return engine.result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run one method headless with checkpoints")
+    parser.add_argument('method', help="Method .json or .toml file")
+    parser.add_argument('--seed', type=int, default=None, help="Random seed")
+    parser.add_argument('--out', default='result.json', help="Result JSON file")
+    parser.add_argument('--checkpoint', default=None,
+                        help="Checkpoint file (default: <out>.ckpt.npz)")
+    parser.add_argument('--every', type=float, default=60.0, help="Seconds between checkpoints")
+    parser.add_argument('--dt', type=float, default=0.5, help="Simulation step (s)")
+    parser.add_argument('--max-time', type=float, default=3600, help="Run cut-off (s)")
+    args = parser.parse_args()
+
+    checkpoint = args.checkpoint or args.out + '.ckpt.npz'
+    method = Method.load(args.method)
+    engine = method.configure(SimulationEngine(seed=args.seed))
+    if os.path.exists(checkpoint):
+        print(f"Resuming from {checkpoint}")
+    result = run_checkpointed(engine, checkpoint, args.dt, args.max_time, args.every)
+
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump({
+            'method': method.to_dict(),
+            'seed': args.seed,
+            'simulation_time': result.simulation_time,
+            'chromatogram': result.chromatogram,
+            'detector_counts': result.detector_counts,
+            'type_names': result.type_names,
+            'event_times': np.asarray(result.event_times).tolist(),
+            'event_types': np.asarray(result.event_types).tolist(),
+            'event_weights': np.asarray(result.event_weights).tolist(),
+        }, f)
+    os.remove(checkpoint)
+    print(f"Wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
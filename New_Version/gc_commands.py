@@ -0,0 +1,50 @@
+# gc_commands.py
+from collections import deque
+
+
+class CommandQueue:
+    """Commands from other threads, applied by the simulation loop between ticks
+
+    deque.append and deque.popleft are atomic in CPython, so producers (the
+    tkinter debug window) never take a lock or wait for a frame, and the loop
+    only ever sees whole commands. Each command is a tuple (action, *args) that
+    drain() hands to the simulation's command handler.
+    """
+
+    def __init__(self):
+        self.pending = deque()
+
+    def put(self, action, *args):
+        self.pending.append((action,) + args)
+
+    def drain(self, handler):
+        """Apply every command queued so far, in order; returns how many ran"""
+        count = 0
+        while True:
+            try:
+                command = self.pending.popleft()
+            except IndexError:
+                return count
+            handler(*command)
+            count += 1
+
+    def __len__(self):
+        return len(self.pending)
+
+
+class TickSnapshot:
+    """Read-only view of the parameters one tick ran with
+
+    The simulation publishes a new snapshot by reference assignment after each
+    tick, so other threads can read a consistent set of values without locking.
+    """
+
+    __slots__ = ('tick', 'simulation_time', 'temperature', 'settings', 'gc_params')
+
+    def __init__(self, tick, simulation_time, temperature, settings, gc_params):
+        self.tick = tick
+        self.simulation_time = simulation_time
+        self.temperature = temperature
+        self.settings = dict(settings)
+        self.gc_params = {name: value for name, value in vars(gc_params).items()
+                          if not isinstance(value, dict)}
@@ -1,7 +1,13 @@
 # gc_core.py
 import math
-import random
-from gc_ui import COLORS
+import numpy as np
+from gc_program import TemperatureProgram
+
+# Simplified van Deemter coefficients for better visualization
+VAN_DEEMTER_A = 0.1  # Reduced eddy diffusion
+VAN_DEEMTER_B = 0.2  # Reduced longitudinal diffusion, per unit diffusion coefficient
+VAN_DEEMTER_C = 0.01  # Reduced mass transfer resistance
+VELOCITY_PER_PSI = 0.01  # Carrier velocity (pixels per second) per psi of head pressure
 
 
 class GCParameters:
@@ -37,41 +43,43 @@ class GCParameters:
 
     def calculate_temp_program(self, current_time, start_temp, end_temp, ramp_rate,
                                initial_hold, final_hold):
-        """Calculate temperature with more gradual changes"""
-        if current_time < initial_hold * 60:
-            return start_temp, False, False
-
-        ramp_time = current_time - (initial_hold * 60)
-        current_temp = start_temp + (ramp_rate * ramp_time / 60)
-
-        if current_temp >= end_temp:
-            current_temp = end_temp
-            final_hold_started = True
+        """Calculate temperature for a single-ramp program (see gc_program for multi-segment)"""
+        program = TemperatureProgram.single_ramp(start_temp, end_temp, ramp_rate,
+                                                 initial_hold, final_hold)
+        return program.state(current_time)
+
+    def calculate_van_t_hoff(self, temp, ref_temp, delta_H=None):
+        """Modified van't Hoff calculation for smoother temperature effects
+
+        temp and delta_H may be arrays (e.g. one delta_H per analyte type); NaN
+        entries in delta_H fall back to default_delta_H.
+        """
+        if delta_H is None:
+            delta_H = self.default_delta_H
         else:
-            final_hold_started = False
+            delta_H = np.where(np.isnan(delta_H), self.default_delta_H, delta_H)
 
-        return current_temp, True, final_hold_started
-
-    def calculate_van_t_hoff(self, temp, ref_temp):
-        """Modified van't Hoff calculation for smoother temperature effects"""
         # Convert to Kelvin
-        T = temp + 273.15
+        T = np.asarray(temp) + 273.15
         T_ref = ref_temp + 273.15
 
         # Calculate temperature factor with dampened effect
-        temp_factor = math.exp((self.default_delta_H / self.R) * (1 / T_ref - 1 / T))
+        temp_factor = np.exp((delta_H / self.R) * (1 / T_ref - 1 / T))
 
         # Normalize the temperature factor to prevent extreme values
-        temp_factor = max(0.5, min(2.0, temp_factor))
+        return np.clip(temp_factor, 0.5, 2.0)
 
-        return temp_factor
+    def calculate_retention(self, temp, delta_H, delta_S):
+        """Thermodynamic retention factor k(T) = exp(delta_H / (R T) - delta_S / R)"""
+        T = np.asarray(temp) + 273.15
+        return np.exp(delta_H / (self.R * T) - delta_S / self.R)
 
     def calculate_flow_parameters(self, pressure_psi, carrier_gas, column_length):
         """Calculate flow parameters with adjusted base velocity"""
         gas_properties = self.carrier_gases[carrier_gas]
 
         # Set base_velocity proportional to pressure
-        base_velocity = pressure_psi * 0.01  # m/s per psi
+        base_velocity = pressure_psi * VELOCITY_PER_PSI
 
         # Calculate diffusion coefficient
         diffusion_base = gas_properties['diffusivity'] * 1e-5
@@ -79,87 +87,269 @@ class GCParameters:
         return base_velocity, diffusion_base
 
 
-class Particle:
-    """Represents a single analyte particle in the GC column"""
-
-    def __init__(self, x, y, retention_factor, particle_type, base_velocity, diffusion_coeff):
+class RetentionTable:
+    """Temperature factor per type code, tabulated against oven temperature
+
+    Built once per method (registry, start temperature, default_delta_H) so the
+    engines look the factor up with one interpolated array index per step
+    instead of evaluating exp. Analytes with only delta_H keep the damped,
+    clamped van't Hoff factor relative to the start temperature. Thermodynamic
+    analytes (delta_H and delta_S) are injected with k(start_temp) as their
+    retention factor, and their factor k(start_temp) / k(T) makes a particle
+    move as if its retention factor were k(T).
+    """
+
+    def __init__(self, gc_params, registry, start_temp, t_min=-60.0, t_max=450.0, step=0.25):
+        self.t_min = t_min
+        self.step = step
+        self.temperatures = np.arange(t_min, t_max + step, step)
+        temps = self.temperatures[None, :]
+        self.factor = gc_params.calculate_van_t_hoff(temps, start_temp, registry.delta_H[:, None])
+
+        self.thermodynamic = registry.thermodynamic
+        self.start_k = np.full(len(registry), np.nan)
+        if self.thermodynamic.any():
+            delta_H = registry.delta_H[self.thermodynamic, None]
+            delta_S = registry.delta_S[self.thermodynamic, None]
+            k = gc_params.calculate_retention(temps, delta_H, delta_S)
+            start_k = gc_params.calculate_retention(start_temp, delta_H, delta_S)
+            self.factor[self.thermodynamic] = start_k / k
+            self.start_k[self.thermodynamic] = start_k[:, 0]
+
+    def lookup(self, temp):
+        """Factor per type code at temp (°C); an array of temperatures adds a trailing axis"""
+        position = np.clip((np.asarray(temp, dtype=float) - self.t_min) / self.step,
+                           0, len(self.temperatures) - 1.000001)
+        i = position.astype(np.int64)
+        frac = position - i
+        return self.factor[:, i] * (1 - frac) + self.factor[:, i + 1] * frac
+
+    def retention_factors(self, rf):
+        """rf per type code with thermodynamic analytes replaced by k(start_temp)"""
+        return np.where(self.thermodynamic, self.start_k, rf)
+
+
+class ParticleArrays:
+    """Struct-of-arrays state for every analyte particle in the GC column
+
+    Index i across the arrays is one particle; type_code indexes the
+    AnalyteRegistry and weight is how many molecule-equivalents the particle
+    stands for (1 unless the run is weighted). All particles are injected
+    together, so they share the run clock passed to move() instead of carrying
+    their own time.
+    """
+
+    FIELDS = ('x', 'y', 'retention_factor', 'type_code', 'diffusion_coeff',
+              'weight', 'peak_width', 'detected')
+
+    def __init__(self, x, y, retention_factor, type_code, diffusion_coeff, base_velocity,
+                 weight=None):
         self.x = x
         self.y = y
         self.retention_factor = retention_factor
-        self.particle_type = particle_type
-        self.time = 0
-        self.detected = False
-        self.base_velocity = base_velocity  # Already in pixels per second
+        self.type_code = type_code
         self.diffusion_coeff = diffusion_coeff
-        self.peak_width = 1.0
+        self.base_velocity = base_velocity  # Already in pixels per second
+        self.weight = weight if weight is not None else np.ones(len(x))
+        self.peak_width = np.ones(len(x))
+        self.detected = np.zeros(len(x), dtype=bool)
+        self.hetp_terms = None  # Per-particle van Deemter terms, see precompute_hetp
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros(0), np.zeros(0), np.ones(0), np.zeros(0, dtype=np.int32),
+                   np.zeros(0), 0.0)
+
+    def __len__(self):
+        return len(self.x)
+
+    def active(self):
+        """Indices of particles still travelling through the column"""
+        return np.flatnonzero(~self.detected)
+
+    def keep(self, mask):
+        """Drop every particle where mask is False"""
+        for field in self.FIELDS:
+            setattr(self, field, getattr(self, field)[mask])
+        self.hetp_terms = None
+
+    def split(self, idx, rng, spread=0.02):
+        """Split each particle in idx into two of half the weight
+
+        The pair's retention factors are pushed apart by a random relative
+        amount of order `spread`, so the copies follow different paths while the
+        weighted mean RF is unchanged.
+        """
+        if len(idx) == 0:
+            return
+        delta = np.abs(rng.normal(0, spread, len(idx)))
+        rf = self.retention_factor[idx]
+        upper, lower = rf * (1 + delta), rf * (1 - delta)
+
+        copies = {field: getattr(self, field)[idx] for field in self.FIELDS}
+        copies['retention_factor'] = lower
+        copies['diffusion_coeff'] = self.diffusion_coeff[idx] * rf / lower
+        copies['weight'] = self.weight[idx] / 2
+
+        self.diffusion_coeff[idx] *= rf / upper
+        self.retention_factor[idx] = upper
+        self.weight[idx] /= 2
+        for field in self.FIELDS:
+            setattr(self, field, np.concatenate([getattr(self, field), copies[field]]))
+        self.hetp_terms = None
+
+    def merge(self, idx, x_bin, rf_bin):
+        """Merge particles in idx that share a type, an x bin and a relative RF bin
+
+        Each group becomes one particle carrying the summed weight at the
+        weight-averaged position and retention factor.
+        """
+        if len(idx) < 2:
+            return
+        rf = self.retention_factor[idx]
+        keys = np.stack([self.type_code[idx],
+                         np.floor(self.x[idx] / x_bin).astype(np.int64),
+                         np.floor(np.log(rf) / rf_bin).astype(np.int64)], axis=1)
+        _, first, group = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        group = group.ravel()
+        if len(first) == len(idx):
+            return
+
+        weight = self.weight[idx]
+        total = np.bincount(group, weights=weight)
+        survivors = idx[first]
+        for field in ('x', 'y', 'retention_factor', 'diffusion_coeff'):
+            values = getattr(self, field)[idx]
+            getattr(self, field)[survivors] = np.bincount(group, weights=values * weight) / total
+        self.weight[survivors] = total
+        self.hetp_terms = None
+
+        mask = np.ones(len(self), dtype=bool)
+        mask[idx] = False
+        mask[survivors] = True
+        self.keep(mask)
+
+    def bin_keys(self, idx, start, end, bins):
+        """Combined type/x-bin key per particle in idx; outside start..end goes to the edge bins"""
+        x_bin = ((self.x[idx] - start) * (bins / (end - start))).astype(np.int64)
+        return self.type_code[idx] * bins + np.clip(x_bin, 0, bins - 1)
+
+    def density(self, idx, start, end, bins, n_types):
+        """Weighted occupancy per (type code, x bin) of the particles in idx
+
+        One bincount over a combined type/bin key.
+        """
+        key = self.bin_keys(idx, start, end, bins)
+        density = np.bincount(key, weights=self.weight[idx], minlength=n_types * bins)
+        return density.astype(float, copy=False).reshape(n_types, bins)
+
+    def local_density(self, idx, start, end, bins, n_types):
+        """Amount of its own analyte in each particle's x bin: one bincount and a gather"""
+        key = self.bin_keys(idx, start, end, bins)
+        return np.bincount(key, weights=self.weight[idx], minlength=n_types * bins)[key]
+
+    @staticmethod
+    def calculate_van_deemter(velocity, diffusion_coeff):
+        """Calculate HETP using simplified van Deemter equation"""
+        B = VAN_DEEMTER_B * diffusion_coeff
+        hetp = VAN_DEEMTER_A + (B / velocity) + (VAN_DEEMTER_C * velocity)
+        return hetp
 
-    def get_color(self):
-        """Get particle color based on type"""
-        return COLORS[self.particle_type]
+    def precompute_hetp(self):
+        """Cache the parts of the van Deemter equation that only change with RF
 
-    def calculate_van_deemter(self, velocity):
-        """Calculate HETP using simplified van Deemter equation"""
-        # Simplified coefficients for better visualization
-        A = 0.1  # Reduced eddy diffusion
-        B = 0.2 * self.diffusion_coeff  # Reduced longitudinal diffusion
-        C = 0.01  # Reduced mass transfer resistance
+        A particle moves at carrier_velocity / sqrt(rf), so its HETP is
+        A + b / carrier_velocity + C * s * carrier_velocity with s = 1 / sqrt(rf)
+        and b = B * diffusion_coeff * sqrt(rf). Only the carrier velocity varies
+        from step to step; split, merge and keep drop the cache.
+        """
+        root = np.sqrt(self.retention_factor)
+        self.hetp_terms = (1 / root, VAN_DEEMTER_B * self.diffusion_coeff * root)
 
-        hetp = A + (B / velocity) + (C * velocity)
-        return hetp
+    def move(self, idx, time, dt, temp_factor, current_temp, column_y, noise=None, flow_factor=1.0):
+        """Update positions of the particles in idx with modified movement parameters
 
-    def move(self, dt, temp_factor, current_temp, column_y):
-        """Update particle position with modified movement parameters"""
-        self.time += dt
+        time is the run clock after this step; temp_factor holds one value per
+        particle in idx. The y wobble is purely cosmetic: pass a NoiseService to
+        compute it, or None to skip it when nothing is being rendered.
+        """
+        if self.hetp_terms is None:
+            self.precompute_hetp()
+        inverse_root_rf, hetp_b = self.hetp_terms
 
         # Calculate effective velocity with reduced retention effect
-        velocity = self.base_velocity / (self.retention_factor ** 0.5)  # Square root to reduce retention effect
-        hetp = self.calculate_van_deemter(velocity)
+        carrier_velocity = self.base_velocity * flow_factor
+        velocity = carrier_velocity * inverse_root_rf[idx]  # Square root to reduce retention effect
+        hetp = VAN_DEEMTER_A + hetp_b[idx] / carrier_velocity + VAN_DEEMTER_C * velocity
 
         # Increase temperature factor influence and overall speed
-        effective_velocity = (velocity / (1 + hetp)) * (temp_factor ** 0.5) * 2
+        effective_velocity = (velocity / (1 + hetp)) * np.sqrt(temp_factor) * 2
 
         # Update position with guaranteed minimum speed
-        min_speed = self.base_velocity * 0.1  # Minimum speed to prevent stalling
-        self.x += max(effective_velocity * dt, min_speed * dt)
+        min_speed = carrier_velocity * 0.1  # Minimum speed to prevent stalling
+        x = self.x[idx] + np.maximum(effective_velocity * dt, min_speed * dt)
+        self.x[idx] = x
+
+        if noise is None:
+            return
 
         # Calculate more pronounced peak broadening
         temp_contribution = math.sqrt(current_temp / 323.15)
-        time_contribution = math.sqrt(self.time / 10)
-        diffusion_contribution = math.sqrt(2 * self.diffusion_coeff * self.time)
+        time_contribution = math.sqrt(time / 10)
+        diffusion_contribution = np.sqrt(2 * self.diffusion_coeff[idx] * time)
 
-        self.peak_width = (1.0 + diffusion_contribution) * temp_contribution * time_contribution
+        peak_width = (1.0 + diffusion_contribution) * (temp_contribution * time_contribution)
+        self.peak_width[idx] = peak_width
 
         # More pronounced vertical movement
-        amplitude = 15 * (1 / temp_factor) * math.exp(-self.time / 200)  # Increased amplitude, slower decay
-        random_offset = random.gauss(0, self.peak_width)
-        self.y = column_y + amplitude * math.sin(0.02 * self.x) + random_offset
+        amplitude = (15 * math.exp(-time / 200)) / temp_factor  # Increased amplitude, slower decay
+        random_offset = noise.scaled(peak_width)
+        self.y[idx] = column_y + amplitude * noise.sin(0.02 * x) + random_offset
 
 
 class ParticleManager:
     """Manages creation and behavior of particle groups"""
 
-    def __init__(self, gc_params):
+    def __init__(self, gc_params, rng=None):
         self.gc_params = gc_params
+        self.rng = rng if rng is not None else np.random.default_rng()
         #this controls the particle spread.
-    def create_particle_group(self, count, particle_type, x_pos, y_pos, injection_width,
-                              base_velocity, diffusion_base, retention_factor, temp_factor):
-        """Create a group of particles with similar properties"""
-        particles = []
-
-        for _ in range(count):
-            # Add variation to injection position
-            x = x_pos + random.gauss(0, injection_width/100)
-            y = random.gauss(y_pos, injection_width / 100)
-
-            # Add variation to retention factor
-            rf = retention_factor * temp_factor
-            rf_variation = random.gauss(0, GCParameters.random_spread * rf)  # 5% variation
-            final_rf = rf + rf_variation
-
-            # Calculate diffusion coefficient based on molecular size
-            diffusion_coeff = diffusion_base * (1 / final_rf)
-
-            particles.append(Particle(x, y, final_rf, particle_type,
-                                      base_velocity, diffusion_coeff))
-
-        return particles
+    def create_particles(self, type_code, x_pos, y_pos, injection_width, base_velocity,
+                         diffusion_base, retention_factors, diffusivity, temp_factor,
+                         weight=None):
+        """Create particles for an array of type codes
+
+        retention_factors and diffusivity are per-type arrays indexed by type code;
+        temp_factor is a scalar or another per-type array.
+        """
+        count = len(type_code)
+
+        # Add variation to injection position
+        x = x_pos + self.rng.normal(0, injection_width / 100, count)
+        y = self.rng.normal(y_pos, injection_width / 100, count)
+
+        # Add variation to retention factor
+        rf = (retention_factors * temp_factor)[type_code]
+        rf_variation = self.rng.normal(0, 1, count) * (self.gc_params.random_spread * rf)  # 5% variation
+        final_rf = rf + rf_variation
+
+        # Calculate diffusion coefficient based on molecular size
+        diffusion_coeff = diffusion_base * diffusivity[type_code] * (1 / final_rf)
+
+        return ParticleArrays(x, y, final_rf, type_code, diffusion_coeff, base_velocity, weight)
+
+    def allocate_weighted(self, total_count, abundance, sample_amount,
+                          importance_exponent=0.5, min_per_type=50):
+        """Importance-sample particle counts per type for a weighted run
+
+        Particles are shared out in proportion to abundance ** importance_exponent
+        (1 = proportional, 0 = equal), with at least min_per_type each, so trace
+        analytes still get enough particles. Returns (counts, weight per particle)
+        with weights chosen so each type's particles sum to its true amount.
+        """
+        fraction = abundance / abundance.sum()
+        score = fraction ** importance_exponent
+        counts = np.floor(total_count * score / score.sum()).astype(np.int64)
+        counts = np.maximum(counts, min(min_per_type, total_count))
+        weights = sample_amount * fraction / counts
+        return counts, weights
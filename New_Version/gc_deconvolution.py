@@ -0,0 +1,405 @@
+# gc_deconvolution.py
+"""
+Deconvolution of coeluting peaks by batched nonlinear least squares.
+
+The summed detector signal is split into regions where it stands above the
+baseline; each region is fitted with sums of 1..max_peaks Gaussian or EMG
+(exponentially modified Gaussian) peaks and the count with the lowest BIC
+wins. Every candidate of every region, from any number of chromatograms, is
+fitted in a few padded batches (one per peak count) by Levenberg-Marquardt,
+with the model, residual and analytic Jacobian evaluated as single array
+expressions and the damped normal equations solved with one batched
+linalg.solve per iteration.
+
+The simulator knows which analyte every detector event came from, so each
+fitted peak can be scored against the true amount and mean retention time
+of the analyte it matches.
+
+Usage: python gc_deconvolution.py method.toml --seeds 1 2 3 --model emg --count 200000
+"""
+
+import argparse
+import numpy as np
+from gc_engine import SimulationEngine
+from gc_method import Method
+
+MODELS = {'gaussian': 3, 'emg': 4}  # Parameters per peak: area, centre, sigma[, tau]
+SQRT2 = np.sqrt(2.0)
+SQRT2PI = np.sqrt(2 * np.pi)
+
+
+def erfcx(z):
+    """Scaled complementary error function exp(z^2) erfc(z) for z >= 0
+
+    Chebyshev fit with fractional error below 1.2e-7 (Numerical Recipes erfcc),
+    written without exp(-z^2) so it cannot underflow in the tail.
+    """
+    t = 1 / (1 + 0.5 * z)
+    return t * np.exp(-1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (
+        0.09678418 + t * (-0.18628806 + t * (0.27886807 + t * (-1.13520398 + t * (
+            1.48851587 + t * (-0.82215223 + t * 0.17087277)))))))))
+
+
+def erfc(z):
+    """Complementary error function for any real z"""
+    a = np.abs(z)
+    value = erfcx(a) * np.exp(-a * a)
+    return np.where(z >= 0, value, 2 - value)
+
+
+def peaks(model, t, params):
+    """Each peak's values and Jacobian at times t
+
+    t is (problems, points) and params (problems, peaks, MODELS[model]);
+    returns values (problems, peaks, points) and their derivatives
+    (problems, peaks, parameters, points).
+    """
+    area, centre, sigma = params[..., 0:1], params[..., 1:2], params[..., 2:3]
+    x = t[:, None, :] - centre
+    gauss = np.exp(-0.5 * (x / sigma) ** 2) / (sigma * SQRT2PI)
+    if model == 'gaussian':
+        value = area * gauss
+        jacobian = np.stack([gauss, value * x / sigma ** 2,
+                             value * (x ** 2 / sigma ** 3 - 1 / sigma)], axis=2)
+        return value, jacobian
+
+    tau = params[..., 3:4]
+    z = (sigma / tau - x / sigma) / SQRT2
+    # The erfcx form keeps the leading edge finite however small tau is; the
+    # exponent of the trailing form is never positive where it is used
+    leading = area / (2 * tau) * np.exp(-0.5 * (x / sigma) ** 2) * erfcx(np.maximum(z, 0))
+    trailing = area / (2 * tau) * np.exp(np.minimum(0.5 * (sigma / tau) ** 2 - x / tau, 0)) * \
+        erfc(np.minimum(z, 0))
+    value = np.where(z >= 0, leading, trailing)
+    k = area * gauss / tau
+    jacobian = np.stack([
+        value / area,
+        value / tau - k,
+        value * sigma / tau ** 2 - k * (sigma / tau + x / sigma),
+        value * (x / tau ** 2 - sigma ** 2 / tau ** 3 - 1 / tau) + k * sigma ** 2 / tau ** 2,
+    ], axis=2)
+    return value, jacobian
+
+
+def mean_time(model, params):
+    """Centroid of each fitted peak (the EMG mean is centre + tau)"""
+    return params[..., 1] + (params[..., 3] if model == 'emg' else 0)
+
+
+def smooth(values, sigma):
+    """Gaussian kernel smoothing, sigma in bins"""
+    width = max(int(4 * sigma), 1)
+    kernel = np.exp(-0.5 * (np.arange(-width, width + 1) / sigma) ** 2)
+    return np.convolve(values, kernel / kernel.sum(), mode='same')
+
+
+def signal_from_events(times, weights=None, width=1.0, end=None, smoothing=2.0):
+    """(bin centres, amount per second, standard error) histogram of detector events
+
+    A bin's variance is the sum of its squared event weights (Poisson counts
+    for unweighted runs), smoothed over neighbouring bins so that downward
+    fluctuations are not given extra weight, and never below one typical event's.
+    """
+    weights = np.ones(len(times)) if weights is None else np.asarray(weights)
+    end = (np.max(times) if len(times) else 0.0) + width if end is None else end
+    edges = np.arange(0.0, end + width, width)
+    amounts, _ = np.histogram(times, edges, weights=weights)
+    variance, _ = np.histogram(times, edges, weights=weights ** 2)
+    floor = np.mean(weights ** 2) if len(weights) else 1.0
+    variance = smooth(variance, smoothing)
+    return edges[:-1] + width / 2, amounts / width, np.sqrt(np.maximum(variance, floor)) / width
+
+
+def find_regions(times, values, threshold=0.02, smoothing=2.0, pad=3.0):
+    """(start, stop) index ranges where the smoothed signal exceeds threshold * max
+
+    smoothing is the Gaussian kernel sigma in bins; each range is widened by
+    pad kernel sigmas and ranges that then touch are merged into one cluster.
+    """
+    smoothed = smooth(values, smoothing)
+    above = smoothed > threshold * smoothed.max()
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], above.astype(np.int8), [0]])))
+    grow = int(pad * smoothing)
+    regions = []
+    for start, stop in zip(edges[::2], edges[1::2]):
+        start, stop = max(start - grow, 0), min(stop + grow, len(times))
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], stop)
+        else:
+            regions.append((start, stop))
+    return regions
+
+
+def bic(chi_square, points, parameters):
+    """Bayesian information criterion of a fit weighted by known standard errors"""
+    return chi_square + parameters * np.log(points)
+
+
+def initial_guess(model, t, y, count):
+    """Peaks at equal quantiles of the region's signal, sharing its area"""
+    weights = np.maximum(y, 0)
+    total = weights.sum() * (t[1] - t[0]) if len(t) > 1 else weights.sum()
+    cumulative = np.cumsum(weights) / max(weights.sum(), 1e-12)
+    centres = np.interp((np.arange(count) + 0.5) / count, cumulative, t)
+    spread = np.sqrt(np.sum(weights * (t - np.average(t, weights=weights + 1e-12)) ** 2) /
+                     max(weights.sum(), 1e-12))
+    sigma = max(spread / count, t[1] - t[0] if len(t) > 1 else 1.0)
+    guess = np.column_stack([np.full(count, total / count), centres, np.full(count, sigma)])
+    if model == 'emg':
+        guess = np.column_stack([guess, np.full(count, 0.3 * sigma)])
+    return guess
+
+
+class BatchFit:
+    """Levenberg-Marquardt fit of many peak sums at once
+
+    Residuals are divided by each point's standard error, so the objective
+    is chi-square and a problem is settled once an accepted step improves it
+    by less than tolerance, a statistically negligible amount. Problems
+    (regions) are padded to a common number of points and peaks; padded points
+    carry zero weight and padded peaks are frozen.
+    """
+
+    def __init__(self, model='gaussian', max_iter=200, tolerance=1e-3):
+        if model not in MODELS:
+            raise ValueError(f"Unknown peak model '{model}'")
+        self.model = model
+        self.max_iter = max_iter
+        self.tolerance = tolerance
+
+    def model_values(self, t, params, active):
+        values, jacobian = peaks(self.model, t, params)
+        values = values * active[..., None]
+        jacobian = jacobian * active[..., None, None]
+        return values.sum(axis=1), jacobian.reshape(len(t), -1, t.shape[1])
+
+    def project(self, params, lower, upper, min_width):
+        """Keep areas positive, widths above min_width and centres in their region
+
+        tau stays above 0.05 sigma: shorter tails are indistinguishable from a
+        Gaussian and the tau derivative loses precision there.
+        """
+        params[..., 0] = np.maximum(params[..., 0], 1e-12)
+        params[..., 1] = np.clip(params[..., 1], lower[:, None], upper[:, None])
+        params[..., 2:] = np.maximum(params[..., 2:], min_width[:, None, None])
+        if self.model == 'emg':
+            params[..., 3] = np.maximum(params[..., 3], 0.05 * params[..., 2])
+        return params
+
+    def fit(self, regions):
+        """regions: list of (times, values, errors, guess (peaks, parameters)) tuples
+
+        Returns (params list, chi-square, converged), per region.
+        """
+        n_params = MODELS[self.model]
+        problems = len(regions)
+        points = max(len(t) for t, _, _, _ in regions)
+        count = max(len(guess) for _, _, _, guess in regions)
+        t = np.zeros((problems, points))
+        y = np.zeros((problems, points))
+        weight = np.zeros((problems, points))
+        params = np.ones((problems, count, n_params))
+        active = np.zeros((problems, count))
+        for p, (times, values, errors, guess) in enumerate(regions):
+            n = len(times)
+            t[p, :n], y[p, :n], weight[p, :n] = times, values, 1 / errors
+            t[p, n:] = times[-1]
+            params[p, :len(guess)] = guess
+            active[p, :len(guess)] = 1.0
+        lower, upper = t[:, 0], t.max(axis=1)
+        min_width = 0.25 * (t[:, 1] - t[:, 0])
+        frozen = np.repeat(active == 0, n_params, axis=1)
+
+        values, jacobian = self.model_values(t, params, active)
+        residual = (y - values) * weight
+        jacobian = jacobian * weight[:, None, :]
+        chi_square = np.sum(residual ** 2, axis=1)
+        damping = np.full(problems, 1e-3)
+        converged = np.zeros(problems, dtype=bool)
+        diagonal_index = np.arange(frozen.shape[1])
+        for _ in range(self.max_iter):
+            live = np.flatnonzero(~converged)  # Settled problems drop out of the batch
+            if not len(live):
+                break
+            J, r, w = jacobian[live], residual[live], weight[live]
+            normal = np.einsum('pkm,plm->pkl', J, J)
+            gradient = np.einsum('pkm,pm->pk', J, r)
+            diagonal = normal[:, diagonal_index, diagonal_index]
+            normal[:, diagonal_index, diagonal_index] = np.where(
+                frozen[live], 1.0, diagonal * (1 + damping[live, None]) + 1e-12)
+            step = np.linalg.solve(normal, gradient[..., None])[..., 0]
+            step[frozen[live]] = 0.0
+
+            trial = self.project(params[live] + step.reshape(params[live].shape),
+                                 lower[live], upper[live], min_width[live])
+            trial_values, trial_jacobian = self.model_values(t[live], trial, active[live])
+            trial_residual = (y[live] - trial_values) * w
+            trial_chi_square = np.sum(trial_residual ** 2, axis=1)
+
+            current = chi_square[live]
+            better = trial_chi_square < current
+            settled = better & (current - trial_chi_square <= self.tolerance)
+            accepted = live[better]
+            params[accepted] = trial[better]
+            residual[accepted] = trial_residual[better]
+            jacobian[accepted] = trial_jacobian[better] * w[better, None, :]
+            chi_square[accepted] = trial_chi_square[better]
+            damping[live] = np.where(better, damping[live] / 10, damping[live] * 10)
+            converged[live] = settled | (damping[live] > 1e10)
+        return ([params[p, :len(guess)] for p, (_, _, _, guess) in enumerate(regions)],
+                chi_square, converged)
+
+
+def ground_truth(result, start, stop, minimum=0.05):
+    """Analytes in [start, stop): (names, amounts, mean times), in elution order
+
+    Analytes with less than `minimum` of the region's amount are left out.
+    """
+    times = np.asarray(result.event_times)
+    inside = (times >= start) & (times < stop)
+    types = np.asarray(result.event_types)[inside]
+    weights = np.asarray(result.event_weights)[inside]
+    n_types = len(result.type_names)
+    amount = np.bincount(types, weights, n_types)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(types, weights * times[inside], n_types) / amount
+    codes = np.flatnonzero(amount >= minimum * max(amount.sum(), 1e-300))
+    codes = codes[np.argsort(mean[codes])]
+    return [result.type_names[c] for c in codes], amount[codes], mean[codes]
+
+
+def match(fitted_means, true_means):
+    """Greedy nearest pairing of fitted and true peaks: list of (fit index, true index)"""
+    distance = np.abs(np.asarray(fitted_means)[:, None] - np.asarray(true_means)[None, :])
+    pairs = []
+    while distance.size and np.isfinite(distance).any():
+        i, j = np.unravel_index(np.argmin(distance), distance.shape)
+        pairs.append((int(i), int(j)))
+        distance[i, :] = np.inf
+        distance[:, j] = np.inf
+    return sorted(pairs)
+
+
+def deconvolve(results, model='emg', width=1.0, components='bic', max_peaks=6,
+               threshold=0.02, max_iter=200):
+    """Fit every region of every result together and score the fits against the events
+
+    components is 'bic' (fit 1..max_peaks peaks per region and keep the count
+    with the lowest BIC) or 'truth' (one peak per analyte present in the
+    region). Returns one record per fitted peak, plus a zero-area record for
+    every true analyte that no fitted peak was matched to, so fits with fewer
+    peaks than analytes score those analytes as misses.
+    """
+    problems = []
+    candidates = []  # Per region: indices into problems
+    owners = []
+    for r, result in enumerate(results):
+        times, values, errors = signal_from_events(np.asarray(result.event_times),
+                                                   np.asarray(result.event_weights), width)
+        for start, stop in find_regions(times, values, threshold):
+            t, y, e = times[start:stop], values[start:stop], errors[start:stop]
+            bounds = (t[0] - width / 2, t[-1] + width / 2)
+            truth = ground_truth(result, *bounds)
+            counts = [max(len(truth[0]), 1)] if components == 'truth' else \
+                range(1, max_peaks + 1)
+            candidates.append(list(range(len(problems), len(problems) + len(counts))))
+            problems.extend((t, y, e, initial_guess(model, t, y, count)) for count in counts)
+            owners.append((r, bounds, truth))
+
+    # One batch per peak count, so no problem carries padded peaks
+    fitter = BatchFit(model, max_iter)
+    fitted = [None] * len(problems)
+    chi_square = np.zeros(len(problems))
+    converged = np.zeros(len(problems), dtype=bool)
+    for count in sorted({len(problem[3]) for problem in problems}):
+        group = [i for i, problem in enumerate(problems) if len(problem[3]) == count]
+        params, chi_square[group], converged[group] = fitter.fit([problems[i] for i in group])
+        for i, fit in zip(group, params):
+            fitted[i] = fit
+    records = []
+    for indices, (r, bounds, (names, amounts, means)) in zip(candidates, owners):
+        points = len(problems[indices[0]][0])
+        scores = [bic(chi_square[i], points, fitted[i].size) for i in indices]
+        best = indices[int(np.argmin(scores))]
+        params = fitted[best]
+        fit_means = mean_time(model, params)
+        pairs = dict(match(fit_means, means))
+        region = {
+            'result': r,
+            'region': bounds,
+            'chi_square': float(chi_square[best]),
+            'converged': bool(converged[best]),
+            'peaks_in_region': len(params),
+            'analytes_in_region': len(names),
+        }
+        for i, peak in enumerate(params):
+            j = pairs.get(i)
+            records.append(dict(
+                region,
+                analyte=names[j] if j is not None else None,
+                area=float(peak[0]),
+                mean_time=float(fit_means[i]),
+                sigma=float(peak[2]),
+                tau=float(peak[3]) if model == 'emg' else 0.0,
+                true_area=float(amounts[j]) if j is not None else np.nan,
+                true_mean_time=float(means[j]) if j is not None else np.nan,
+            ))
+        for j in sorted(set(range(len(names))) - set(pairs.values())):
+            records.append(dict(region, analyte=names[j], area=0.0, mean_time=np.nan,
+                                sigma=np.nan, tau=np.nan, true_area=float(amounts[j]),
+                                true_mean_time=float(means[j])))
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deconvolve coeluting peaks and score the fits")
+    parser.add_argument('method', help="Method .json or .toml file")
+    parser.add_argument('--seeds', type=int, nargs='+', default=[1], help="One run per seed")
+    parser.add_argument('--model', default='emg', choices=tuple(MODELS))
+    parser.add_argument('--components', default='bic', choices=('bic', 'truth'),
+                        help="Choose the peak count by BIC or take it from the true analytes")
+    parser.add_argument('--count', type=int, default=None, help="Override the particle count")
+    parser.add_argument('--width', type=float, default=1.0, help="Signal bin width (s)")
+    args = parser.parse_args()
+
+    method = Method.load(args.method)
+    if args.count:
+        method.particle_count = args.count
+    results = [method.configure(SimulationEngine(seed=seed)).run_headless() for seed in args.seeds]
+    records = deconvolve(results, args.model, args.width, args.components)
+
+    print(f"{'seed':>4} {'analyte':<12} {'area':>9} {'true':>9} {'err%':>6} "
+          f"{'t_mean':>8} {'true':>8} {'dt':>6}  region")
+    errors = []
+    totals = {}  # (result, region) -> [fitted area, true area]
+    for record in records:
+        area_error = 100 * (record['area'] - record['true_area']) / record['true_area']
+        # Per-peak errors only mean something where every analyte got its own peak
+        if record['analyte'] is not None and \
+                record['peaks_in_region'] == record['analytes_in_region']:
+            errors.append(abs(area_error))
+        total = totals.setdefault((record['result'], record['region']), [0.0, 0.0])
+        total[0] += record['area']
+        total[1] += np.nan_to_num(record['true_area'])
+        print(f"{args.seeds[record['result']]:>4} {record['analyte'] or '-':<12} "
+              f"{record['area']:9.1f} {record['true_area']:9.1f} {area_error:6.1f} "
+              f"{record['mean_time']:8.1f} {record['true_mean_time']:8.1f} "
+              f"{record['mean_time'] - record['true_mean_time']:6.1f}  "
+              f"{record['peaks_in_region']}/{record['analytes_in_region']} peaks"
+              f"{' (missed)' if np.isnan(record['mean_time']) else ''}"
+              f"{'' if record['converged'] else ' (not converged)'}")
+    if errors:
+        print(f"Mean absolute area error {np.mean(errors):.1f}% over {len(errors)} peaks "
+              f"in regions fitted with one peak per analyte")
+    region_errors = [abs(100 * (fit - true) / true) for fit, true in totals.values() if true > 0]
+    if region_errors:
+        print(f"Mean absolute region area error {np.mean(region_errors):.1f}% "
+              f"over {len(region_errors)} regions")
+    missed = sum(np.isnan(record['mean_time']) for record in records)
+    spurious = sum(record['analyte'] is None for record in records)
+    print(f"{missed} analytes missed, {spurious} unmatched peaks")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
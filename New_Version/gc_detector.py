@@ -0,0 +1,217 @@
+# gc_detector.py
+"""
+Detector acquisition models.
+
+A Detector samples the engine's detector event log at a fixed acquisition
+rate, whatever the simulation step or frame rate: each sample integrates the
+amount that arrived during its window, per type code, and maps it onto the
+detector's channels through a response matrix. A first-order time constant
+then smooths the channels, as the detector electronics would. Samples go into
+a fixed-capacity RingBuffer, so a live run of any length uses bounded memory;
+the display and exporters read from it with their own cursors.
+
+    FID      one channel, per-analyte response factors, optional bleed and noise
+    MSScan   full-scan mass spectra over an m/z range, `rate` scans per second
+    SIM      selected-ion monitoring of a few m/z channels at a higher rate
+"""
+
+import numpy as np
+
+
+def default_spectrum(code):
+    """Stand-in EI spectrum for analytes that do not define one"""
+    return [(43 + 14 * code, 100.0), (29 + 14 * code, 45.0), (71 + 14 * code, 20.0)]
+
+
+def spectra(registry):
+    """Spectrum per type code, falling back to default_spectrum"""
+    return [analyte.spectrum or default_spectrum(code)
+            for code, analyte in enumerate(registry)]
+
+
+class RingBuffer:
+    """Fixed-capacity sample store; once full, each new sample replaces the oldest
+
+    `written` counts every sample ever appended. Readers keep that count as
+    their cursor and get whatever arrived since; samples overwritten before a
+    reader got to them are skipped.
+    """
+
+    def __init__(self, capacity, channels):
+        self.capacity = capacity
+        self.times = np.zeros(capacity)
+        self.values = np.zeros((capacity, channels))
+        self.written = 0
+
+    def __len__(self):
+        return min(self.written, self.capacity)
+
+    def clear(self):
+        self.written = 0
+
+    def append(self, times, values):
+        count = len(times)
+        skip = max(0, count - self.capacity)
+        times, values = times[skip:], values[skip:]
+        start = (self.written + skip) % self.capacity
+        first = min(len(times), self.capacity - start)
+        self.times[start:start + first] = times[:first]
+        self.values[start:start + first] = values[:first]
+        self.times[:len(times) - first] = times[first:]
+        self.values[:len(times) - first] = values[first:]
+        self.written += count
+
+    def read(self, position=0):
+        """(times, values, new position) for the samples appended since position"""
+        start = max(position, self.written - self.capacity)
+        slots = np.arange(start, self.written) % self.capacity
+        return self.times[slots], self.values[slots], self.written
+
+
+class Detector:
+    """Fixed-rate acquisition of detector events into a RingBuffer
+
+    Subclasses set `channels` (labels) and `response`, an (n_types, n_channels)
+    matrix giving the signal per unit amount of each type code.
+    """
+
+    def __init__(self, rate, time_constant, capacity=65536):
+        self.rate = rate
+        self.time_constant = time_constant
+        self.ring = RingBuffer(capacity, len(self.channels))
+        self.start()
+
+    def start(self, t0=0.0, detections=None):
+        """Begin acquiring at t0, skipping any events already logged before it"""
+        self.ring.clear()
+        self.next_sample = int(np.ceil(t0 * self.rate))
+        self.event_cursor = 0
+        if detections is not None:
+            self.event_cursor = int(np.searchsorted(detections.times, t0, side='left'))
+        self.filter_state = None
+
+    def acquire(self, detections, until, temperature_program=None):
+        """Append every sample whose window closes by `until`; returns how many
+
+        Sample i covers [i / rate, (i + 1) / rate) and is stamped at its centre.
+        Events must be logged in time order, as the engines do.
+        """
+        end = int(np.floor(until * self.rate))  # First sample whose window is still open
+        count = end - self.next_sample
+        if count <= 0:
+            return 0
+
+        window_start = self.next_sample / self.rate
+        times = detections.times
+        stop = self.event_cursor + int(np.searchsorted(times[self.event_cursor:], end / self.rate,
+                                                       side='left'))
+        new = slice(self.event_cursor, stop)
+        sample = np.clip(((times[new] - window_start) * self.rate).astype(np.int64), 0, count - 1)
+        n_types = len(self.response)
+        amounts = np.bincount(sample * n_types + detections.types[new],
+                              weights=detections.weights[new], minlength=count * n_types)
+        self.event_cursor = stop
+
+        sample_times = (self.next_sample + np.arange(count) + 0.5) / self.rate
+        signal = amounts.reshape(count, n_types) @ self.response * self.rate
+        signal = self.condition(signal, sample_times, temperature_program)
+        self.ring.append(sample_times, self.smooth(signal))
+        self.next_sample = end
+        return count
+
+    def condition(self, signal, times, temperature_program):
+        """Hook for baseline and noise; the clean signal by default"""
+        return signal
+
+    def smooth(self, signal):
+        """First-order low-pass with the detector time constant, carried across chunks"""
+        if self.time_constant <= 0:
+            return signal
+        decay = np.exp(-1 / (self.rate * self.time_constant))
+        if decay == 0:
+            return signal  # Time constant far below the sample interval
+        state = signal[0] if self.filter_state is None else self.filter_state
+        out = np.empty_like(signal)
+        # Closed form of y[n] = d y[n-1] + (1 - d) x[n] over a block, with p[n] = d^(n+1):
+        # y[n] = p[n] (state + (1 - d) sum_k<=n x[k] / p[k]); blocks keep 1 / p finite
+        block = max(1, int(230 / -np.log(decay)))
+        for start in range(0, len(signal), block):
+            x = signal[start:start + block]
+            powers = (decay ** np.arange(1, len(x) + 1)).reshape((-1,) + (1,) * (x.ndim - 1))
+            out[start:start + len(x)] = powers * (state + (1 - decay) *
+                                                  np.cumsum(x / powers, axis=0))
+            state = out[start + len(x) - 1]
+        self.filter_state = state
+        return out
+
+    def trace(self, channel=None):
+        """Buffered (times, values) of one channel, or of their sum"""
+        times, values, _ = self.ring.read()
+        return times, values.sum(axis=1) if channel is None else values[:, channel]
+
+
+class FID(Detector):
+    """Flame ionisation detector: one channel, amount times a per-analyte response
+
+    signal, a gc_signal.SignalGenerator, adds column bleed, drift and noise.
+    """
+
+    channels = ('FID',)
+
+    def __init__(self, registry, rate=20.0, time_constant=0.05, response_factors=None,
+                 signal=None, capacity=65536):
+        factors = np.ones(len(registry)) if response_factors is None else response_factors
+        self.response = np.asarray(factors, dtype=float).reshape(-1, 1)
+        self.signal = signal
+        super().__init__(rate, time_constant, capacity)
+
+    def start(self, t0=0.0, detections=None):
+        super().start(t0, detections)
+        if self.signal is not None:
+            self.signal.start()
+
+    def condition(self, signal, times, temperature_program):
+        if self.signal is None or temperature_program is None:
+            return signal
+        return self.signal.degrade(signal[:, 0], temperature_program, times)[:, None]
+
+
+class MSScan(Detector):
+    """Full-scan mass spectrometer: one channel per m/z in mz_range, `rate` scans/s
+
+    Each analyte's spectrum is normalised to unit total, so the summed channels
+    (the total ion chromatogram) equal the FID-like amount signal.
+    """
+
+    def __init__(self, registry, rate=5.0, time_constant=0.0, mz_range=(29, 300),
+                 capacity=16384):
+        self.channels = tuple(range(mz_range[0], mz_range[1] + 1))
+        self.response = np.zeros((len(registry), len(self.channels)))
+        for code, spectrum in enumerate(spectra(registry)):
+            total = sum(intensity for _, intensity in spectrum)
+            for mz, intensity in spectrum:
+                if mz_range[0] <= mz <= mz_range[1]:
+                    self.response[code, int(mz) - mz_range[0]] += intensity / total
+        super().__init__(rate, time_constant, capacity)
+
+
+class SIM(Detector):
+    """Selected-ion monitoring: only the given m/z channels, so it can sample faster
+
+    ions defaults to the base peak of every registered analyte.
+    """
+
+    def __init__(self, registry, ions=None, rate=20.0, time_constant=0.02, capacity=65536):
+        analyte_spectra = spectra(registry)
+        if ions is None:
+            ions = sorted({int(max(spectrum, key=lambda peak: peak[1])[0])
+                           for spectrum in analyte_spectra})
+        self.channels = tuple(ions)
+        column = {mz: j for j, mz in enumerate(self.channels)}
+        self.response = np.zeros((len(registry), len(self.channels)))
+        for code, spectrum in enumerate(analyte_spectra):
+            total = sum(intensity for _, intensity in spectrum)
+            for mz, intensity in spectrum:
+                if int(mz) in column:
+                    self.response[code, column[int(mz)]] += intensity / total
+        super().__init__(rate, time_constant, capacity)
@@ -0,0 +1,552 @@
+# gc_engine.py
+import numpy as np
+from gc_analytes import AnalyteRegistry, default_registry
+from gc_continuum import ContinuumColumn
+from gc_core import GCParameters, ParticleArrays, ParticleManager, RetentionTable
+from gc_inlet import SplitInlet
+from gc_noise import NoiseService
+from gc_program import FlowProgram, TemperatureProgram
+from gc_vandeemter import VanDeemterTable
+
+# Bump whenever a change alters simulated output, so cached results are invalidated
+ENGINE_VERSION = "0.10"
+ISOTHERMS = ('linear', 'langmuir', 'anti_langmuir')
+OVERLOAD_BIN_WIDTH = 2.0  # Column pixels per concentration bin in overload mode
+
+# Mirrors the slider defaults in GC_SIM.init_ui_components. Retention factors come
+# from the AnalyteRegistry; a setting named after an analyte overrides its RF.
+# count is the particle load delivered to the inlet, of which the split sends
+# 1 / (split_ratio + 1) on-column.
+DEFAULT_SETTINGS = {
+    'count': 25000,
+    'column_length': 1.0,
+    'start_temp': 60,
+    'end_temp': 280,
+    'ramp_rate': 10,
+    'carrier_pressure': 30,
+    'split_ratio': 50,
+    'initial_hold': 1,
+    'final_hold': 1,
+}
+
+
+class DetectorLog:
+    """Growable arrays of detection times, analyte type codes and particle weights"""
+
+    def __init__(self, capacity=1024):
+        self._times = np.empty(capacity)
+        self._types = np.empty(capacity, dtype=np.int32)
+        self._weights = np.empty(capacity)
+        self.size = 0
+
+    def append(self, times, type_codes, weights):
+        end = self.size + len(times)
+        if end > len(self._times):
+            capacity = max(end, 2 * len(self._times))
+            self._times = np.resize(self._times, capacity)
+            self._types = np.resize(self._types, capacity)
+            self._weights = np.resize(self._weights, capacity)
+        self._times[self.size:end] = times
+        self._types[self.size:end] = type_codes
+        self._weights[self.size:end] = weights
+        self.size = end
+
+    def clear(self):
+        self.size = 0
+
+    @property
+    def times(self):
+        return self._times[:self.size]
+
+    @property
+    def types(self):
+        return self._types[:self.size]
+
+    @property
+    def weights(self):
+        return self._weights[:self.size]
+
+
+def smooth_histogram(histogram, smoothing_window=3):
+    """Centred moving average that shrinks its divisor at the start of the run"""
+    n = len(histogram)
+    padded = np.concatenate([histogram, np.zeros(smoothing_window)])
+    cumulative = np.concatenate([[0.0], np.cumsum(padded)])
+    t = np.arange(n)
+    start = np.maximum(0, t - smoothing_window)
+    end = t + smoothing_window + 1
+    return (cumulative[end] - cumulative[start]) / (end - start)
+
+
+class SimulationResult:
+    """Outcome of a finished run: the chromatogram and every detector event
+
+    Events are parallel arrays of detection time, type code and particle weight;
+    type_names maps codes back to analyte names. vented holds the amount per type
+    code that the split inlet sent to the vent instead of the column.
+    """
+
+    def __init__(self, chromatogram, event_times, event_types, type_names, simulation_time,
+                 event_weights=None, vented=None):
+        self.chromatogram = chromatogram
+        self.event_times = event_times
+        self.event_types = event_types
+        self.type_names = type_names
+        self.simulation_time = simulation_time
+        self.event_weights = (event_weights if event_weights is not None
+                              else np.ones(len(event_times)))
+        self.vented = vented if vented is not None else np.zeros(len(type_names))
+
+    def amounts(self):
+        """Total detected weight per analyte name"""
+        totals = np.bincount(self.event_types, weights=self.event_weights,
+                             minlength=len(self.type_names))
+        return dict(zip(self.type_names, totals.tolist()))
+
+    def vented_amounts(self):
+        """Amount per analyte name lost through the split vent"""
+        return dict(zip(self.type_names, np.asarray(self.vented, dtype=float).tolist()))
+
+    @property
+    def detector_counts(self):
+        """Detection times grouped by analyte name"""
+        return {name: self.event_times[self.event_types == code].tolist()
+                for code, name in enumerate(self.type_names)}
+
+
+class SimulationEngine:
+    """Headless GC simulation: injection, particle stepping and detection"""
+
+    def __init__(self, settings=None, gc_params=None, seed=None, registry=None):
+        self.gc_params = gc_params or GCParameters()
+        self.settings = dict(DEFAULT_SETTINGS)
+        if settings:
+            self.settings.update(settings)
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.particle_manager = ParticleManager(self.gc_params, self.rng)
+        self.noise = NoiseService(self.rng.integers(2 ** 63))
+        self.physics_only = False  # Skip the cosmetic y wobble when nothing is drawn
+
+        # Weighted (super-particle) mode: `count` particles represent sample_amount
+        # molecule-equivalents shared between analytes by registry abundance; the
+        # split inlet scales both to their on-column share
+        self.weighted = False
+        self.sample_amount = 1e6
+        self.importance_exponent = 0.5
+        self.min_particles_per_type = 50
+        self.rebalance_target = None  # Active particle count to hold via split/merge
+        self.rebalance_interval = 20  # Steps between rebalances
+        self.step_count = 0
+        self.registry = registry or default_registry()
+        self.solver = 'particles'  # or 'continuum' for ContinuumColumn concentration profiles
+        self.isotherm = 'linear'  # Particle solver only; see overload_factor
+        self.column_capacity = 100.0  # Load per pixel at which an analyte's retention halves
+        self.carrier_gas = 'He'
+        self.uniform = False
+        self.particle_types = self.registry.names  # Analytes present in the sample
+        self.flow_mode = 'constant_flow'
+        self.temperature_segments = None  # (rate, target, hold) list; None = single slider ramp
+        self.pressure_segments = []  # Pressure program used in constant_pressure mode
+        self.temperature_program = None
+        self.flow_program = None
+        self.programs_key = None
+        self.hetp_cache = (None, None)  # (inputs, VanDeemterTable) for the selected gas
+        self.retention_table = None
+        self.retention_key = None
+
+        # Column parameters
+        self.BASE_COLUMN_START_X = 300
+        self.BASE_COLUMN_END_X = 800
+        self.column_start_x = self.BASE_COLUMN_START_X
+        self.column_end_x = self.BASE_COLUMN_END_X
+        self.column_y = 700  # Base Y position for column
+
+        # Initialize simulation state
+        self.particles = ParticleArrays.empty()
+        self.continuum = None
+        self.vented = np.zeros(len(self.registry))  # Split-vent loss per type code
+        self.chromatogram = []
+        self.detections = DetectorLog()
+        self.histogram = np.zeros(0)  # Detections per chromatogram time bin
+        self.time_window = 1.0
+
+        # Simulation control
+        self.running = False
+        self.paused = False
+        self.simulation_time = 0
+        self.initial_hold_complete = False
+        self.final_hold_started = False
+
+    @property
+    def detector_counts(self):
+        """Detection times grouped by analyte name"""
+        times, types = self.detections.times, self.detections.types
+        return {name: times[types == code].tolist()
+                for code, name in enumerate(self.registry.names)}
+
+    def inject_particles(self):
+        """Initialize particle injection"""
+        self.update_geometry()
+        # Restart the clock first: the injection RFs use the oven temperature at t=0
+        self.reset_simulation_parameters()
+
+        # Calculate base parameters
+        base_velocity, diffusion_base = self.gc_params.calculate_flow_parameters(
+            self.settings['carrier_pressure'],
+            self.carrier_gas,
+            self.settings['column_length']
+        )
+
+        # Get temperature factors
+        temp_factor = self.calculate_temp_factor()[0]
+
+        inlet = SplitInlet(self.settings['split_ratio'])
+        injection_width = inlet.band_width
+
+        count = int(self.settings['count'])
+        codes = np.array([self.registry.code(name) for name in self.particle_types],
+                         dtype=np.int32)
+
+        # Amount per type delivered to the inlet
+        if self.weighted:
+            abundance = self.registry.abundance[codes]
+            loaded = self.sample_amount * abundance / abundance.sum()
+        elif self.uniform:
+            loaded = np.full(len(codes), count // len(codes))
+            loaded[:count % len(codes)] += 1
+        else:
+            loaded = np.full(len(codes), count / len(codes))
+
+        # Only the on-column share is ever turned into particles or profiles
+        retention_factors = self.retention_factors()
+        weight = None
+        self.continuum = None
+        if self.solver == 'continuum':
+            self.continuum = ContinuumColumn(
+                codes, loaded * inlet.column_fraction, retention_factors * temp_factor,
+                diffusion_base, self.registry.diffusivity, base_velocity, injection_width / 100,
+                spread=self.gc_params.random_spread
+            )
+            type_code = np.zeros(0, dtype=np.int32)
+        elif self.weighted:
+            # Importance-sampled counts with per-type statistical weights
+            counts, weights = self.particle_manager.allocate_weighted(
+                inlet.budget(count), abundance, self.sample_amount * inlet.column_fraction,
+                self.importance_exponent, self.min_particles_per_type
+            )
+            type_code = np.repeat(codes, counts)
+            weight = np.repeat(weights, counts)
+        elif self.uniform:
+            type_code = np.repeat(codes, inlet.sample(loaded, self.rng))
+        else:
+            # Random distribution
+            on_column = int(inlet.sample(count, self.rng))
+            type_code = codes[self.rng.integers(0, len(codes), on_column)]
+
+        self.vented = np.zeros(len(self.registry))
+        self.vented[codes] = inlet.vented(loaded)
+
+        self.particles = self.particle_manager.create_particles(
+            type_code, self.column_start_x, self.column_y,
+            injection_width, base_velocity, diffusion_base,
+            retention_factors, self.registry.diffusivity,
+            temp_factor, weight
+        )
+
+    def reset_simulation_parameters(self):
+        """Reset all simulation parameters"""
+        self.chromatogram = []
+        self.detections.clear()
+        self.histogram = np.zeros(0)
+        self.running = True
+        self.paused = False
+        self.simulation_time = 0
+        self.step_count = 0
+        self.initial_hold_complete = False
+        self.final_hold_started = False
+
+    def clear(self):
+        """Remove all particles and start over"""
+        self.particles = ParticleArrays.empty()
+        self.continuum = None
+        self.vented = np.zeros(len(self.registry))
+        self.reset_simulation_parameters()
+
+    def run_config(self):
+        """Everything besides settings and seed that changes a run's output"""
+        return {
+            'carrier_gas': self.carrier_gas,
+            'uniform': self.uniform,
+            'particle_types': list(self.particle_types),
+            'flow_mode': self.flow_mode,
+            'temperature_segments': self.temperature_segments,
+            'pressure_segments': self.pressure_segments,
+            'registry': self.registry.to_list(),
+            'solver': self.solver,
+            'isotherm': self.isotherm,
+            'column_capacity': self.column_capacity,
+            'weighted': self.weighted,
+            'sample_amount': self.sample_amount,
+            'importance_exponent': self.importance_exponent,
+            'min_particles_per_type': self.min_particles_per_type,
+            'rebalance_target': self.rebalance_target,
+            'rebalance_interval': self.rebalance_interval,
+        }
+
+    def apply_run_config(self, config):
+        """Inverse of run_config"""
+        for name, value in config.items():
+            if name == 'registry':
+                value = AnalyteRegistry.from_list(value)
+            setattr(self, name, value)
+
+    def compile_programs(self):
+        """Rebuild the oven and carrier programs whenever their inputs change"""
+        if self.temperature_segments:
+            segments = [tuple(segment) for segment in self.temperature_segments]
+        else:
+            segments = [(self.settings['ramp_rate'], self.settings['end_temp'],
+                         self.settings['final_hold'])]
+        pressure_segments = [tuple(segment) for segment in self.pressure_segments]
+        key = (self.settings['start_temp'], self.settings['initial_hold'], tuple(segments),
+               self.settings['carrier_pressure'], self.settings['column_length'],
+               self.carrier_gas, self.flow_mode,
+               tuple(pressure_segments))
+        if key == self.programs_key:
+            return
+
+        self.temperature_program = TemperatureProgram(
+            self.settings['start_temp'], self.settings['initial_hold'], segments
+        )
+        base_velocity, _ = self.gc_params.calculate_flow_parameters(
+            self.settings['carrier_pressure'],
+            self.carrier_gas,
+            self.settings['column_length']
+        )
+        self.flow_program = FlowProgram(
+            self.temperature_program, self.settings['carrier_pressure'], base_velocity,
+            self.flow_mode, pressure_segments
+        )
+        self.programs_key = key
+
+    def compile_retention(self):
+        """Rebuild the k(T) table whenever the analytes or the start temperature change"""
+        registry = self.registry
+        key = (self.settings['start_temp'], self.gc_params.default_delta_H,
+               registry.delta_H.tobytes(), registry.delta_S.tobytes())
+        if key != self.retention_key:
+            self.retention_table = RetentionTable(self.gc_params, registry,
+                                                  self.settings['start_temp'])
+            self.retention_key = key
+        return self.retention_table
+
+    def retention_factors(self):
+        """Injection RF per type code: slider overrides, or k(start_temp) if thermodynamic"""
+        return self.compile_retention().retention_factors(
+            self.registry.retention_factors(self.settings))
+
+    def hetp_table(self):
+        """Per-analyte HETP curves for the selected carrier gas, rebuilt when inputs change"""
+        rf = self.retention_factors()
+        key = (self.carrier_gas, rf.tobytes(), self.registry.diffusivity.tobytes())
+        if key != self.hetp_cache[0]:
+            self.hetp_cache = (key, VanDeemterTable(self.gc_params, self.registry, self.settings,
+                                                    [self.carrier_gas], retention_factors=rf))
+        return self.hetp_cache[1]
+
+    def calculate_temp_factor(self):
+        """Calculate per-type temperature factors and the current temperature"""
+        self.compile_programs()
+        current_temp, self.initial_hold_complete, self.final_hold_started = \
+            self.temperature_program.state(self.simulation_time)
+
+        temp_factor = self.compile_retention().lookup(current_temp)
+        return temp_factor, current_temp
+
+    def update(self, dt, steps=1):
+        """Advance `steps` steps of dt, then refresh the chromatogram once"""
+        advanced = False
+        for _ in range(steps):
+            if not self.step(dt):
+                break
+            advanced = True
+        if advanced:
+            self.update_chromatogram()
+
+    def update_geometry(self):
+        """Scale the column ends to the column_length setting"""
+        length_factor = self.settings['column_length']
+        self.column_start_x = int(self.BASE_COLUMN_START_X * length_factor)
+        self.column_end_x = int(self.BASE_COLUMN_END_X * length_factor)
+
+    def step(self, dt):
+        """Advance the physics by one step of dt; False if the run is stopped or paused"""
+        self.update_geometry()
+
+        if not self.running or self.paused:
+            return False
+
+        self.simulation_time += dt
+        temp_factor, current_temp = self.calculate_temp_factor()
+        flow_factor = self.flow_program.flow_factor(self.simulation_time)
+
+        # Update particles still in the column
+        particles = self.particles
+        idx = particles.active()
+        if len(idx):
+            type_code = particles.type_code[idx]
+            particle_factor = temp_factor[type_code]
+            if self.isotherm != 'linear':
+                particle_factor = particle_factor * self.overload_factor(idx)
+            noise = None if self.physics_only else self.noise
+            x_before = particles.x[idx]
+            particles.move(idx, self.simulation_time, dt, particle_factor, current_temp,
+                           self.column_y, noise, flow_factor)
+            x_after = particles.x[idx]
+            crossed = x_after >= self.column_end_x
+            if crossed.any():
+                # Detector time is when the straight-line path crossed column_end_x
+                before, after = x_before[crossed], x_after[crossed]
+                fraction = np.clip((self.column_end_x - before) / (after - before), 0, 1)
+                hits = idx[crossed]
+                particles.detected[hits] = True
+                self.record_detections(hits, self.simulation_time - dt * (1 - fraction))
+
+        if self.continuum is not None:
+            outflow = self.continuum.step(dt, flow_factor, temp_factor,
+                                          self.column_end_x - self.column_start_x)
+            self.record_outflow(self.continuum.outflow_by_code(outflow, len(self.registry)))
+
+        self.step_count += 1
+        if self.rebalance_target and self.step_count % self.rebalance_interval == 0:
+            self.rebalance()
+        return True
+
+    def overload_factor(self, idx):
+        """Temperature-factor multiplier per particle from its own analyte's local load
+
+        The load comes from one binned pass over the column (linear in the
+        particle count). A Langmuir isotherm saturates, so the retention factor
+        drops to k / (1 + c / column_capacity) where the band is concentrated,
+        giving a sharp front and a tail; anti-Langmuir raises it to
+        k * (1 + c / column_capacity), so overloaded bands front.
+        """
+        length = self.column_end_x - self.column_start_x
+        bins = max(1, int(length / OVERLOAD_BIN_WIDTH))
+        load = self.particles.local_density(idx, self.column_start_x, self.column_end_x,
+                                            bins, len(self.registry))
+        saturation = 1 + load * (bins / length) / self.column_capacity
+        return saturation if self.isotherm == 'langmuir' else 1 / saturation
+
+    def column_density(self, bins):
+        """Amount per (type code, x bin) between column_start_x and column_end_x"""
+        n_types = len(self.registry)
+        density = self.particles.density(self.particles.active(), self.column_start_x,
+                                         self.column_end_x, bins, n_types)
+        if self.continuum is not None:
+            density += self.continuum.density(self.column_end_x - self.column_start_x,
+                                              bins, n_types)
+        return density
+
+    def record_detections(self, hits, times=None):
+        """Log detector events for the particle indices in hits, in time order
+
+        times defaults to the current simulation time for every hit.
+        """
+        if times is None:
+            times = np.full(len(hits), float(self.simulation_time))
+        order = np.argsort(times, kind='stable')
+        hits, times = hits[order], times[order]
+        weights = self.particles.weight[hits]
+        self.detections.append(times, self.particles.type_code[hits], weights)
+        self.add_to_histogram(times, weights)
+
+    def record_outflow(self, amounts):
+        """Log the continuum outlet flux as one weighted event per type code this step"""
+        codes = np.flatnonzero(amounts > 0)
+        if len(codes) == 0:
+            return
+        times = np.full(len(codes), float(self.simulation_time))
+        self.detections.append(times, codes, amounts[codes])
+        self.add_to_histogram(times, amounts[codes])
+
+    def add_to_histogram(self, times, amounts):
+        """Add event amounts to the chromatogram bins their times fall in"""
+        bins = (times / self.time_window).astype(np.int64)
+        top = int(bins.max())
+        if top >= len(self.histogram):
+            self.histogram = np.concatenate([self.histogram, np.zeros(top + 1 - len(self.histogram))])
+        np.add.at(self.histogram, bins, amounts)
+
+    def rebalance(self):
+        """Hold the active particle count near rebalance_target
+
+        Too many: merge particles with the same type, pixel and RF to within 0.5%,
+        which travel together anyway. Too few (late in the run, with only the tail
+        left): split the heaviest particles so the remaining peaks keep resolution.
+        """
+        idx = self.particles.active()
+        target = self.rebalance_target
+        if len(idx) > target * 1.25:
+            self.particles.merge(idx, x_bin=1.0, rf_bin=0.005)
+        elif 0 < len(idx) < target * 0.5:
+            n = min(len(idx), target - len(idx))
+            heaviest = idx[np.argsort(self.particles.weight[idx])[-n:]]
+            self.particles.split(heaviest, self.rng)
+
+    def update_chromatogram(self):
+        """Update chromatogram data"""
+        if not self.running:
+            return
+
+        injected = len(self.particles) or self.continuum is not None
+        current_time = self.simulation_time if injected else 0
+        n_bins = int((current_time + 1) / self.time_window) + 1
+        histogram = np.zeros(max(n_bins, len(self.histogram)))
+        histogram[:len(self.histogram)] = self.histogram
+
+        counts = smooth_histogram(histogram)
+        times = np.arange(len(histogram)) * self.time_window
+        self.chromatogram = list(zip(times.tolist(), counts.tolist()))
+
+    def progress(self):
+        """Fraction of the injected amount that has reached the detector"""
+        total = self.particles.weight.sum()
+        done = self.particles.weight[self.particles.detected].sum()
+        if self.continuum is not None:
+            total += self.continuum.amount.sum()
+            done += self.continuum.passed.sum()
+        return float(done / total) if total > 0 else 0.0
+
+    def is_complete(self):
+        """True once every injected particle (or profile) has reached the detector"""
+        if self.continuum is not None and not self.continuum.is_complete():
+            return False
+        return bool(self.particles.detected.all())
+
+    def result(self):
+        """Package the current state as a SimulationResult"""
+        return SimulationResult(
+            list(self.chromatogram),
+            self.detections.times.copy(),
+            self.detections.types.copy(),
+            self.registry.names,
+            self.simulation_time,
+            self.detections.weights.copy(),
+            self.vented.copy()
+        )
+
+    def run_headless(self, dt=0.5, max_time=3600, progress=None):
+        """Inject and step until every particle is detected or max_time (s) passes
+
+        Nothing is rendered, so the run is physics-only. progress, if given, is
+        called with the engine after every step.
+        """
+        self.physics_only = True
+        self.inject_particles()
+        while self.simulation_time < max_time and not self.is_complete():
+            self.update(dt)
+            if progress is not None:
+                progress(self)
+        return self.result()
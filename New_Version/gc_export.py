@@ -0,0 +1,515 @@
+# gc_export.py
+"""
+Chromatography data export in interchange layouts.
+
+    <base>.cdf     ANDI/AIA chromatography (netCDF classic): the FID trace
+    <base>-ms.cdf  ANDI-MS (netCDF classic): centroided full-scan spectra
+    <base>.mzML    mzML: the same scans as base64 binary arrays, plus FID and
+                   TIC chromatograms
+
+Writers take samples chunk by chunk as detectors produce them. netCDF needs
+every dimension in its header, so each variable is spooled to a temporary file
+and the header plus spools are copied out on close. mzML spectra are written
+straight through; the chromatogram arrays are spooled and base64-encoded in
+blocks on close. Memory therefore stays bounded by the chunk size, however
+long the run.
+
+export_run streams a live headless run; batch mode converts every result JSON
+in a sequence output directory in a process pool. Result files carry every
+detector event with its statistical weight, so weighted and continuum runs
+export the same amounts as a live run.
+
+Usage: python gc_export.py sequence_results --out exported --workers 4
+       python gc_export.py method.toml --out exported --seed 1
+"""
+
+import argparse
+import base64
+import glob
+import json
+import os
+import shutil
+import struct
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import quoteattr
+import numpy as np
+from gc_detector import FID, MSScan
+from gc_engine import ENGINE_VERSION, DetectorLog, SimulationEngine
+from gc_method import Method
+
+NC_TYPES = {np.dtype('>i1'): 1, np.dtype('>i2'): 3, np.dtype('>i4'): 4,
+            np.dtype('>f4'): 5, np.dtype('>f8'): 6}
+NC_CHAR = 2
+NC_DIMENSION, NC_VARIABLE, NC_ATTRIBUTE = 0x0A, 0x0B, 0x0C
+COPY_BLOCK = 1 << 20  # Bytes per read when copying spools; a multiple of 3 for base64
+
+
+def nc_name(name):
+    data = name.encode('utf-8')
+    return struct.pack('>i', len(data)) + data + b'\0' * (-len(data) % 4)
+
+
+def nc_attributes(attributes):
+    """Encode an attribute list; str becomes NC_CHAR, int NC_INT, float NC_DOUBLE"""
+    if not attributes:
+        return struct.pack('>ii', 0, 0)
+    parts = [struct.pack('>ii', NC_ATTRIBUTE, len(attributes))]
+    for name, value in attributes.items():
+        if isinstance(value, str):
+            data, nc_type, count = value.encode('utf-8'), NC_CHAR, len(value.encode('utf-8'))
+        else:
+            array = np.atleast_1d(np.asarray(value, dtype='>i4' if isinstance(value, int) else '>f8'))
+            data, nc_type, count = array.tobytes(), NC_TYPES[array.dtype], len(array)
+        parts.append(nc_name(name) + struct.pack('>ii', nc_type, count) +
+                     data + b'\0' * (-len(data) % 4))
+    return b''.join(parts)
+
+
+class CDFWriter:
+    """Streaming writer for netCDF classic (64-bit offset) files of 1-D variables
+
+    Declare variables with variable(), feed them with append() in any order and
+    call close(); a dimension's length is however many values its variables
+    received. Scalar variables (dimension None) take a single value.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.attributes = {}
+        self.variables = {}  # name -> [dtype, dimension, attributes, spool, count]
+
+    def attribute(self, name, value):
+        self.attributes[name] = value
+
+    def variable(self, name, dtype, dimension=None, **attributes):
+        dtype = np.dtype(dtype).newbyteorder('>')
+        self.variables[name] = [dtype, dimension, attributes, tempfile.TemporaryFile(), 0]
+
+    def append(self, name, values):
+        entry = self.variables[name]
+        data = np.ascontiguousarray(np.atleast_1d(values), dtype=entry[0])
+        entry[3].write(data.tobytes())
+        entry[4] += len(data)
+
+    def header(self, lengths, begins):
+        dimensions = list(lengths)
+        parts = [b'CDF\x02', struct.pack('>i', 0)]
+        parts.append(struct.pack('>ii', NC_DIMENSION, len(dimensions)) +
+                     b''.join(nc_name(name) + struct.pack('>i', lengths[name])
+                              for name in dimensions))
+        parts.append(nc_attributes(self.attributes))
+        parts.append(struct.pack('>ii', NC_VARIABLE, len(self.variables)))
+        for (name, (dtype, dimension, attributes, _, count)), begin in zip(self.variables.items(),
+                                                                          begins):
+            dims = [] if dimension is None else [dimensions.index(dimension)]
+            size = count * dtype.itemsize
+            parts.append(nc_name(name) + struct.pack('>i', len(dims)) +
+                         b''.join(struct.pack('>i', d) for d in dims) +
+                         nc_attributes(attributes) +
+                         struct.pack('>iiq', NC_TYPES[dtype], size + (-size % 4), begin))
+        return b''.join(parts)
+
+    def close(self):
+        """Write header and data, atomically replacing path"""
+        lengths = {}
+        for name, (_, dimension, _, _, count) in self.variables.items():
+            if dimension is None:
+                if count != 1:
+                    raise ValueError(f"Scalar variable '{name}' needs exactly one value")
+                continue
+            if count == 0:
+                raise ValueError(f"Variable '{name}' has no data")  # 0 would mean unlimited
+            if lengths.setdefault(dimension, count) != count:
+                raise ValueError(f"Variables along '{dimension}' have different lengths")
+
+        offset = len(self.header(lengths, [0] * len(self.variables)))
+        begins = []
+        for dtype, _, _, _, count in self.variables.values():
+            begins.append(offset)
+            offset += count * dtype.itemsize + (-count * dtype.itemsize % 4)
+
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self.header(lengths, begins))
+            for dtype, _, _, spool, count in self.variables.values():
+                spool.seek(0)
+                shutil.copyfileobj(spool, f, COPY_BLOCK)
+                f.write(b'\0' * (-count * dtype.itemsize % 4))
+                spool.close()
+        os.replace(tmp_path, self.path)
+
+
+class AndiChromatogramWriter:
+    """ANDI/AIA chromatography file (ASTM E1947) for one fixed-rate detector channel"""
+
+    def __init__(self, path, rate, title='', detector_name='FID', detector_unit='pA'):
+        self.cdf = CDFWriter(path)
+        self.rate = rate
+        self.start_time = None
+        self.end_time = 0.0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+        for name, value in (('dataset_completeness', 'C1+C2'),
+                            ('aia_template_revision', '1.0'),
+                            ('netcdf_revision', '2.3.2'),
+                            ('languages', 'English'),
+                            ('dataset_origin', 'GCMS simulation'),
+                            ('experiment_title', title),
+                            ('experiment_date_time_stamp', time.strftime('%Y%m%d%H%M%S+0000',
+                                                                         time.gmtime())),
+                            ('detector_name', detector_name),
+                            ('detector_unit', detector_unit),
+                            ('raw_data_retention_unit', 'seconds'),
+                            ('software_version', ENGINE_VERSION)):
+            self.cdf.attribute(name, value)
+        for name in ('detector_maximum_value', 'detector_minimum_value', 'actual_run_time_length',
+                     'actual_sampling_interval', 'actual_delay_time'):
+            self.cdf.variable(name, 'f4')
+        self.cdf.variable('ordinate_values', 'f4', 'point_number')
+
+    def write(self, times, values):
+        if len(times) == 0:
+            return
+        if self.start_time is None:
+            self.start_time = float(times[0])
+        self.end_time = float(times[-1])
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+        self.cdf.append('ordinate_values', values)
+
+    def close(self):
+        interval = 1 / self.rate
+        self.cdf.append('detector_maximum_value', self.maximum)
+        self.cdf.append('detector_minimum_value', self.minimum)
+        self.cdf.append('actual_run_time_length', self.end_time - (self.start_time or 0) + interval)
+        self.cdf.append('actual_sampling_interval', interval)
+        self.cdf.append('actual_delay_time', self.start_time or 0.0)
+        self.cdf.close()
+
+
+class AndiMSWriter:
+    """ANDI-MS file (ASTM E2077) of centroided scans: only m/z with signal are stored"""
+
+    def __init__(self, path, title=''):
+        self.cdf = CDFWriter(path)
+        for name, value in (('dataset_completeness', 'C1+C2'),
+                            ('ms_template_revision', '1.0.1'),
+                            ('netcdf_revision', '2.3.2'),
+                            ('languages', 'English'),
+                            ('dataset_origin', 'GCMS simulation'),
+                            ('experiment_title', title),
+                            ('experiment_type', 'Centroided Mass Spectrum'),
+                            ('raw_data_mass_format', 'Float'),
+                            ('raw_data_time_format', 'Double'),
+                            ('raw_data_intensity_format', 'Float'),
+                            ('units', 'Seconds'),
+                            ('software_version', ENGINE_VERSION)):
+            self.cdf.attribute(name, value)
+        for name, dtype in (('scan_acquisition_time', 'f8'), ('total_intensity', 'f8'),
+                            ('mass_range_min', 'f8'), ('mass_range_max', 'f8'),
+                            ('scan_index', 'i4'), ('point_count', 'i4')):
+            self.cdf.variable(name, dtype, 'scan_number')
+        self.cdf.variable('mass_values', 'f4', 'point_number', units='M/Z')
+        self.cdf.variable('intensity_values', 'f4', 'point_number', units='Arbitrary Intensity Units')
+        self.points = 0
+
+    def write_scans(self, times, mz, intensities):
+        """times (scans,), mz (channels,), intensities (scans, channels)"""
+        if len(times) == 0:
+            return
+        scan, channel = np.nonzero(intensities > 0)
+        counts = np.bincount(scan, minlength=len(times))
+        self.cdf.append('scan_acquisition_time', times)
+        self.cdf.append('total_intensity', intensities.sum(axis=1))
+        self.cdf.append('mass_range_min', np.full(len(times), mz[0]))
+        self.cdf.append('mass_range_max', np.full(len(times), mz[-1]))
+        self.cdf.append('scan_index', self.points + np.concatenate([[0], np.cumsum(counts)[:-1]]))
+        self.cdf.append('point_count', counts)
+        self.cdf.append('mass_values', mz[channel])
+        self.cdf.append('intensity_values', intensities[scan, channel])
+        self.points += len(scan)
+
+    def close(self):
+        if self.points == 0:  # netCDF classic has no empty fixed dimensions
+            self.cdf.append('mass_values', 0.0)
+            self.cdf.append('intensity_values', 0.0)
+        self.cdf.close()
+
+
+def encode_array(values, dtype, compress):
+    data = np.ascontiguousarray(values, dtype=dtype).tobytes()
+    return base64.b64encode(zlib.compress(data) if compress else data).decode('ascii')
+
+
+def binary_array(encoded, dtype, kind, compress):
+    """One <binaryDataArray>; kind is (accession, name, unit accession, unit name, unit CV)"""
+    precision = ('MS:1000523', '64-bit float') if dtype == '<f8' else ('MS:1000521', '32-bit float')
+    compression = ('MS:1000574', 'zlib compression') if compress else \
+        ('MS:1000576', 'no compression')
+    accession, name, unit_accession, unit_name, unit_cv = kind
+    return (f'<binaryDataArray encodedLength="{len(encoded)}">'
+            f'<cvParam cvRef="MS" accession="{precision[0]}" name="{precision[1]}"/>'
+            f'<cvParam cvRef="MS" accession="{compression[0]}" name="{compression[1]}"/>'
+            f'<cvParam cvRef="MS" accession="{accession}" name="{name}" '
+            f'unitCvRef="{unit_cv}" unitAccession="{unit_accession}" unitName="{unit_name}"/>'
+            f'<binary>{encoded}</binary></binaryDataArray>')
+
+
+MZ_ARRAY = ('MS:1000514', 'm/z array', 'MS:1000040', 'm/z', 'MS')
+INTENSITY_ARRAY = ('MS:1000515', 'intensity array', 'MS:1000131', 'number of detector counts', 'MS')
+TIME_ARRAY = ('MS:1000595', 'time array', 'UO:0000010', 'second', 'UO')
+COUNT_WIDTH = 10  # Zero-padded digits of the spectrumList count, patched on close
+
+
+class MzMLWriter:
+    """Streaming mzML: spectra are written as they arrive, chromatograms on close"""
+
+    def __init__(self, path, run_id='run', compress=True):
+        self.path = path
+        self.compress = compress
+        self.f = open(path + '.tmp', 'w+', encoding='utf-8')
+        self.spectra = 0
+        self.chromatograms = {}  # id -> (accession, name, time spool, intensity spool, count)
+        self.f.write(
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<mzML xmlns="http://psi.hupo.org/ms/mzml" version="1.1.0">\n'
+            '<cvList count="2">'
+            '<cv id="MS" fullName="Proteomics Standards Initiative Mass Spectrometry Ontology" '
+            'URI="https://raw.githubusercontent.com/HUPO-PSI/psi-ms-CV/master/psi-ms.obo"/>'
+            '<cv id="UO" fullName="Unit Ontology" '
+            'URI="http://ontologies.berkeleybop.org/uo.obo"/></cvList>\n'
+            '<fileDescription><fileContent>'
+            '<cvParam cvRef="MS" accession="MS:1000579" name="MS1 spectrum"/>'
+            '</fileContent></fileDescription>\n'
+            f'<softwareList count="1"><software id="gc_sim" version="{ENGINE_VERSION}"/>'
+            '</softwareList>\n'
+            '<instrumentConfigurationList count="1"><instrumentConfiguration id="IC1"/>'
+            '</instrumentConfigurationList>\n'
+            '<dataProcessingList count="1"><dataProcessing id="DP1">'
+            '<processingMethod order="1" softwareRef="gc_sim">'
+            '<cvParam cvRef="MS" accession="MS:1000544" name="Conversion to mzML"/>'
+            '</processingMethod></dataProcessing></dataProcessingList>\n'
+            f'<run id={quoteattr(run_id)} defaultInstrumentConfigurationRef="IC1">\n'
+            '<spectrumList count="')
+        self.count_offset = self.f.tell()
+        self.f.write(' ' * COUNT_WIDTH + '" defaultDataProcessingRef="DP1">\n')
+
+    def write_scans(self, times, mz, intensities):
+        """Append one MS1 spectrum per row of intensities (scans, channels)"""
+        for t, row in zip(times, intensities):
+            keep = row > 0
+            peaks_mz, peaks = mz[keep], row[keep]
+            arrays = (binary_array(encode_array(peaks_mz, '<f8', self.compress), '<f8',
+                                   MZ_ARRAY, self.compress) +
+                      binary_array(encode_array(peaks, '<f4', self.compress), '<f4',
+                                   INTENSITY_ARRAY, self.compress))
+            self.f.write(
+                f'<spectrum index="{self.spectra}" id="scan={self.spectra + 1}" '
+                f'defaultArrayLength="{len(peaks)}">'
+                '<cvParam cvRef="MS" accession="MS:1000511" name="ms level" value="1"/>'
+                '<cvParam cvRef="MS" accession="MS:1000579" name="MS1 spectrum"/>'
+                '<cvParam cvRef="MS" accession="MS:1000127" name="centroid spectrum"/>'
+                f'<cvParam cvRef="MS" accession="MS:1000285" name="total ion current" '
+                f'value="{float(peaks.sum()):.6g}"/>'
+                '<scanList count="1">'
+                '<cvParam cvRef="MS" accession="MS:1000795" name="no combination"/>'
+                '<scan><cvParam cvRef="MS" accession="MS:1000016" name="scan start time" '
+                f'value="{t:.4f}" unitCvRef="UO" unitAccession="UO:0000010" unitName="second"/>'
+                '</scan></scanList>'
+                f'<binaryDataArrayList count="2">{arrays}</binaryDataArrayList></spectrum>\n')
+            self.spectra += 1
+
+    def chromatogram(self, chromatogram_id, accession, name):
+        """Declare a chromatogram to be filled with append_chromatogram"""
+        self.chromatograms[chromatogram_id] = [accession, name, tempfile.TemporaryFile(),
+                                               tempfile.TemporaryFile(), 0]
+
+    def append_chromatogram(self, chromatogram_id, times, values):
+        entry = self.chromatograms[chromatogram_id]
+        entry[2].write(np.asarray(times, dtype='<f8').tobytes())
+        entry[3].write(np.asarray(values, dtype='<f4').tobytes())
+        entry[4] += len(times)
+
+    def write_spool(self, spool, dtype, kind):
+        """Stream a spooled array out as an uncompressed base64 binaryDataArray"""
+        size = spool.seek(0, os.SEEK_END)
+        spool.seek(0)
+        precision = ('MS:1000523', '64-bit float') if dtype == '<f8' else \
+            ('MS:1000521', '32-bit float')
+        accession, name, unit_accession, unit_name, unit_cv = kind
+        self.f.write(f'<binaryDataArray encodedLength="{4 * ((size + 2) // 3)}">'
+                     f'<cvParam cvRef="MS" accession="{precision[0]}" name="{precision[1]}"/>'
+                     '<cvParam cvRef="MS" accession="MS:1000576" name="no compression"/>'
+                     f'<cvParam cvRef="MS" accession="{accession}" name="{name}" '
+                     f'unitCvRef="{unit_cv}" unitAccession="{unit_accession}" '
+                     f'unitName="{unit_name}"/><binary>')
+        while True:
+            block = spool.read(COPY_BLOCK - COPY_BLOCK % 3)  # Whole base64 quanta per block
+            if not block:
+                break
+            self.f.write(base64.b64encode(block).decode('ascii'))
+        self.f.write('</binary></binaryDataArray>')
+        spool.close()
+
+    def close(self):
+        self.f.write('</spectrumList>\n')
+        self.f.write(f'<chromatogramList count="{len(self.chromatograms)}" '
+                     'defaultDataProcessingRef="DP1">\n')
+        for index, (chromatogram_id, (accession, name, times, values, count)) in \
+                enumerate(self.chromatograms.items()):
+            self.f.write(f'<chromatogram index="{index}" id={quoteattr(chromatogram_id)} '
+                         f'defaultArrayLength="{count}">'
+                         f'<cvParam cvRef="MS" accession="{accession}" name="{name}"/>'
+                         '<binaryDataArrayList count="2">')
+            self.write_spool(times, '<f8', TIME_ARRAY)
+            self.write_spool(values, '<f4', INTENSITY_ARRAY)
+            self.f.write('</binaryDataArrayList></chromatogram>\n')
+        self.f.write('</chromatogramList>\n</run>\n</mzML>\n')
+        self.f.seek(self.count_offset)
+        self.f.write(str(self.spectra).zfill(COUNT_WIDTH))
+        self.f.close()
+        os.replace(self.path + '.tmp', self.path)
+
+
+class RunExporter:
+    """Feeds FID and MS-scan detector samples to the chosen writers, chunk by chunk
+
+    formats is any of 'cdf' (ANDI chromatography + ANDI-MS) and 'mzml'. Call
+    feed() as the event log grows (after engine steps, or over a saved log in
+    time chunks) and close() at the end.
+    """
+
+    def __init__(self, base_path, registry, formats=('cdf', 'mzml'), title='', ms=True,
+                 fid=None, scan=None):
+        self.fid = fid or FID(registry)
+        self.scan = (scan or MSScan(registry)) if ms else None
+        self.positions = {'fid': 0, 'scan': 0}
+        self.writers = []
+        self.andi = self.andi_ms = self.mzml = None
+        if 'cdf' in formats:
+            self.andi = AndiChromatogramWriter(base_path + '.cdf', self.fid.rate, title)
+            if self.scan is not None:
+                self.andi_ms = AndiMSWriter(base_path + '-ms.cdf', title)
+        if 'mzml' in formats:
+            self.mzml = MzMLWriter(base_path + '.mzML', os.path.basename(base_path))
+            self.mzml.chromatogram('FID', 'MS:1000810', 'ion current chromatogram')
+            if self.scan is not None:
+                self.mzml.chromatogram('TIC', 'MS:1000235', 'total ion current chromatogram')
+        self.paths = [w.path for w in (self.andi and self.andi.cdf, self.andi_ms and self.andi_ms.cdf,
+                                       self.mzml) if w]
+
+    def feed(self, detections, until, temperature_program=None):
+        """Acquire and write everything the detectors can sample up to `until`"""
+        if self.fid.acquire(detections, until, temperature_program):
+            times, values, self.positions['fid'] = self.fid.ring.read(self.positions['fid'])
+            if self.andi:
+                self.andi.write(times, values[:, 0])
+            if self.mzml:
+                self.mzml.append_chromatogram('FID', times, values[:, 0])
+        if self.scan is not None and self.scan.acquire(detections, until, temperature_program):
+            times, values, self.positions['scan'] = self.scan.ring.read(self.positions['scan'])
+            mz = np.array(self.scan.channels, dtype=float)
+            if self.andi_ms:
+                self.andi_ms.write_scans(times, mz, values)
+            if self.mzml:
+                self.mzml.write_scans(times, mz, values)
+                self.mzml.append_chromatogram('TIC', times, values.sum(axis=1))
+
+    def close(self):
+        for writer in (self.andi, self.andi_ms, self.mzml):
+            if writer:
+                writer.close()
+        return self.paths
+
+
+def export_run(engine, base_path, formats=('cdf', 'mzml'), title='', dt=0.5, max_time=3600):
+    """Inject and run engine headless, exporting detector samples as they are produced"""
+    engine.physics_only = True
+    engine.inject_particles()
+    exporter = RunExporter(base_path, engine.registry, formats, title)
+    while engine.simulation_time < max_time and not engine.is_complete():
+        engine.step(dt)
+        exporter.feed(engine.detections, engine.simulation_time, engine.temperature_program)
+    exporter.feed(engine.detections, engine.simulation_time + 1.0, engine.temperature_program)
+    return exporter.close()
+
+
+def detections_from_result(data, registry):
+    """DetectorLog of a result JSON's weighted events, with codes mapped onto registry"""
+    codes = np.array([registry.code(name) for name in data['type_names']], dtype=np.int32)
+    times = np.asarray(data['event_times'], dtype=float)
+    order = np.argsort(times, kind='stable')
+    log = DetectorLog(max(1024, len(times)))
+    log.append(times[order], codes[np.asarray(data['event_types'], dtype=np.int64)[order]],
+               np.asarray(data['event_weights'], dtype=float)[order])
+    return log
+
+
+def convert_result(path, output_dir, formats=('cdf', 'mzml'), chunk=60.0):
+    """Worker entry point: export one sequence/checkpoint result JSON"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    registry = Method.from_dict(data['method']).registry()
+    detections = detections_from_result(data, registry)
+    name = os.path.splitext(os.path.basename(path))[0]
+    exporter = RunExporter(os.path.join(output_dir, name), registry, formats,
+                           title=data['method'].get('name', name))
+    end = data['simulation_time'] + 1.0  # Close the window the last event fell in
+    until = 0.0
+    while until < end:
+        until = min(until + chunk, end)
+        exporter.feed(detections, until)
+    return exporter.close()
+
+
+def convert_directory(directory, output_dir, workers=None, formats=('cdf', 'mzml')):
+    """Export every result JSON in directory in parallel; returns {input: outputs or error}"""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = [path for path in sorted(glob.glob(os.path.join(directory, '*.json')))
+             if os.path.basename(path) != 'sequence_summary.json']
+    outcome = {}
+    with ProcessPoolExecutor(workers) as pool:
+        futures = {pool.submit(convert_result, path, output_dir, formats): path for path in paths}
+        for future, path in futures.items():
+            try:
+                outcome[path] = future.result()
+            except Exception as e:
+                outcome[path] = e
+    return outcome
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export sequence results as ANDI CDF and mzML")
+    parser.add_argument('source', help="Directory of result JSON files, or a method file to run")
+    parser.add_argument('--out', default='exported', help="Output directory")
+    parser.add_argument('--workers', type=int, default=None, help="Conversion processes")
+    parser.add_argument('--formats', default='cdf,mzml', help="Comma-separated: cdf, mzml")
+    parser.add_argument('--seed', type=int, default=None, help="Random seed for a method run")
+    args = parser.parse_args()
+    formats = tuple(args.formats.split(','))
+
+    if not os.path.isdir(args.source):
+        os.makedirs(args.out, exist_ok=True)
+        method = Method.load(args.source)
+        engine = method.configure(SimulationEngine(seed=args.seed))
+        base = os.path.join(args.out, os.path.splitext(os.path.basename(args.source))[0])
+        paths = export_run(engine, base, formats, method.name)
+        print(f"Wrote {', '.join(paths)}")
+        return 0
+
+    outcome = convert_directory(args.source, args.out, args.workers, formats)
+    failed = 0
+    for path, result in outcome.items():
+        if isinstance(result, Exception):
+            failed += 1
+            print(f"{os.path.basename(path)}: failed ({result})")
+        else:
+            print(f"{os.path.basename(path)}: {', '.join(os.path.basename(p) for p in result)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
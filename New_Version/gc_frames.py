@@ -0,0 +1,145 @@
+# gc_frames.py
+"""
+Offscreen frame export for teaching videos.
+
+Runs the GUI simulation under SDL's dummy video driver and renders every
+frame through GCMSSimulation.draw into one of a ring of offscreen surfaces.
+Each surface's pixels are handed to a thread pool as a surfarray view (no
+copy) and encoded to a numbered PNG or PPM while the next frames render; a
+surface is only drawn on again once its encoder has finished with it.
+The simulated time per frame is independent of wall-clock time, so a run can
+be exported faster or slower than it would play live.
+
+Usage: python gc_frames.py --out frames --fps 30 --speed 30 --workers 4
+       ffmpeg -framerate 30 -i frames/frame_%05d.png separation.mp4
+"""
+
+import argparse
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pygame
+from GC_SIM import GCMSSimulation
+from gc_method import Method
+
+
+def png_chunk(kind, data):
+    return (struct.pack('>I', len(data)) + kind + data +
+            struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+
+def encode_png(pixels, path, level=3):
+    """Write a (width, height, 3) uint8 surfarray view as an RGB PNG"""
+    width, height = pixels.shape[:2]
+    rows = np.zeros((height, 1 + width * 3), dtype=np.uint8)  # Filter byte 0 per row
+    rows[:, 1:] = pixels.transpose(1, 0, 2).reshape(height, width * 3)
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        f.write(png_chunk(b'IDAT', zlib.compress(rows.tobytes(), level)))  # zlib releases the GIL
+        f.write(png_chunk(b'IEND', b''))
+
+
+def encode_ppm(pixels, path):
+    """Write a (width, height, 3) uint8 surfarray view as a binary PPM"""
+    width, height = pixels.shape[:2]
+    with open(path, 'wb') as f:
+        f.write(f"P6 {width} {height} 255\n".encode('ascii'))
+        f.write(pixels.transpose(1, 0, 2).tobytes())
+
+
+class FrameExporter:
+    """Steps a GCMSSimulation and writes one image per rendered frame"""
+
+    def __init__(self, simulation, output_dir, workers=4, image_format='png', level=3):
+        if image_format not in ('png', 'ppm'):
+            raise ValueError(f"Unknown image format '{image_format}'")
+        self.simulation = simulation
+        self.output_dir = output_dir
+        self.workers = workers
+        self.image_format = image_format
+        self.level = level
+
+    def encode(self, view, index):
+        """Encode the surfarray view in the one-element list `view`, then release it"""
+        pixels = view.pop()  # Only this frame holds the view, so the surface unlocks on return
+        path = os.path.join(self.output_dir, f"frame_{index:05d}.{self.image_format}")
+        if self.image_format == 'png':
+            encode_png(pixels, path, self.level)
+        else:
+            encode_ppm(pixels, path)
+        return path
+
+    def export(self, frames, fps=30, speed=30.0, dt=0.5, stop_when_complete=True):
+        """Render up to `frames` frames, `speed` simulated seconds per second of video
+
+        Returns the number of frames written.
+        """
+        simulation = self.simulation
+        os.makedirs(self.output_dir, exist_ok=True)
+        display = simulation.screen
+        ring = [pygame.Surface(display.get_size(), 0, 32) for _ in range(self.workers + 1)]
+        pending = [None] * len(ring)
+        sim_per_frame = speed / fps
+        owed = 0.0
+        written = 0
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            try:
+                for index in range(frames):
+                    # Advance the simulation by this frame's share of simulated time
+                    owed += sim_per_frame
+                    steps = int(owed / dt)
+                    if steps:
+                        simulation.update(dt, steps)
+                        owed -= steps * dt
+
+                    slot = index % len(ring)
+                    if pending[slot] is not None:
+                        pending[slot].result()
+                    simulation.screen = ring[slot]
+                    simulation.draw()
+                    pending[slot] = pool.submit(self.encode,
+                                                [pygame.surfarray.pixels3d(ring[slot])], index)
+                    written += 1
+                    if stop_when_complete and simulation.is_complete() and written > fps:
+                        break
+            finally:
+                simulation.screen = display
+                for future in pending:
+                    if future is not None:
+                        future.result()
+        return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a separation to an image sequence")
+    parser.add_argument('--out', default='frames', help="Output directory")
+    parser.add_argument('--method', default=None, help="Method file to load first")
+    parser.add_argument('--frames', type=int, default=3600, help="Maximum frames")
+    parser.add_argument('--fps', type=int, default=30, help="Video frame rate")
+    parser.add_argument('--speed', type=float, default=30.0,
+                        help="Simulated seconds per second of video")
+    parser.add_argument('--workers', type=int, default=4, help="Encoder threads")
+    parser.add_argument('--format', default='png', choices=('png', 'ppm'))
+    args = parser.parse_args()
+
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')  # Must be set before pygame.init
+    simulation = GCMSSimulation()
+    if args.method:
+        Method.load(args.method).configure(simulation)
+        simulation.sync_controls()
+    simulation.inject_particles()
+    try:
+        exporter = FrameExporter(simulation, args.out, args.workers, args.format)
+        written = exporter.export(args.frames, args.fps, args.speed)
+    finally:
+        simulation.preview_worker.stop()
+    print(f"Wrote {written} frames to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
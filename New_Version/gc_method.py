@@ -0,0 +1,286 @@
+# gc_method.py
+import json
+import os
+import tomllib
+from gc_core import GCParameters
+from gc_analytes import Analyte, AnalyteRegistry, default_registry
+from gc_engine import DEFAULT_SETTINGS, ISOTHERMS
+
+WEIGHTING_KEYS = ('sample_amount', 'importance_exponent', 'min_particles_per_type',
+                  'rebalance_target', 'rebalance_interval')
+
+
+class Method:
+    """A GC method: temperature program, inlet, carrier gas and analyte list
+
+    Stored as JSON or TOML with the layout
+
+        name = "..."
+        carrier_gas = "He"          # key of GCParameters.carrier_gases
+        pressure_psi = 30
+        split_ratio = 50
+        column_length = 1.0
+        particle_count = 25000      # loaded into the inlet; 1/(split_ratio+1) goes on-column
+        uniform = false
+        flow_mode = "constant_flow" # or "constant_pressure"
+        solver = "particles"        # or "continuum" (concentration profiles, no particles)
+        isotherm = "linear"         # or "langmuir" / "anti_langmuir" (column overload)
+        column_capacity = 100       # load per pixel that halves retention (nonlinear only)
+        [temperature_program]
+        start_temp = 60             # °C
+        end_temp = 280              # °C
+        ramp_rate = 10              # °C/min
+        initial_hold = 1            # min
+        final_hold = 1              # min
+        [[analytes]]
+        name = "solvent"
+        rf = 0.1
+
+    Analytes other than the built-in eight need at least an rf and may set any
+    Analyte property (delta_H, delta_S, diffusivity, color, spectrum, label,
+    rf_range). With both delta_H and delta_S the retention factor follows
+    k(T) = exp(delta_H / (R T) - delta_S / R) instead of rf:
+
+        [[analytes]]
+        name = "decane"
+        rf = 1.0
+        delta_H = 42000             # J/mol released on sorption
+        delta_S = 95                # J/(mol·K)
+
+    Multi-ramp ovens replace end_temp/ramp_rate/final_hold with a segment list,
+    and constant-pressure methods may program the head pressure the same way:
+
+        [[temperature_program.segments]]
+        rate = 10                   # °C/min (0 = hold only)
+        target = 150                # °C
+        hold = 2                    # min
+        [[pressure_program]]
+        rate = 2                    # psi/min
+        target = 40                 # psi
+        hold = 0                    # min
+
+    A [weighting] table switches to weighted super-particles, where
+    particle_count particles carry sample_amount molecule-equivalents split by
+    analyte abundance (both scaled by the split inlet's on-column fraction):
+
+        [weighting]
+        sample_amount = 1e9
+        importance_exponent = 0.5   # 0 = equal particles per analyte, 1 = proportional
+        min_particles_per_type = 50
+        rebalance_target = 5000     # optional split/merge population control
+    """
+
+    def __init__(self, name, temperature_program, analytes, carrier_gas='He',
+                 pressure_psi=DEFAULT_SETTINGS['carrier_pressure'],
+                 split_ratio=DEFAULT_SETTINGS['split_ratio'],
+                 column_length=DEFAULT_SETTINGS['column_length'],
+                 particle_count=DEFAULT_SETTINGS['count'], uniform=False,
+                 flow_mode='constant_flow', pressure_program=(), weighting=None,
+                 solver='particles', isotherm='linear', column_capacity=100.0):
+        self.name = name
+        self.temperature_program = dict(temperature_program)
+        self.analytes = [dict(analyte) for analyte in analytes]
+        self.carrier_gas = carrier_gas
+        self.pressure_psi = pressure_psi
+        self.split_ratio = split_ratio
+        self.column_length = column_length
+        self.particle_count = particle_count
+        self.uniform = uniform
+        self.flow_mode = flow_mode
+        self.pressure_program = [dict(segment) for segment in pressure_program]
+        self.weighting = dict(weighting) if weighting else None
+        self.solver = solver
+        self.isotherm = isotherm
+        self.column_capacity = column_capacity
+        self.validate()
+
+    def validate(self):
+        """Raise ValueError for anything the engine could not run"""
+        if self.carrier_gas not in GCParameters().carrier_gases:
+            raise ValueError(f"Unknown carrier gas '{self.carrier_gas}'")
+        if 'segments' in self.temperature_program:
+            required = ('start_temp', 'initial_hold')
+            segments = self.temperature_program['segments'] + self.pressure_program
+        else:
+            required = ('start_temp', 'end_temp', 'ramp_rate', 'initial_hold', 'final_hold')
+            segments = self.pressure_program
+        for key in required:
+            if key not in self.temperature_program:
+                raise ValueError(f"Temperature program is missing '{key}'")
+        for segment in segments:
+            if not {'rate', 'target', 'hold'} <= set(segment):
+                raise ValueError(f"Program segment {segment} needs rate, target and hold")
+            if segment['rate'] < 0 or segment['hold'] < 0:
+                raise ValueError(f"Program segment {segment} has a negative rate or hold")
+        if self.flow_mode not in ('constant_flow', 'constant_pressure'):
+            raise ValueError(f"Unknown flow mode '{self.flow_mode}'")
+        if self.solver not in ('particles', 'continuum'):
+            raise ValueError(f"Unknown solver '{self.solver}'")
+        if self.isotherm not in ISOTHERMS:
+            raise ValueError(f"Unknown isotherm '{self.isotherm}'")
+        if self.column_capacity <= 0:
+            raise ValueError("column_capacity must be positive")
+        if self.weighting:
+            unknown = set(self.weighting) - set(WEIGHTING_KEYS)
+            if unknown:
+                raise ValueError(f"Unknown weighting options {sorted(unknown)}")
+            if self.weighting.get('sample_amount', 1) <= 0:
+                raise ValueError("sample_amount must be positive")
+        if not self.analytes:
+            raise ValueError("Method has no analytes")
+        builtin = default_registry()
+        names = [analyte.get('name') for analyte in self.analytes]
+        if len(set(names)) != len(names):
+            raise ValueError("Method lists an analyte more than once")
+        for analyte in self.analytes:
+            if 'name' not in analyte:
+                raise ValueError(f"Analyte {analyte} has no name")
+            if 'rf' not in analyte and analyte['name'] not in builtin:
+                raise ValueError(f"Unknown analyte '{analyte['name']}' needs an rf")
+            if analyte.get('rf', 1) <= 0:
+                raise ValueError(f"Analyte '{analyte['name']}' needs a positive rf")
+        if self.split_ratio < 1:
+            raise ValueError("Split ratio must be at least 1")
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data.get('name', 'untitled'),
+            data['temperature_program'],
+            data['analytes'],
+            carrier_gas=data.get('carrier_gas', 'He'),
+            pressure_psi=data.get('pressure_psi', DEFAULT_SETTINGS['carrier_pressure']),
+            split_ratio=data.get('split_ratio', DEFAULT_SETTINGS['split_ratio']),
+            column_length=data.get('column_length', DEFAULT_SETTINGS['column_length']),
+            particle_count=data.get('particle_count', DEFAULT_SETTINGS['count']),
+            uniform=data.get('uniform', False),
+            flow_mode=data.get('flow_mode', 'constant_flow'),
+            pressure_program=data.get('pressure_program', ()),
+            weighting=data.get('weighting'),
+            solver=data.get('solver', 'particles'),
+            isotherm=data.get('isotherm', 'linear'),
+            column_capacity=data.get('column_capacity', 100.0),
+        )
+
+    def to_dict(self):
+        temperature_program = dict(self.temperature_program)
+        if 'segments' in temperature_program:
+            temperature_program['segments'] = [dict(segment) for segment in
+                                               temperature_program['segments']]
+        return {
+            'name': self.name,
+            'temperature_program': temperature_program,
+            'analytes': [dict(analyte) for analyte in self.analytes],
+            'carrier_gas': self.carrier_gas,
+            'pressure_psi': self.pressure_psi,
+            'split_ratio': self.split_ratio,
+            'column_length': self.column_length,
+            'particle_count': self.particle_count,
+            'uniform': self.uniform,
+            'flow_mode': self.flow_mode,
+            'pressure_program': [dict(segment) for segment in self.pressure_program],
+            'weighting': dict(self.weighting) if self.weighting else None,
+            'solver': self.solver,
+            'isotherm': self.isotherm,
+            'column_capacity': self.column_capacity,
+        }
+
+    @classmethod
+    def load(cls, path):
+        """Read a method from a .json or .toml file"""
+        if os.path.splitext(path)[1].lower() == '.toml':
+            with open(path, 'rb') as f:
+                return cls.from_dict(tomllib.load(f))
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    def save(self, path):
+        """Write the method as JSON"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def from_simulation(cls, simulation, name='untitled'):
+        """Capture the current slider positions of a running simulation"""
+        settings = simulation.settings
+        rf = simulation.registry.retention_factors(settings)
+        program = {key: settings[key] for key in
+                   ('start_temp', 'end_temp', 'ramp_rate', 'initial_hold', 'final_hold')}
+        if simulation.temperature_segments:
+            program['segments'] = [{'rate': rate, 'target': target, 'hold': hold}
+                                   for rate, target, hold in simulation.temperature_segments]
+        return cls(
+            name,
+            program,
+            [dict(simulation.registry[name].to_dict(), rf=float(rf[simulation.registry.code(name)]))
+             for name in simulation.particle_types],
+            carrier_gas=simulation.carrier_gas,
+            pressure_psi=settings['carrier_pressure'],
+            split_ratio=settings['split_ratio'],
+            column_length=settings['column_length'],
+            particle_count=int(settings['count']),
+            uniform=simulation.uniform,
+            flow_mode=simulation.flow_mode,
+            pressure_program=[{'rate': rate, 'target': target, 'hold': hold}
+                              for rate, target, hold in simulation.pressure_segments],
+            weighting=({key: getattr(simulation, key) for key in WEIGHTING_KEYS
+                        if getattr(simulation, key) is not None}
+                       if simulation.weighted else None),
+            solver=simulation.solver,
+            isotherm=simulation.isotherm,
+            column_capacity=simulation.column_capacity,
+        )
+
+    def to_settings(self):
+        """Engine settings dict equivalent to this method's non-analyte slider positions"""
+        settings = dict(DEFAULT_SETTINGS)
+        program = dict(self.temperature_program)
+        segments = program.pop('segments', None)
+        if segments:
+            # Show the first ramp and the final temperature on the sliders
+            program.setdefault('ramp_rate', segments[0]['rate'])
+            program.setdefault('end_temp', segments[-1]['target'])
+            program.setdefault('final_hold', segments[-1]['hold'])
+        settings.update(program)
+        settings['carrier_pressure'] = self.pressure_psi
+        settings['split_ratio'] = self.split_ratio
+        settings['column_length'] = self.column_length
+        settings['count'] = self.particle_count
+        return settings
+
+    def registry(self):
+        """AnalyteRegistry for the method's analytes, filling gaps from the built-in eight"""
+        builtin = default_registry()
+        analytes = []
+        for entry in self.analytes:
+            record = builtin[entry['name']].to_dict() if entry['name'] in builtin else {}
+            record.update(entry)
+            analytes.append(Analyte.from_dict(record))
+        return AnalyteRegistry(analytes)
+
+    def configure(self, engine):
+        """Apply this method to a SimulationEngine before injection"""
+        settings = self.to_settings()
+        # Analyte-name RF overrides left by the GUI or an earlier method would shadow ours
+        for name in set(engine.settings) - set(settings):
+            del engine.settings[name]
+        engine.settings.update(settings)
+        engine.carrier_gas = self.carrier_gas
+        engine.uniform = self.uniform
+        engine.registry = self.registry()
+        engine.particle_types = engine.registry.names
+        engine.flow_mode = self.flow_mode
+        segments = self.temperature_program.get('segments')
+        engine.temperature_segments = (
+            [(s['rate'], s['target'], s['hold']) for s in segments] if segments else None
+        )
+        engine.pressure_segments = [(s['rate'], s['target'], s['hold'])
+                                    for s in self.pressure_program]
+        engine.solver = self.solver
+        engine.isotherm = self.isotherm
+        engine.column_capacity = self.column_capacity
+        engine.weighted = bool(self.weighting)
+        for key, value in (self.weighting or {}).items():
+            setattr(engine, key, value)
+        engine.update_geometry()
+        return engine
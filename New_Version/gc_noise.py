@@ -0,0 +1,54 @@
+# gc_noise.py
+import math
+import numpy as np
+
+
+class NoiseService:
+    """Pre-generated standard-normal and sine tables for the cosmetic y wobble
+
+    Normal draws are produced a buffer at a time and handed out in slices, so a
+    frame costs a slice copy instead of a generator call. Sine is a table lookup
+    at table_size points per period, which is plenty for a few pixels of wobble.
+    The service owns its own generator so rendering never shifts the random
+    stream the physics uses.
+    """
+
+    def __init__(self, seed=None, buffer_size=1 << 20, table_size=4096):
+        self.rng = np.random.default_rng(seed)
+        self.buffer_size = buffer_size
+        self.buffer = np.empty(buffer_size)
+        self.refill()
+
+        self.table_size = table_size  # Must be a power of two for the index mask
+        self.table_scale = table_size / (2 * math.pi)
+        self.sine_table = np.sin(np.arange(table_size) / self.table_scale)
+
+    def refill(self):
+        self.fill_state = self.rng.bit_generator.state  # Enough to regenerate the buffer
+        self.rng.standard_normal(out=self.buffer)
+        self.position = 0
+
+    def restore(self, fill_state, position):
+        """Regenerate the buffer from a saved fill_state and continue at position"""
+        self.rng.bit_generator.state = fill_state
+        self.refill()
+        self.position = position
+
+    def normal(self, n):
+        """Next n standard-normal draws"""
+        if n > self.buffer_size:
+            return self.rng.standard_normal(n)
+        if self.position + n > self.buffer_size:
+            self.refill()
+        draws = self.buffer[self.position:self.position + n]
+        self.position += n
+        return draws
+
+    def scaled(self, scale):
+        """Zero-mean normal draws with a per-element standard deviation"""
+        return self.normal(len(scale)) * scale
+
+    def sin(self, phase):
+        """Table sine of an array of phases (radians, any sign)"""
+        index = (phase * self.table_scale).astype(np.int64) & (self.table_size - 1)
+        return self.sine_table[index]
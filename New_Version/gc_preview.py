@@ -0,0 +1,170 @@
+# gc_preview.py
+import threading
+import time
+import numpy as np
+from gc_core import ParticleArrays
+from gc_engine import SimulationEngine
+from gc_inlet import SplitInlet
+
+
+class AnalyticPreview:
+    """Predicts retention time and peak width per analyte without stepping particles
+
+    The velocity law of ParticleArrays.move is evaluated on a fixed time grid for every
+    analyte at once and integrated with the trapezoid rule; the retention time is
+    where the travelled distance reaches the column length. Peak width comes from
+    how the retention time responds to the per-particle RF spread that
+    ParticleManager applies, plus the injection band and the chromatogram binning.
+    """
+
+    def __init__(self, grid_step=1.0, max_time=3600, rf_step=0.01):
+        self.engine = SimulationEngine()
+        self.grid = np.arange(0.0, max_time + grid_step, grid_step)
+        self.rf_step = rf_step
+
+    def configure(self, settings, run_config):
+        """Take the slider settings and run configuration to preview"""
+        self.engine.settings.update(settings)
+        self.engine.apply_run_config(run_config)
+
+    def speeds(self, retention_factors, diffusion_coeff, base_velocity, flow_factor, temp_factor):
+        """Array form of the ParticleArrays.move velocity law, shape (analytes, grid)"""
+        rf = retention_factors[:, None]
+        carrier_velocity = base_velocity * flow_factor[None, :]
+        velocity = carrier_velocity / np.sqrt(rf)
+        hetp = ParticleArrays.calculate_van_deemter(velocity, diffusion_coeff[:, None])
+        effective_velocity = (velocity / (1 + hetp)) * np.sqrt(temp_factor) * 2
+        return np.maximum(effective_velocity, carrier_velocity * 0.1)
+
+    def retention(self):
+        """Return (analyte names, retention times, peak sigmas) in seconds
+
+        Analytes that would not elute within the grid get NaN.
+        """
+        engine = self.engine
+        engine.compile_programs()
+        settings = engine.settings
+        names = list(engine.particle_types)
+
+        base_velocity, diffusion_base = engine.gc_params.calculate_flow_parameters(
+            settings['carrier_pressure'], engine.carrier_gas, settings['column_length']
+        )
+        temp_table = engine.temperature_program.table
+        flow_table = engine.flow_program.velocity_table
+        temps = np.interp(self.grid, temp_table.times, temp_table.values)
+        flow_factor = np.interp(self.grid, flow_table.times, flow_table.values) / base_velocity
+
+        registry = engine.registry
+        codes = np.array([registry.code(name) for name in names])
+        rf = engine.retention_factors()[codes]
+        temp_factor = engine.compile_retention().lookup(temps)[codes]
+
+        # Three rows per analyte: nominal RF and a small step either side for dt_R/dRF
+        rf_rows = np.concatenate([rf, rf * (1 + self.rf_step), rf * (1 - self.rf_step)])
+        diffusion_coeff = np.tile(diffusion_base * registry.diffusivity[codes], 3) / rf_rows
+        speed = self.speeds(rf_rows, diffusion_coeff, base_velocity, flow_factor,
+                            np.tile(temp_factor, (3, 1)))
+
+        # Particles start at column_start_x and are detected on reaching column_end_x
+        length_factor = settings['column_length']
+        column_length = (int(engine.BASE_COLUMN_END_X * length_factor) -
+                         int(engine.BASE_COLUMN_START_X * length_factor))
+        steps = np.diff(self.grid)
+        distance = np.concatenate(
+            [np.zeros((len(rf_rows), 1)),
+             np.cumsum(0.5 * (speed[:, 1:] + speed[:, :-1]) * steps, axis=1)], axis=1
+        )
+
+        # Distance is monotone, so the crossing index is the count of knots short of the end
+        crossing = np.sum(distance < column_length, axis=1)
+        elutes = (crossing > 0) & (crossing < len(self.grid))
+        i = np.clip(crossing, 1, len(self.grid) - 1)[:, None]
+        d0 = np.take_along_axis(distance, i - 1, axis=1)[:, 0]
+        d1 = np.take_along_axis(distance, i, axis=1)[:, 0]
+        retention = self.grid[i[:, 0] - 1] + (column_length - d0) / (d1 - d0) * steps[i[:, 0] - 1]
+        retention = np.where(elutes, retention, np.nan)
+        end_speed = np.take_along_axis(speed, i, axis=1)[:, 0]
+
+        n = len(names)
+        t_r = retention[:n]
+        dt_drf = (retention[n:2 * n] - retention[2 * n:]) / (2 * self.rf_step * rf)
+        rf_sigma = engine.gc_params.random_spread * rf
+        injection_sigma = SplitInlet(settings['split_ratio']).band_width / 100 / end_speed[:n]
+        binning = (1.0 ** 2) / 12 + (7 ** 2 - 1) / 12  # 1 s bins, 7-bin moving average
+        sigma = np.sqrt((dt_drf * rf_sigma) ** 2 + injection_sigma ** 2 + binning)
+        return names, t_r, sigma
+
+    def chromatogram(self, time_window=1.0):
+        """Predicted chromatogram as (time, expected detected amount per bin) tuples"""
+        names, t_r, sigma = self.retention()
+        eluting = ~np.isnan(t_r)
+        if not eluting.any():
+            return []
+
+        engine = self.engine
+        on_column = SplitInlet(engine.settings['split_ratio']).column_fraction
+        if engine.weighted:
+            # Weighted runs put each analyte's true on-column amount under its peak
+            abundance = engine.registry.abundance[[engine.registry.code(n) for n in names]]
+            amounts = on_column * engine.sample_amount * abundance / abundance.sum()
+        else:
+            amounts = np.full(len(names), on_column * int(engine.settings['count']) / len(names))
+        t_r, sigma, amounts = t_r[eluting], sigma[eluting], amounts[eluting]
+        end = np.max(t_r + 4 * sigma)
+        times = np.arange(0.0, end + time_window, time_window)
+        z = (times[None, :] - t_r[:, None]) / sigma[:, None]
+        heights = amounts[:, None] * time_window / (sigma[:, None] * np.sqrt(2 * np.pi))
+        signal = np.sum(heights * np.exp(-0.5 * z ** 2), axis=0)
+        return list(zip(times.tolist(), signal.tolist()))
+
+
+class PreviewWorker(threading.Thread):
+    """Recomputes the preview off the render thread, debounced after slider moves
+
+    The render loop calls request() as often as it likes; the worker waits until
+    the settings have been still for `debounce` seconds, computes, and publishes
+    the newest chromatogram in `result` with a single reference assignment.
+    """
+
+    def __init__(self, preview=None, debounce=0.03):
+        super().__init__(daemon=True)
+        self.preview = preview or AnalyticPreview()
+        self.debounce = debounce
+        self.condition = threading.Condition()
+        self.pending = None
+        self.last_request = 0.0
+        self.stopped = False
+        self.result = []
+        self.compute_time = 0.0
+
+    def request(self, settings, run_config):
+        with self.condition:
+            self.pending = (dict(settings), dict(run_config))
+            self.last_request = time.perf_counter()
+            self.condition.notify()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.stopped:
+                    self.condition.wait()
+                # Debounce: keep waiting while the sliders are still moving
+                while not self.stopped:
+                    remaining = self.last_request + self.debounce - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                if self.stopped:
+                    return
+                settings, run_config = self.pending
+                self.pending = None
+
+            start = time.perf_counter()
+            self.preview.configure(settings, run_config)
+            self.result = self.preview.chromatogram()
+            self.compute_time = time.perf_counter() - start
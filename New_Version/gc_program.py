@@ -0,0 +1,162 @@
+# gc_program.py
+import bisect
+
+VISCOSITY_EXPONENT = 0.7  # Carrier gas viscosity scales roughly as T^0.7 (K)
+
+
+class PiecewiseLinear:
+    """Piecewise-linear function of time with a precomputed running integral
+
+    value(t) and integral(t) bisect the knot table, so both cost O(log knots).
+    Before the first knot and after the last one the end values are held.
+    """
+
+    def __init__(self, times, values):
+        self.times = list(times)
+        self.values = list(values)
+        self.cumulative = [0.0]
+        for i in range(1, len(self.times)):
+            span = self.times[i] - self.times[i - 1]
+            self.cumulative.append(self.cumulative[-1] +
+                                   0.5 * (self.values[i] + self.values[i - 1]) * span)
+
+    def locate(self, t):
+        """Index of the knot at or before t"""
+        return max(0, bisect.bisect_right(self.times, t) - 1)
+
+    def value(self, t):
+        i = self.locate(t)
+        if t <= self.times[0] or i >= len(self.times) - 1:
+            return self.values[i]
+        t0, t1 = self.times[i], self.times[i + 1]
+        frac = (t - t0) / (t1 - t0)
+        return self.values[i] + frac * (self.values[i + 1] - self.values[i])
+
+    def integral(self, t):
+        """Integral of the function from the first knot to t"""
+        if t <= self.times[0]:
+            return self.values[0] * (t - self.times[0])
+        i = self.locate(t)
+        if i >= len(self.times) - 1:
+            return self.cumulative[-1] + self.values[-1] * (t - self.times[-1])
+        return self.cumulative[i] + 0.5 * (self.values[i] + self.value(t)) * (t - self.times[i])
+
+
+def compile_segments(initial_value, initial_hold, segments):
+    """Turn an initial hold plus (rate per min, target, hold min) segments into knots
+
+    A rate of 0 is a plain hold at the current value. Returns the knot times (s),
+    the knot values and the time at which the last ramp finishes.
+    """
+    times = [0.0]
+    values = [float(initial_value)]
+    if initial_hold > 0:
+        times.append(initial_hold * 60.0)
+        values.append(values[-1])
+
+    ramp_end = times[-1]
+    for rate, target, hold in segments:
+        if rate > 0 and target != values[-1]:
+            times.append(times[-1] + abs(target - values[-1]) / rate * 60.0)
+            values.append(float(target))
+        ramp_end = times[-1]
+        if hold > 0:
+            times.append(times[-1] + hold * 60.0)
+            values.append(values[-1])
+    return times, values, ramp_end
+
+
+class TemperatureProgram:
+    """Oven program: an initial hold followed by any number of ramp/hold segments
+
+    segments are (rate °C/min, target °C, hold min) tuples, compiled once into a
+    PiecewiseLinear table of temperature against run time in seconds.
+    """
+
+    def __init__(self, initial_temp, initial_hold=0, segments=()):
+        self.initial_temp = initial_temp
+        self.segments = [tuple(segment) for segment in segments]
+        times, temps, self.ramp_end = compile_segments(initial_temp, initial_hold, self.segments)
+        self.initial_hold_end = initial_hold * 60.0
+        self.total_time = times[-1]
+        self.table = PiecewiseLinear(times, temps)
+
+    @classmethod
+    def single_ramp(cls, start_temp, end_temp, ramp_rate, initial_hold, final_hold):
+        """The classic one-ramp program driven by the sliders"""
+        return cls(start_temp, initial_hold, [(ramp_rate, end_temp, final_hold)])
+
+    def temperature(self, t):
+        return self.table.value(t)
+
+    def integral(self, t):
+        """Integral of temperature (°C·s) from injection to t"""
+        return self.table.integral(t)
+
+    def state(self, t):
+        """Temperature plus the initial-hold-complete and final-hold-started flags
+
+        A program whose ramps have zero length is in its final hold as soon as
+        the initial hold ends.
+        """
+        initial_complete = t >= self.initial_hold_end
+        final_started = initial_complete and t >= self.ramp_end
+        return self.temperature(t), initial_complete, final_started
+
+
+class FlowProgram:
+    """Carrier linear velocity and head pressure over a run
+
+    constant_flow holds the velocity at its initial value while the head pressure
+    tracks oven temperature to offset the rising gas viscosity (P ∝ T^0.7).
+    constant_pressure follows its own (rate psi/min, target psi, hold min) pressure
+    program and lets the velocity fall as the gas gets more viscous. Both are
+    tabulated once, every `resolution` seconds plus every program breakpoint.
+    """
+
+    def __init__(self, temperature_program, initial_pressure, initial_velocity,
+                 mode='constant_flow', segments=(), resolution=5.0):
+        if mode not in ('constant_flow', 'constant_pressure'):
+            raise ValueError(f"Unknown flow mode '{mode}'")
+        self.mode = mode
+        self.initial_pressure = initial_pressure
+        self.initial_velocity = initial_velocity
+
+        times, pressures, _ = compile_segments(initial_pressure, 0, segments)
+        set_pressure = PiecewiseLinear(times, pressures)
+
+        end = max(temperature_program.total_time, set_pressure.times[-1])
+        knots = set(temperature_program.table.times) | set(times)
+        steps = int(end / resolution)
+        knots.update(i * resolution for i in range(steps + 1))
+        knots = sorted(knots)
+
+        T0 = temperature_program.temperature(0) + 273.15
+        velocities = []
+        heads = []
+        for t in knots:
+            viscosity_ratio = ((temperature_program.temperature(t) + 273.15) / T0) ** VISCOSITY_EXPONENT
+            if mode == 'constant_flow':
+                velocities.append(initial_velocity)
+                heads.append(initial_pressure * viscosity_ratio)
+            else:
+                pressure = set_pressure.value(t)
+                velocities.append(initial_velocity * (pressure / initial_pressure) / viscosity_ratio)
+                heads.append(pressure)
+
+        self.velocity_table = PiecewiseLinear(knots, velocities)
+        self.pressure_table = PiecewiseLinear(knots, heads)
+
+    def velocity(self, t):
+        return self.velocity_table.value(t)
+
+    def distance(self, t):
+        """Integral of velocity from injection to t"""
+        return self.velocity_table.integral(t)
+
+    def pressure(self, t):
+        return self.pressure_table.value(t)
+
+    def flow_factor(self, t):
+        """Velocity relative to the initial velocity"""
+        return self.velocity(t) / self.initial_velocity
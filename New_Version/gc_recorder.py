@@ -0,0 +1,257 @@
+# gc_recorder.py
+"""
+Run recording to an append-only, memory-mapped timeline.
+
+A recording is four files sharing one base path:
+
+    <path>.json   metadata: settings, run configuration, cadence, compression
+    <path>.idx    one fixed-size record per snapshot (time, temperature, offsets, keyframe flag)
+    <path>.dat    snapshot payloads, appended in order
+    <path>.evt    detector events, appended as they happen
+
+Keyframes hold every particle field at full precision; the snapshots between
+them only hold the fields that change every step (x, y, detected). A keyframe
+is written every keyframe_interval snapshots and whenever split/merge changes
+the particle population. Compression applies to x and y of the in-between
+snapshots: 'none' (float64), 'float32' (the default, within 1e-4 px over the
+whole window), 'float16' (about 0.5 px at x near 1000) or 'delta' (float16
+offsets from the keyframe; they grow to about 100 px, where float16 resolves
+about 0.06 px). Resuming from a float16 or delta snapshot therefore perturbs
+the trajectories that follow; keep those for playback only.
+"""
+
+import json
+import os
+import numpy as np
+from gc_core import ParticleArrays
+
+INDEX_DTYPE = np.dtype([
+    ('time', 'f8'), ('temperature', 'f8'), ('step', 'i8'), ('count', 'i8'),
+    ('n_events', 'i8'), ('frame_offset', 'i8'), ('key_offset', 'i8'), ('keyframe', '?'),
+])
+EVENT_DTYPE = np.dtype([('time', 'f8'), ('type_code', 'i4'), ('weight', 'f8')])
+KEY_FIELDS = (('x', 'f8'), ('y', 'f8'), ('retention_factor', 'f8'), ('diffusion_coeff', 'f8'),
+              ('weight', 'f8'), ('peak_width', 'f8'), ('type_code', 'i4'), ('detected', '?'))
+COMPRESSION_DTYPES = {'none': 'f8', 'float32': 'f4', 'float16': 'f2', 'delta': 'f2'}
+
+
+class RunRecorder:
+    """Appends snapshots of a particle run at a fixed simulated-time cadence
+
+    Call start(engine) right after injection and record(engine) after every
+    update; record() only writes when the next snapshot is due.
+    """
+
+    def __init__(self, path, interval=5.0, compression='float32', keyframe_interval=10):
+        if compression not in COMPRESSION_DTYPES:
+            raise ValueError(f"Unknown compression '{compression}'")
+        self.path = path
+        self.interval = interval
+        self.compression = compression
+        self.keyframe_interval = keyframe_interval
+        self.files = None
+
+    def start(self, engine):
+        """Truncate the recording and write metadata plus the injection snapshot"""
+        if engine.continuum is not None:
+            raise ValueError("Only particle runs can be recorded")
+        self.close()
+        meta = {
+            'interval': self.interval,
+            'compression': self.compression,
+            'settings': engine.settings,
+            'run_config': engine.run_config(),
+            'seed': engine.seed,
+            'time_window': engine.time_window,
+            'vented': engine.vented.tolist(),
+        }
+        with open(self.path + '.json', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2, default=float)
+        self.files = {ext: open(self.path + ext, 'wb') for ext in ('.idx', '.dat', '.evt')}
+        self.frame_offset = 0
+        self.events_written = 0
+        self.snapshots = 0
+        self.keyframe = None  # (offset, count, x, y) of the latest keyframe
+        self.next_time = engine.simulation_time
+        self.record(engine)
+
+    def record(self, engine):
+        """Append new detector events and, when one is due, a snapshot"""
+        if self.files is None:
+            return
+        detections = engine.detections
+        if detections.size > self.events_written:
+            events = np.empty(detections.size - self.events_written, dtype=EVENT_DTYPE)
+            new = slice(self.events_written, detections.size)
+            events['time'] = detections.times[new]
+            events['type_code'] = detections.types[new]
+            events['weight'] = detections.weights[new]
+            self.files['.evt'].write(events.tobytes())
+            self.events_written = detections.size
+
+        if engine.simulation_time >= self.next_time:
+            self.snapshot(engine)
+            self.next_time += self.interval * max(
+                1, int((engine.simulation_time - self.next_time) / self.interval) + 1)
+
+    def snapshot(self, engine):
+        particles = engine.particles
+        count = len(particles)
+        is_keyframe = (self.keyframe is None or self.keyframe[1] != count or
+                       self.snapshots % self.keyframe_interval == 0)
+        if is_keyframe:
+            self.keyframe = (self.write(*(getattr(particles, name).astype(dtype, copy=False)
+                                          for name, dtype in KEY_FIELDS)),
+                             count, particles.x.copy(), particles.y.copy())
+
+        key_offset, _, key_x, key_y = self.keyframe
+        dtype = COMPRESSION_DTYPES[self.compression]
+        x, y = particles.x, particles.y
+        if self.compression == 'delta':
+            x, y = x - key_x, y - key_y
+        frame_offset = self.write(x.astype(dtype), y.astype(dtype), particles.detected)
+
+        record = np.zeros(1, dtype=INDEX_DTYPE)
+        record['time'] = engine.simulation_time
+        record['temperature'] = engine.temperature_program.temperature(engine.simulation_time)
+        record['step'] = engine.step_count
+        record['count'] = count
+        record['n_events'] = self.events_written
+        record['frame_offset'] = frame_offset
+        record['key_offset'] = key_offset
+        record['keyframe'] = is_keyframe
+        self.files['.idx'].write(record.tobytes())
+        for f in self.files.values():
+            f.flush()
+        self.snapshots += 1
+
+    def write(self, *arrays):
+        """Append arrays to the payload file and return where they start"""
+        offset = self.frame_offset
+        for array in arrays:
+            data = np.ascontiguousarray(array).tobytes()
+            self.files['.dat'].write(data)
+            self.frame_offset += len(data)
+        return offset
+
+    def close(self):
+        if self.files:
+            for f in self.files.values():
+                f.close()
+        self.files = None
+
+
+class Recording:
+    """Random access to a recorded run; reopens its maps as the files grow"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path + '.json', 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.interval = self.meta['interval']
+        self.frame_dtype = np.dtype(COMPRESSION_DTYPES[self.meta['compression']])
+        self.index = None
+        self.payload = None
+        self.events = None
+        self.refresh()
+
+    def refresh(self):
+        """Map whatever has been written so far"""
+        self.index = self.map('.idx', INDEX_DTYPE)
+        self.payload = self.map('.dat', np.uint8)
+        self.events = self.map('.evt', EVENT_DTYPE)
+
+    def map(self, ext, dtype):
+        path = self.path + ext
+        size = os.path.getsize(path) // np.dtype(dtype).itemsize
+        if size == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', shape=(size,))
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def duration(self):
+        return float(self.index['time'][-1]) if len(self.index) else 0.0
+
+    def seek(self, t):
+        """Index of the latest snapshot at or before t, from the fixed cadence in O(1)"""
+        if len(self.index) == 0:
+            raise IndexError("Recording is empty")
+        times = self.index['time']
+        i = min(max(int((t - times[0]) / self.interval), 0), len(times) - 1)
+        # Snapshots land on the first step past each cadence tick, so at most one step back
+        if i > 0 and times[i] > t:
+            i -= 1
+        return i
+
+    def read(self, offset, dtype, count):
+        dtype = np.dtype(dtype)
+        return np.frombuffer(self.payload, dtype=dtype, count=count, offset=offset), \
+            offset + count * dtype.itemsize
+
+    def frame(self, i):
+        """Particle arrays and run state of snapshot i"""
+        record = self.index[i]
+        count = int(record['count'])
+        state = {}
+        offset = int(record['key_offset'])
+        for name, dtype in KEY_FIELDS:
+            state[name], offset = self.read(offset, dtype, count)
+
+        offset = int(record['frame_offset'])
+        x, offset = self.read(offset, self.frame_dtype, count)
+        y, offset = self.read(offset, self.frame_dtype, count)
+        state['detected'], _ = self.read(offset, '?', count)
+        # Keyframes keep their own full-precision x and y
+        if not record['keyframe']:
+            if self.meta['compression'] == 'delta':
+                state['x'] = state['x'] + x
+                state['y'] = state['y'] + y
+            else:
+                state['x'] = x.astype(float)
+                state['y'] = y.astype(float)
+
+        for name in ('time', 'temperature', 'step', 'n_events'):
+            state[name] = record[name].item()
+        return state
+
+    def restore(self, engine, i):
+        """Put engine in the state of snapshot i so the run can carry on from there
+
+        Keyframes and 'none' snapshots restore exactly; compressed snapshots in
+        between restore x and y to their stored precision.
+        """
+        state = self.frame(i)
+        meta = self.meta
+        engine.settings.update(meta['settings'])
+        engine.apply_run_config(meta['run_config'])
+
+        base_velocity, _ = engine.gc_params.calculate_flow_parameters(
+            engine.settings['carrier_pressure'], engine.carrier_gas,
+            engine.settings['column_length']
+        )
+        particles = ParticleArrays(
+            np.array(state['x']), np.array(state['y']), np.array(state['retention_factor']),
+            np.array(state['type_code']), np.array(state['diffusion_coeff']), base_velocity,
+            np.array(state['weight'])
+        )
+        particles.peak_width = np.array(state['peak_width'])
+        particles.detected = np.array(state['detected'])
+
+        engine.reset_simulation_parameters()
+        engine.particles = particles
+        engine.continuum = None
+        engine.simulation_time = state['time']
+        engine.step_count = state['step']
+        engine.time_window = meta['time_window']
+        engine.vented = np.array(meta['vented'])
+        events = self.events[:state['n_events']]
+        if len(events):
+            engine.detections.append(events['time'], events['type_code'], events['weight'])
+            bins = (events['time'] / engine.time_window).astype(np.int64)
+            engine.histogram = np.bincount(bins, weights=events['weight'])
+        engine.calculate_temp_factor()
+        engine.update_chromatogram()
+        return state
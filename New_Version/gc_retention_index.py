@@ -0,0 +1,219 @@
+# gc_retention_index.py
+"""
+Retention indices against an n-alkane ladder.
+
+A ladder of n-alkanes is run under a method (the analytic preview by default,
+or a seeded particle run) or imported from measured times, and becomes a
+sorted RetentionIndex calibration. Retention times then convert to indices
+with one searchsorted and an interpolation over the whole array:
+
+    isothermal oven   Kovats:              I = 100 (n + log(t'/t'n) / log(t'n+1/t'n))
+    programmed oven   van den Dool-Kratz:  I = 100 (n + (t - tn) / (tn+1 - tn))
+
+where t' = t - dead_time. Times outside the ladder extrapolate from its first
+or last pair. Calibrations are cached per method conditions, so a sweep can
+index thousands of peaks per second without re-running the ladder.
+
+Usage: python gc_retention_index.py method.toml --save ladder.csv
+       python gc_retention_index.py method.toml --ladder ladder.csv --times 312.5 640
+"""
+
+import argparse
+import hashlib
+import json
+import numpy as np
+from gc_analytes import Analyte
+from gc_engine import ENGINE_VERSION, SimulationEngine
+from gc_method import Method
+from gc_preview import AnalyticPreview
+
+ALKANE_CARBONS = tuple(range(4, 31))
+# n-decane, then per CH2; the ladder brackets the built-in compounds on the default method
+ALKANE_DELTA_H = (42000.0, 5000.0)  # J/mol
+ALKANE_DELTA_S = (110.0, 7.0)       # J/(mol·K)
+
+
+def alkane(carbons):
+    """Thermodynamic n-alkane analyte with ΔH and ΔS linear in carbon number"""
+    return Analyte(f"C{carbons}", 1.0,
+                   delta_H=ALKANE_DELTA_H[0] + ALKANE_DELTA_H[1] * (carbons - 10),
+                   delta_S=ALKANE_DELTA_S[0] + ALKANE_DELTA_S[1] * (carbons - 10),
+                   label=f"n-C{carbons}")
+
+
+def ladder_method(method, carbons=ALKANE_CARBONS):
+    """Copy of method with its analytes replaced by the alkane ladder"""
+    data = method.to_dict()
+    data['analytes'] = [alkane(n).to_dict() for n in carbons]
+    return Method.from_dict(data)
+
+
+def is_isothermal(method):
+    program = method.temperature_program
+    if 'segments' in program:
+        return all(segment['rate'] == 0 for segment in program['segments'])
+    return program['ramp_rate'] == 0 or program['end_temp'] == program['start_temp']
+
+
+def weighted_medians(times, types, weights, n_types):
+    """Weighted median event time per type code (NaN where a type has no events)"""
+    order = np.lexsort((times, types))
+    times, types, weights = times[order], types[order], weights[order]
+    cumulative = np.cumsum(weights)
+    starts = np.searchsorted(types, np.arange(n_types), side='left')
+    ends = np.searchsorted(types, np.arange(n_types), side='right')
+    before = np.where(starts > 0, cumulative[np.maximum(starts - 1, 0)], 0.0)
+    total = np.where(ends > 0, cumulative[np.maximum(ends - 1, 0)], 0.0) - before
+    medians = np.full(n_types, np.nan)
+    found = ends > starts
+    half = before[found] + 0.5 * total[found]
+    medians[found] = times[np.searchsorted(cumulative, half, side='left')]
+    return medians
+
+
+def simulate_ladder(method, carbons=ALKANE_CARBONS, seed=None, particles=False, dt=0.5,
+                    max_time=3600):
+    """(carbon numbers, retention times) of the alkanes that elute under method
+
+    The analytic preview gives noise-free apex times; particles=True runs the
+    ladder through the engine and takes each alkane's weighted median detection time.
+    """
+    ladder = ladder_method(method, carbons)
+    if particles:
+        engine = ladder.configure(SimulationEngine(seed=seed))
+        result = engine.run_headless(dt, max_time)
+        times = weighted_medians(np.asarray(result.event_times), np.asarray(result.event_types),
+                                 np.asarray(result.event_weights), len(engine.registry))
+    else:
+        preview = AnalyticPreview(max_time=max_time)
+        ladder.configure(preview.engine)
+        _, times, _ = preview.retention()
+    carbons = np.asarray(carbons, dtype=float)
+    elutes = ~np.isnan(times)
+    return carbons[elutes], np.asarray(times)[elutes]
+
+
+class RetentionIndex:
+    """Calibration of retention time against alkane carbon number
+
+    isothermal selects the Kovats (logarithmic) index, otherwise the linear
+    van den Dool-Kratz index is used. dead_time (s) is subtracted before the
+    logarithm, so it only matters for Kovats indices.
+    """
+
+    def __init__(self, carbons, times, isothermal=False, dead_time=0.0):
+        order = np.argsort(times)
+        self.times = np.asarray(times, dtype=float)[order]
+        self.carbons = np.asarray(carbons, dtype=float)[order]
+        if len(self.times) < 2:
+            raise ValueError("A retention index ladder needs at least two alkanes")
+        if np.any(np.diff(self.times) <= 0) or np.any(np.diff(self.carbons) <= 0):
+            raise ValueError("Ladder alkanes must elute one after another in carbon order")
+        if isothermal and self.times[0] <= dead_time:
+            raise ValueError("Kovats indices need every ladder time after the dead time")
+        self.isothermal = isothermal
+        self.dead_time = dead_time
+        self.axis = self.scale(self.times)
+
+    def scale(self, times):
+        """Ladder axis the index is linear in: time, or log adjusted time for Kovats"""
+        if not self.isothermal:
+            return np.asarray(times, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.log(np.asarray(times, dtype=float) - self.dead_time)
+
+    def index(self, times):
+        """Retention index of each retention time; NaN where Kovats is undefined"""
+        x = self.scale(times)
+        i = np.clip(np.searchsorted(self.axis, x, side='right') - 1, 0, len(self.axis) - 2)
+        x0, x1 = self.axis[i], self.axis[i + 1]
+        c0, c1 = self.carbons[i], self.carbons[i + 1]
+        return 100 * (c0 + (c1 - c0) * (x - x0) / (x1 - x0))
+
+    def save(self, path):
+        """Write the ladder as 'carbons,time_s' CSV"""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("carbons,time_s\n")
+            np.savetxt(f, np.column_stack([self.carbons, self.times]), fmt='%g,%.4f')
+
+    @classmethod
+    def load(cls, path, isothermal=False, dead_time=0.0):
+        """Import a measured or saved ladder from 'carbons,time_s' CSV"""
+        data = np.loadtxt(path, delimiter=',', skiprows=1, ndmin=2)
+        return cls(data[:, 0], data[:, 1], isothermal, dead_time)
+
+
+def method_key(method, **extra):
+    """Hash of the method conditions a ladder depends on (not its name or analytes)"""
+    data = method.to_dict()
+    data.pop('name', None)
+    data.pop('analytes', None)
+    payload = {'engine_version': ENGINE_VERSION, 'method': data, 'extra': extra}
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class CalibrationCache:
+    """RetentionIndex per method conditions, simulated on first use and kept in memory"""
+
+    def __init__(self, carbons=ALKANE_CARBONS, particles=False, seed=None, dead_time=0.0):
+        self.carbons = tuple(carbons)
+        self.particles = particles
+        self.seed = seed
+        self.dead_time = dead_time
+        self.calibrations = {}
+
+    def get(self, method):
+        key = method_key(method, carbons=self.carbons, particles=self.particles, seed=self.seed,
+                         dead_time=self.dead_time)
+        calibration = self.calibrations.get(key)
+        if calibration is None:
+            carbons, times = simulate_ladder(method, self.carbons, self.seed, self.particles)
+            calibration = RetentionIndex(carbons, times, is_isothermal(method), self.dead_time)
+            self.calibrations[key] = calibration
+        return calibration
+
+    def index(self, method, times):
+        """Retention indices of times measured under method"""
+        return self.get(method).index(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Alkane-ladder retention indices for a method")
+    parser.add_argument('method', help="Method .json or .toml file")
+    parser.add_argument('--ladder', default=None, help="Import a 'carbons,time_s' CSV ladder")
+    parser.add_argument('--save', default=None, help="Write the ladder to CSV")
+    parser.add_argument('--particles', action='store_true',
+                        help="Simulate the ladder with particles instead of the preview")
+    parser.add_argument('--seed', type=int, default=None, help="Random seed for --particles")
+    parser.add_argument('--dead-time', type=float, default=0.0, help="Column dead time (s)")
+    parser.add_argument('--times', type=float, nargs='*', default=None,
+                        help="Retention times to index (default: the method's analytes)")
+    args = parser.parse_args()
+
+    method = Method.load(args.method)
+    isothermal = is_isothermal(method)
+    if args.ladder:
+        calibration = RetentionIndex.load(args.ladder, isothermal, args.dead_time)
+    else:
+        carbons, times = simulate_ladder(method, seed=args.seed, particles=args.particles)
+        calibration = RetentionIndex(carbons, times, isothermal, args.dead_time)
+    if args.save:
+        calibration.save(args.save)
+
+    kind = "Kovats" if isothermal else "linear"
+    print(f"{kind} index from C{calibration.carbons[0]:g}-C{calibration.carbons[-1]:g} "
+          f"({calibration.times[0]:.1f}-{calibration.times[-1]:.1f} s)")
+    if args.times is not None:
+        names, times = [f"{t:g} s" for t in args.times], np.array(args.times)
+    else:
+        preview = AnalyticPreview()
+        method.configure(preview.engine)
+        names, times, _ = preview.retention()
+    for name, t, ri in zip(names, times, calibration.index(times)):
+        print(f"  {name:<16} {t:8.1f} s  RI {ri:7.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
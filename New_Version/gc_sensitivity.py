@@ -0,0 +1,333 @@
+# gc_sensitivity.py
+"""
+Global sensitivity analysis of a method by Sobol indices.
+
+Factors (oven ramp, head pressure, column length, GCParameters.random_spread
+and each analyte's RF) are sampled over their ranges with a Saltelli design
+built on a Sobol sequence: every base point gives rows A, B and A with column
+i taken from B, for each factor i. Rows are evaluated in parallel batches with
+the analytic preview (or the continuum solver), and the first-order and total
+indices are accumulated as running sums (Saltelli 2010 and Jansen
+estimators), so they can be reported, with standard errors, after every
+batch. Outputs are the run time (last retention time) and the resolution of
+the critical pair.
+
+Usage: python gc_sensitivity.py method.toml --samples 256 --batch 32 --workers 4
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from gc_engine import SimulationEngine
+from gc_method import Method
+from gc_preview import AnalyticPreview
+
+OUTPUTS = ('run_time', 'resolution')
+METHOD_FACTORS = {            # Ranges of the matching GUI sliders
+    'ramp_rate': (1.0, 20.0),
+    'carrier_pressure': (10.0, 60.0),
+    'column_length': (0.1, 1.25),
+    'random_spread': (0.01, 0.10),
+}
+
+# Joe & Kuo (2008) initial direction numbers for Sobol dimensions 2-21; later
+# dimensions use seeded random odd numbers, which keeps the sequence valid
+JOE_KUO = ((1,), (1, 3), (1, 3, 1), (1, 1, 1), (1, 1, 3, 3), (1, 3, 5, 13),
+           (1, 1, 5, 5, 17), (1, 1, 5, 5, 5), (1, 1, 7, 11, 19), (1, 1, 5, 1, 1),
+           (1, 1, 1, 3, 11), (1, 3, 5, 5, 31), (1, 3, 3, 9, 7, 49), (1, 1, 1, 15, 21, 21),
+           (1, 3, 1, 13, 27, 49), (1, 1, 1, 15, 7, 5), (1, 3, 1, 15, 13, 25),
+           (1, 1, 5, 5, 19, 61), (1, 3, 7, 11, 23, 15, 103), (1, 3, 7, 13, 13, 15, 69))
+SOBOL_BITS = 32
+
+
+def is_primitive(poly, degree):
+    """True if the GF(2) polynomial with bit mask poly is primitive"""
+    order = (1 << degree) - 1
+
+    def power(exponent):
+        result, base = 1, 2  # The polynomial x
+        while exponent:
+            if exponent & 1:
+                result = multiply(result, base)
+            base = multiply(base, base)
+            exponent >>= 1
+        return result
+
+    def multiply(a, b):
+        product = 0
+        while b:
+            if b & 1:
+                product ^= a
+            b >>= 1
+            a <<= 1
+            if a >> degree:
+                a ^= poly
+        return product
+
+    factors = {p for p in range(2, order + 1) if order % p == 0 and
+               all(p % q for q in range(2, int(p ** 0.5) + 1))}
+    return power(order) == 1 and all(power(order // p) != 1 for p in factors)
+
+
+def primitive_polynomials(count):
+    """(degree, a) of the first count primitive polynomials, in Joe & Kuo's order
+
+    a holds the inner coefficients of x^s + a_1 x^(s-1) + ... + a_(s-1) x + 1.
+    """
+    found = []
+    degree = 1
+    while len(found) < count:
+        for a in range(1 << max(degree - 1, 0)):
+            if is_primitive((1 << degree) | (a << 1) | 1, degree):
+                found.append((degree, a))
+        degree += 1
+    return found[:count]
+
+
+def direction_numbers(dims, seed=0):
+    """(dims, SOBOL_BITS) Sobol direction numbers as integers"""
+    v = np.zeros((dims, SOBOL_BITS), dtype=np.uint64)
+    v[0] = [1 << (SOBOL_BITS - 1 - k) for k in range(SOBOL_BITS)]
+    rng = np.random.default_rng(seed)
+    for j, (s, a) in enumerate(primitive_polynomials(dims - 1), start=1):
+        if j - 1 < len(JOE_KUO):
+            m = JOE_KUO[j - 1]
+        else:
+            m = [int(rng.integers(0, 1 << (k - 1))) * 2 + 1 for k in range(1, s + 1)]
+        row = [m[k] << (SOBOL_BITS - 1 - k) for k in range(min(s, SOBOL_BITS))]
+        for k in range(s, SOBOL_BITS):
+            value = row[k - s] ^ (row[k - s] >> s)
+            for i in range(1, s):
+                if (a >> (s - 1 - i)) & 1:
+                    value ^= row[k - i]
+            row.append(value)
+        v[j] = row
+    return v
+
+
+def sobol_points(start, count, dims, directions=None):
+    """Points start .. start+count-1 of the dims-dimensional Sobol sequence in [0, 1)
+
+    Any index range can be generated directly, so batches need no shared state.
+    """
+    v = direction_numbers(dims) if directions is None else directions
+    index = np.arange(start, start + count, dtype=np.uint64)
+    gray = index ^ (index >> np.uint64(1))
+    x = np.zeros((count, dims), dtype=np.uint64)
+    for k in range(SOBOL_BITS):
+        bit = ((gray >> np.uint64(k)) & np.uint64(1)).astype(bool)
+        x[bit] ^= v[:, k]
+    return x.astype(float) / 2.0 ** SOBOL_BITS
+
+
+def default_factors(method):
+    """Method factors plus 'rf:<name>' over rf_range for every RF-based analyte"""
+    factors = dict(METHOD_FACTORS)
+    registry = method.registry()
+    for analyte, thermodynamic in zip(registry, registry.thermodynamic):
+        if not thermodynamic:
+            factors[f"rf:{analyte.name}"] = analyte.rf_range
+    return factors
+
+
+def apply_factor(engine, name, value):
+    """Set one factor on a configured engine"""
+    if name == 'random_spread':
+        engine.gc_params.random_spread = value
+    elif name.startswith('rf:'):
+        engine.settings[name[3:]] = value  # RF overrides are keyed by analyte name
+    else:
+        engine.settings[name] = value
+
+
+def peak_outputs(t_r, sigma):
+    """(run time, critical-pair resolution); NaN if any analyte fails to elute"""
+    if np.isnan(t_r).any() or len(t_r) < 2:
+        return np.nan, np.nan
+    order = np.argsort(t_r)
+    t_r, sigma = t_r[order], sigma[order]
+    resolution = np.diff(t_r) / (2 * (sigma[1:] + sigma[:-1]))
+    return t_r[-1], resolution.min()
+
+
+def evaluate_batch(method_data, names, values, engine='preview', dt=0.5, max_time=3600):
+    """Worker entry point: OUTPUTS for each row of factor values, shape (rows, len(OUTPUTS))"""
+    method = Method.from_dict(method_data)
+    if engine == 'preview':
+        preview = AnalyticPreview(max_time=max_time)
+        simulation = method.configure(preview.engine)
+    else:
+        simulation = method.configure(SimulationEngine())
+        simulation.solver = 'continuum'
+    defaults = dict(simulation.settings)
+    spread = simulation.gc_params.random_spread
+    results = np.full((len(values), len(OUTPUTS)), np.nan)
+    for row, factor_values in enumerate(values):
+        simulation.settings = dict(defaults)
+        simulation.gc_params.random_spread = spread
+        for name, value in zip(names, factor_values):
+            apply_factor(simulation, name, float(value))
+        if engine == 'preview':
+            _, t_r, sigma = preview.retention()
+        else:
+            simulation.clear()  # Nothing carries over from the previous row's run
+            result = simulation.run_headless(dt, max_time)
+            t_r, sigma = event_moments(result, [simulation.registry.code(name)
+                                                for name in simulation.particle_types])
+        results[row] = peak_outputs(t_r, sigma)
+    return results
+
+
+def event_moments(result, codes):
+    """Weighted mean and standard deviation of detection time per type code"""
+    n_types = len(result.type_names)
+    weights = np.bincount(result.event_types, result.event_weights, n_types)
+    first = np.bincount(result.event_types, result.event_weights * result.event_times, n_types)
+    second = np.bincount(result.event_types, result.event_weights * result.event_times ** 2,
+                         n_types)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = first / weights
+        sigma = np.sqrt(np.maximum(second / weights - mean ** 2, 0))
+    return mean[codes], sigma[codes]
+
+
+class SobolIndices:
+    """Running first-order and total Sobol indices per (output, factor)
+
+    update() takes the evaluations of any set of base points; the estimators
+    are sums over base points, so batches may arrive in any order. Base points
+    with a non-finite value for an output are left out of that output.
+    """
+
+    def __init__(self, names, outputs=OUTPUTS):
+        self.names = list(names)
+        self.outputs = list(outputs)
+        shape = (len(self.outputs), len(self.names))
+        self.n = np.zeros(len(self.outputs))
+        self.sum_y = np.zeros(len(self.outputs))
+        self.sum_y2 = np.zeros(len(self.outputs))
+        self.first = np.zeros(shape)
+        self.first_sq = np.zeros(shape)
+        self.total = np.zeros(shape)
+        self.total_sq = np.zeros(shape)
+
+    def update(self, f_a, f_b, f_ab):
+        """f_a, f_b (points, outputs) and f_ab (points, factors, outputs)"""
+        valid = np.isfinite(f_a) & np.isfinite(f_b) & np.isfinite(f_ab).all(axis=1)
+        f_a, f_b = np.where(valid, f_a, 0.0), np.where(valid, f_b, 0.0)
+        f_ab = np.where(valid[:, None, :], f_ab, 0.0)
+        self.n += valid.sum(axis=0)
+        self.sum_y += (f_a + f_b).sum(axis=0)
+        self.sum_y2 += (f_a ** 2 + f_b ** 2).sum(axis=0)
+        first = f_b[:, None, :] * (f_ab - f_a[:, None, :])   # Saltelli 2010
+        total = 0.5 * (f_a[:, None, :] - f_ab) ** 2           # Jansen
+        self.first += first.sum(axis=0).T
+        self.first_sq += (first ** 2).sum(axis=0).T
+        self.total += total.sum(axis=0).T
+        self.total_sq += (total ** 2).sum(axis=0).T
+
+    def indices(self):
+        """(first-order, total, first-order SE, total SE), each (outputs, factors)"""
+        n = np.maximum(self.n, 1)[:, None]
+        mean = self.sum_y[:, None] / (2 * n)
+        variance = self.sum_y2[:, None] / (2 * n) - mean ** 2
+        with np.errstate(invalid='ignore', divide='ignore'):
+            first, total = self.first / n / variance, self.total / n / variance
+            first_se = np.sqrt(np.maximum(self.first_sq / n - (self.first / n) ** 2, 0) / n) / variance
+            total_se = np.sqrt(np.maximum(self.total_sq / n - (self.total / n) ** 2, 0) / n) / variance
+        return first, total, first_se, total_se
+
+
+class SensitivityAnalysis:
+    """Saltelli sampling of factors around a method, evaluated in parallel batches
+
+    factors maps name -> (low, high); see default_factors and apply_factor.
+    base_samples should be a power of two for the Sobol sequence's balance.
+    """
+
+    def __init__(self, method, factors=None, engine='preview', base_samples=256, batch_size=32,
+                 workers=None):
+        if engine not in ('preview', 'continuum'):
+            raise ValueError(f"Unknown engine '{engine}'")
+        self.method = method
+        self.factors = dict(factors or default_factors(method))
+        self.names = list(self.factors)
+        self.engine = engine
+        self.base_samples = base_samples
+        self.batch_size = batch_size
+        self.workers = workers
+        self.directions = direction_numbers(2 * len(self.names))
+        self.sobol = SobolIndices(self.names)
+
+    def samples(self, start, count):
+        """Factor values for base points start..start+count-1, shape (count, d + 2, d)
+
+        Row 0 is A, row 1 is B and row 2 + i is A with factor i taken from B.
+        Base point n is Sobol point n + 1: the all-zero first point would put
+        every factor at the low end of its range.
+        """
+        d = len(self.names)
+        low, high = np.array(list(self.factors.values()), dtype=float).T
+        unit = sobol_points(start + 1, count, 2 * d, self.directions)
+        points = low + unit.reshape(count, 2, d) * (high - low)
+        a, b = points[:, 0], points[:, 1]
+        rows = np.repeat(a[:, None, :], d + 2, axis=1)
+        rows[:, 1] = b
+        factor = np.arange(d)
+        rows[:, 2 + factor, factor] = b[:, factor]
+        return rows
+
+    def run(self, progress=None):
+        """Evaluate every batch; progress(self.sobol, done, total) after each one"""
+        d = len(self.names)
+        method_data = self.method.to_dict()
+        starts = range(0, self.base_samples, self.batch_size)
+        with ProcessPoolExecutor(self.workers) as pool:
+            futures = {}
+            for start in starts:
+                count = min(self.batch_size, self.base_samples - start)
+                values = self.samples(start, count).reshape(-1, d)
+                futures[pool.submit(evaluate_batch, method_data, self.names, values,
+                                    self.engine)] = count
+            for done, future in enumerate(as_completed(futures), start=1):
+                f = future.result().reshape(futures[future], d + 2, len(OUTPUTS))
+                self.sobol.update(f[:, 0], f[:, 1], f[:, 2:])
+                if progress is not None:
+                    progress(self.sobol, done, len(futures))
+        return self.sobol
+
+
+def print_progress(sobol, done, total):
+    """Default progress reporter: the leading total index per output"""
+    _, total_index, _, _ = sobol.indices()
+    leaders = [f"{output} {sobol.names[np.nanargmax(row)]} ({np.nanmax(row):.2f})"
+               if np.isfinite(row).any() else f"{output} -"
+               for output, row in zip(sobol.outputs, total_index)]
+    print(f"[{done}/{total}] n={int(sobol.n.min())}  " + ", ".join(leaders))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sobol sensitivity of run time and resolution")
+    parser.add_argument('method', help="Method .json or .toml file")
+    parser.add_argument('--samples', type=int, default=256, help="Base samples (power of two)")
+    parser.add_argument('--batch', type=int, default=32, help="Base samples per batch")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes")
+    parser.add_argument('--engine', default='preview', choices=('preview', 'continuum'))
+    args = parser.parse_args()
+
+    analysis = SensitivityAnalysis(Method.load(args.method), engine=args.engine,
+                                   base_samples=args.samples, batch_size=args.batch,
+                                   workers=args.workers)
+    sobol = analysis.run(print_progress)
+    first, total, first_se, total_se = sobol.indices()
+    for o, output in enumerate(sobol.outputs):
+        print(f"\n{output} ({int(sobol.n[o])} base samples)")
+        print(f"  {'factor':<20} {'S1':>14} {'ST':>14}")
+        for f in np.argsort(-np.nan_to_num(total[o])):
+            print(f"  {sobol.names[f]:<20} {first[o, f]:6.3f} ± {first_se[o, f]:.3f}"
+                  f"  {total[o, f]:6.3f} ± {total_se[o, f]:.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
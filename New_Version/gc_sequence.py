@@ -0,0 +1,238 @@
+# gc_sequence.py
+"""
+Autosampler-style sequence runner.
+
+Queues many injections, each described by a method file, and pipelines them:
+method loading happens in the main process, simulation runs in a process pool
+and results are written by a background thread while later samples simulate.
+A failing sample is reported and skipped; the rest of the queue keeps draining.
+If a worker process dies, the samples it took down are failed and a fresh pool
+takes the rest.
+
+Usage: python gc_sequence.py sequence.json --out results --workers 4
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from gc_cache import ResultCache, cached_run
+from gc_engine import SimulationEngine
+from gc_method import Method
+
+
+def simulate_sample(method_data, seed, cache_dir, dt, max_time):
+    """Worker entry point: run one injection inside a pool process"""
+    method = Method.from_dict(method_data)
+    engine = method.configure(SimulationEngine(seed=seed))
+    if cache_dir:
+        return cached_run(ResultCache(cache_dir), engine, dt, max_time)
+    return engine.run_headless(dt, max_time)
+
+
+def print_progress(sample, state, done, total):
+    """Default progress reporter"""
+    message = f"[{done}/{total}] {sample.name}: {state}"
+    if sample.error:
+        message += f" ({sample.error})"
+    print(message)
+
+
+class Sample:
+    """One queued injection and its progress through the pipeline"""
+
+    def __init__(self, name, method_path, seed=None):
+        self.name = name
+        self.method_path = method_path
+        self.seed = seed
+        self.state = 'queued'
+        self.error = None
+        self.output_path = None
+        self.started = None
+        self.elapsed = None
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'method': self.method_path,
+            'seed': self.seed,
+            'state': self.state,
+            'error': self.error,
+            'output': self.output_path,
+            'elapsed_s': self.elapsed,
+        }
+
+
+def load_sequence(path):
+    """Read a sequence file: {"samples": [{"name", "method", "seed", "injections"}]}
+
+    Method paths are resolved relative to the sequence file. A sample with
+    "injections": n is expanded into n replicate injections with consecutive seeds.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    samples = []
+    for index, entry in enumerate(data['samples']):
+        name = entry.get('name', f"sample{index + 1}")
+        method_path = os.path.join(base_dir, entry['method'])
+        seed = entry.get('seed', index)
+        injections = entry.get('injections', 1)
+        for replicate in range(injections):
+            sample_name = name if injections == 1 else f"{name}_{replicate + 1}"
+            sample_seed = None if seed is None else seed + replicate
+            samples.append(Sample(sample_name, method_path, sample_seed))
+    return samples
+
+
+class SequenceRunner:
+    """Drains a queue of samples through prep, a simulation pool and a result writer"""
+
+    def __init__(self, samples, output_dir, workers=None, cache_dir=None,
+                 dt=0.5, max_time=3600, progress=print_progress):
+        self.samples = list(samples)
+        self.output_dir = output_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_dir = cache_dir
+        self.dt = dt
+        self.max_time = max_time
+        self.progress = progress
+        self.done = 0
+
+    def report(self, sample, state, error=None):
+        sample.state = state
+        sample.error = error
+        if state in ('written', 'failed'):
+            self.done += 1
+            sample.elapsed = time.perf_counter() - sample.started
+        self.progress(sample, state, self.done, len(self.samples))
+
+    def prepare(self, sample):
+        """Load and validate the method; returns its dict form for the worker"""
+        sample.started = time.perf_counter()
+        method = Method.load(sample.method_path)
+        return method.to_dict()
+
+    def write_result(self, sample, method_data, result):
+        """Write one finished injection as JSON"""
+        path = os.path.join(self.output_dir, f"{sample.name}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'sample': sample.name,
+                'seed': sample.seed,
+                'method': method_data,
+                'simulation_time': result.simulation_time,
+                'chromatogram': result.chromatogram,
+                'detector_counts': result.detector_counts,
+                'type_names': result.type_names,
+                'event_times': np.asarray(result.event_times).tolist(),
+                'event_types': np.asarray(result.event_types).tolist(),
+                'event_weights': np.asarray(result.event_weights).tolist(),
+            }, f)
+        return path
+
+    def run(self):
+        """Process every sample; returns the samples with their final state"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        queue = iter(self.samples)
+        in_flight = {}   # simulation future -> (sample, method_data, pool)
+        writing = {}     # writer future -> sample
+        max_in_flight = self.workers * 2  # Keep the pool fed without loading every method up front
+
+        pool = ProcessPoolExecutor(self.workers)
+        try:
+            with ThreadPoolExecutor(1) as writer:
+                exhausted = False
+                while True:
+                    # Prep stage: top up the pool
+                    while not exhausted and len(in_flight) < max_in_flight:
+                        sample = next(queue, None)
+                        if sample is None:
+                            exhausted = True
+                            break
+                        try:
+                            method_data = self.prepare(sample)
+                        except Exception as e:
+                            self.report(sample, 'failed', f"prep: {e}")
+                            continue
+                        try:
+                            future = pool.submit(simulate_sample, method_data, sample.seed,
+                                                 self.cache_dir, self.dt, self.max_time)
+                        except BrokenProcessPool as e:
+                            self.report(sample, 'failed', f"simulation: {e}")
+                            pool = self.replace_pool(pool)
+                            continue
+                        in_flight[future] = (sample, method_data, pool)
+                        self.report(sample, 'running')
+
+                    if not in_flight and not writing:
+                        break
+
+                    finished, _ = wait(list(in_flight) + list(writing),
+                                       return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        if future in in_flight:
+                            sample, method_data, owner = in_flight.pop(future)
+                            try:
+                                result = future.result()
+                            except BrokenProcessPool as e:
+                                self.report(sample, 'failed', f"simulation: {e}")
+                                # Every future of a broken pool fails; replace it once
+                                if owner is pool:
+                                    pool = self.replace_pool(pool)
+                                continue
+                            except Exception as e:
+                                self.report(sample, 'failed', f"simulation: {e}")
+                                continue
+                            self.report(sample, 'simulated')
+                            writing[writer.submit(self.write_result, sample, method_data,
+                                                  result)] = sample
+                        else:
+                            sample = writing.pop(future)
+                            try:
+                                sample.output_path = future.result()
+                            except Exception as e:
+                                self.report(sample, 'failed', f"write: {e}")
+                                continue
+                            self.report(sample, 'written')
+        finally:
+            pool.shutdown()
+
+        self.write_summary()
+        return self.samples
+
+    def replace_pool(self, pool):
+        """Discard a broken process pool and start a fresh one"""
+        pool.shutdown(wait=False)
+        return ProcessPoolExecutor(self.workers)
+
+    def write_summary(self):
+        path = os.path.join(self.output_dir, 'sequence_summary.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump([sample.to_dict() for sample in self.samples], f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a GC sequence headless")
+    parser.add_argument('sequence', help="Sequence JSON file")
+    parser.add_argument('--out', default='sequence_results', help="Output directory")
+    parser.add_argument('--workers', type=int, default=None, help="Simulation processes")
+    parser.add_argument('--cache', default=None, help="Result cache directory")
+    parser.add_argument('--dt', type=float, default=0.5, help="Simulation step (s)")
+    parser.add_argument('--max-time', type=float, default=3600, help="Run cut-off (s)")
+    args = parser.parse_args()
+
+    runner = SequenceRunner(load_sequence(args.sequence), args.out, args.workers,
+                            args.cache, args.dt, args.max_time)
+    samples = runner.run()
+    failed = [sample for sample in samples if sample.state == 'failed']
+    print(f"{len(samples) - len(failed)} of {len(samples)} samples completed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,417 @@
+# gc_service.py
+"""
+Local simulation service: an HTTP/JSON API in front of the headless engine.
+
+Tools that want chromatograms (LIMS mock-ups, notebooks, dashboards) submit a
+method and poll or stream its progress, without embedding pygame or tkinter.
+Runs execute in a process pool with bounded concurrency; submissions beyond
+the queue limit are refused with 429 so callers back off. Finished results
+live in the ResultCache, so identical seeded submissions are answered from
+the store.
+
+    POST /runs                  {"method": {...}, "seed": 1} -> 202 {"id", "state"}
+    GET  /runs/<id>             state and progress
+    GET  /runs/<id>/progress    newline-delimited JSON progress, streamed until done
+    GET  /runs/<id>/result      chromatogram, amounts, vented amounts
+    GET  /health                workers, queue depth, job counts
+
+The server only binds loopback addresses.
+
+Usage: python gc_service.py --port 8765 --workers 4 --cache service_cache
+"""
+
+import argparse
+import asyncio
+import ipaddress
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from gc_cache import ResultCache, run_key
+from gc_engine import SimulationEngine
+from gc_method import Method
+
+HTTP_REASONS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found',
+                405: 'Method Not Allowed', 409: 'Conflict', 429: 'Too Many Requests',
+                500: 'Internal Server Error'}
+
+_progress_queue = None  # Set in each pool process by init_worker
+
+
+def init_worker(queue):
+    global _progress_queue
+    _progress_queue = queue
+
+
+def simulate_job(job_id, method_data, seed, key, cache_dir, dt, max_time, report_every=0.25):
+    """Pool entry point: run one method into the result store under key"""
+    method = Method.from_dict(method_data)
+    engine = method.configure(SimulationEngine(seed=seed))
+    cache = ResultCache(cache_dir)
+    if cache.get(key) is not None:
+        return key
+
+    last = [0.0]
+
+    def report(engine):
+        now = time.monotonic()
+        if _progress_queue is not None and now - last[0] >= report_every:
+            last[0] = now
+            _progress_queue.put((job_id, engine.simulation_time, engine.progress()))
+
+    cache.put(key, engine.run_headless(dt, max_time, report))
+    return key
+
+
+def result_to_dict(result):
+    return {
+        'simulation_time': result.simulation_time,
+        'type_names': result.type_names,
+        'chromatogram': result.chromatogram,
+        'amounts': result.amounts(),
+        'vented': result.vented_amounts(),
+    }
+
+
+class Job:
+    """One submitted run and its progress"""
+
+    def __init__(self, job_id, method_data, seed, key):
+        self.id = job_id
+        self.method_data = method_data
+        self.seed = seed
+        self.key = key
+        self.state = 'queued'
+        self.error = None
+        self.simulation_time = 0.0
+        self.progress = 0.0
+        self.changed = asyncio.Condition()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'state': self.state,
+            'error': self.error,
+            'seed': self.seed,
+            'simulation_time': self.simulation_time,
+            'progress': self.progress,
+        }
+
+    async def update(self, **values):
+        for name, value in values.items():
+            setattr(self, name, value)
+        async with self.changed:
+            self.changed.notify_all()
+
+    async def report(self, simulation_time, progress):
+        """Worker progress; reports that arrive after the job has finished are dropped"""
+        if self.state == 'running':
+            await self.update(simulation_time=simulation_time, progress=progress)
+
+
+class SimulationService:
+    """asyncio HTTP server that queues runs onto a process pool"""
+
+    def __init__(self, host='127.0.0.1', port=8765, workers=None, queue_limit=32,
+                 cache_dir=None, dt=0.5, max_time=3600):
+        if not ipaddress.ip_address(host).is_loopback:
+            raise ValueError("The simulation service only binds loopback addresses")
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_limit = queue_limit
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), 'gc_service_cache')
+        self.cache = ResultCache(self.cache_dir)
+        self.dt = dt
+        self.max_time = max_time
+        self.jobs = {}
+        self.server = None
+
+    async def start(self):
+        """Open the pool and the listening socket; returns the bound port"""
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(self.queue_limit)
+        self.progress_queue = multiprocessing.get_context().Queue()
+        self.pool = ProcessPoolExecutor(self.workers, initializer=init_worker,
+                                        initargs=(self.progress_queue,))
+        self.dispatchers = [asyncio.create_task(self.dispatch()) for _ in range(self.workers)]
+        self.progress_thread = threading.Thread(target=self.read_progress, daemon=True)
+        self.progress_thread.start()
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        for task in self.dispatchers:
+            task.cancel()
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self.progress_queue.put(None)
+        self.progress_thread.join()
+
+    def read_progress(self):
+        """Forward worker progress reports onto the event loop"""
+        while True:
+            message = self.progress_queue.get()
+            if message is None:
+                return
+            job_id, simulation_time, progress = message
+            job = self.jobs.get(job_id)
+            if job is not None:
+                asyncio.run_coroutine_threadsafe(job.report(simulation_time, progress), self.loop)
+
+    async def dispatch(self):
+        """Feed queued jobs to the pool, one at a time per dispatcher"""
+        while True:
+            job = await self.queue.get()
+            await job.update(state='running')
+            try:
+                await self.loop.run_in_executor(
+                    self.pool, simulate_job, job.id, job.method_data, job.seed, job.key,
+                    self.cache_dir, self.dt, self.max_time)
+            except Exception as e:
+                await job.update(state='failed', error=str(e))
+            else:
+                await job.update(state='done', progress=1.0)
+            finally:
+                self.queue.task_done()
+
+    def submit(self, payload):
+        """Validate a submission and queue it; returns (status, body)"""
+        try:
+            method = Method.from_dict(payload['method'])
+        except (KeyError, TypeError, ValueError) as e:
+            return 400, {'error': f"invalid method: {e}"}
+        seed = payload.get('seed')
+        if seed is not None and (type(seed) is not int or seed < 0):
+            return 400, {'error': 'seed must be a non-negative integer or null'}
+        job_id = uuid.uuid4().hex[:12]
+        engine = method.configure(SimulationEngine(seed=seed))
+        extra = engine.run_config()
+        if seed is None:
+            extra['job'] = job_id  # Unseeded runs are not reproducible, so never shared
+        key = run_key(engine.gc_params, engine.settings, seed,
+                      dt=self.dt, max_time=self.max_time, **extra)
+
+        job = Job(job_id, method.to_dict(), seed, key)
+        if os.path.exists(self.cache.path_for(key)):
+            job.state, job.progress = 'done', 1.0  # Already in the result store
+        else:
+            try:
+                self.queue.put_nowait(job)
+            except asyncio.QueueFull:
+                return 429, {'error': 'queue is full, retry later',
+                             'queued': self.queue.qsize()}
+        self.jobs[job.id] = job
+        return 202, job.to_dict()
+
+    def result(self, job):
+        if job.state != 'done':
+            return 409, {'error': f"run is {job.state}", 'state': job.state}
+        result = self.cache.get(job.key)
+        if result is None:
+            return 404, {'error': 'result has been evicted from the store'}
+        return 200, dict(result_to_dict(result), id=job.id)
+
+    async def handle(self, reader, writer):
+        """Serve one HTTP/1.1 request per connection"""
+        try:
+            request = await reader.readline()
+            method, path, _ = request.decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+            await self.route(method, path.split('?')[0].rstrip('/'), body, writer)
+        except (ValueError, asyncio.IncompleteReadError):
+            await self.respond(writer, 400, {'error': 'malformed request'})
+        except ConnectionError:
+            pass
+        except Exception as e:
+            try:
+                await self.respond(writer, 500, {'error': f"internal error: {e}"})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body, writer):
+        parts = path.strip('/').split('/')
+        if parts == ['health']:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job.state] = counts.get(job.state, 0) + 1
+            return await self.respond(writer, 200, {'workers': self.workers,
+                                                    'queued': self.queue.qsize(),
+                                                    'jobs': counts})
+        if parts == ['runs']:
+            if method != 'POST':
+                return await self.respond(writer, 405, {'error': 'use POST'})
+            try:
+                payload = json.loads(body or b'{}')
+            except ValueError:
+                return await self.respond(writer, 400, {'error': 'body is not JSON'})
+            return await self.respond(writer, *self.submit(payload))
+        if len(parts) in (2, 3) and parts[0] == 'runs':
+            job = self.jobs.get(parts[1])
+            if job is None:
+                return await self.respond(writer, 404, {'error': 'no such run'})
+            if len(parts) == 2:
+                return await self.respond(writer, 200, job.to_dict())
+            if parts[2] == 'result':
+                return await self.respond(writer, *self.result(job))
+            if parts[2] == 'progress':
+                return await self.stream_progress(job, writer)
+        await self.respond(writer, 404, {'error': 'not found'})
+
+    async def respond(self, writer, status, body):
+        data = json.dumps(body).encode('utf-8')
+        writer.write(f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                     f"Content-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\n"
+                     f"Connection: close\r\n\r\n".encode('latin-1') + data)
+        await writer.drain()
+
+    async def stream_progress(self, job, writer):
+        """Chunked newline-delimited JSON, one line per progress change, until the run ends"""
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+        while True:
+            sent = job.to_dict()
+            line = json.dumps(sent).encode('utf-8') + b'\n'
+            writer.write(f"{len(line):x}\r\n".encode('latin-1') + line + b"\r\n")
+            await writer.drain()
+            if sent['state'] in ('done', 'failed'):
+                break
+            async with job.changed:
+                await job.changed.wait_for(lambda: job.to_dict() != sent)
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+class LocalService:
+    """Runs a SimulationService on its own event loop thread, for scripts and tests
+
+        with LocalService(workers=2) as service:
+            client = ServiceClient(service.url)
+    """
+
+    def __init__(self, **options):
+        options.setdefault('port', 0)  # Any free port
+        self.service = SimulationService(**options)
+        self.ready = threading.Event()
+        self.thread = None
+        self.url = None
+
+    def __enter__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        port = asyncio.run_coroutine_threadsafe(self.service.start(), self.loop).result()
+        self.url = f"http://{self.service.host}:{port}"
+        return self
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self.service.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+class ServiceError(Exception):
+    def __init__(self, status, body):
+        super().__init__(f"{status}: {body.get('error', body)}")
+        self.status = status
+        self.body = body
+
+
+class ServiceClient:
+    """Plain urllib client for the simulation service"""
+
+    def __init__(self, url='http://127.0.0.1:8765', timeout=30):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, payload=None):
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        request = urllib.request.Request(self.url + path, data=data, method=method,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise ServiceError(e.code, json.loads(e.read() or b'{}')) from None
+
+    def submit(self, method, seed=None):
+        """Queue a Method (or its dict form); returns the run id"""
+        method_data = method.to_dict() if isinstance(method, Method) else method
+        return self.request('POST', '/runs', {'method': method_data, 'seed': seed})['id']
+
+    def status(self, run_id):
+        return self.request('GET', f'/runs/{run_id}')
+
+    def result(self, run_id):
+        return self.request('GET', f'/runs/{run_id}/result')
+
+    def health(self):
+        return self.request('GET', '/health')
+
+    def progress(self, run_id):
+        """Yield status dicts as the run progresses, ending with the final one"""
+        request = urllib.request.Request(f"{self.url}/runs/{run_id}/progress")
+        with urllib.request.urlopen(request, timeout=None) as response:
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
+
+    def run(self, method, seed=None):
+        """Submit, follow progress to the end and return the result"""
+        run_id = self.submit(method, seed)
+        for status in self.progress(run_id):
+            if status['state'] == 'failed':
+                raise ServiceError(500, status)
+        return self.result(run_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the GC engine over local HTTP/JSON")
+    parser.add_argument('--host', default='127.0.0.1', help="Loopback address to bind")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=None, help="Simulation processes")
+    parser.add_argument('--queue', type=int, default=32, help="Queued runs before 429")
+    parser.add_argument('--cache', default=None, help="Result store directory")
+    parser.add_argument('--dt', type=float, default=0.5, help="Simulation step (s)")
+    parser.add_argument('--max-time', type=float, default=3600, help="Run cut-off (s)")
+    args = parser.parse_args()
+
+    service = SimulationService(args.host, args.port, args.workers, args.queue,
+                                args.cache, args.dt, args.max_time)
+
+    async def serve():
+        port = await service.start()
+        print(f"Serving on http://{service.host}:{port}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await service.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,104 @@
+# gc_signal.py
+"""
+Detector signal synthesis: the analyte response on top of a realistic baseline.
+
+SignalGenerator degrades clean detector samples (see gc_detector.FID) with
+
+    column bleed      rising exponentially with the oven temperature
+    baseline drift    proportional to how far the oven has moved from its start
+    shot noise        proportional to the square root of signal plus bleed
+    electronic noise  white, independent of the signal
+
+Samples are produced in vectorized chunks as the run advances and only the
+detector's ring buffer is kept, so a run of any length streams in constant
+memory.
+
+Usage: python gc_signal.py method.toml --seed 1 --rate 10 --out trace.csv
+"""
+
+import argparse
+import numpy as np
+from gc_detector import FID
+from gc_engine import SimulationEngine
+from gc_method import Method
+
+
+class SignalGenerator:
+    """Baseline and noise for a detector trace
+
+    Bleed is `bleed` at bleed_reference °C and doubles every bleed_doubling °C;
+    drift adds `drift` per 100 °C above the start of the oven program.
+    """
+
+    def __init__(self, bleed=1.0, bleed_reference=250.0, bleed_doubling=20.0, drift=0.1,
+                 shot_noise=0.3, electronic_noise=0.2, seed=None):
+        self.bleed = bleed
+        self.bleed_reference = bleed_reference
+        self.bleed_doubling = bleed_doubling
+        self.drift = drift
+        self.shot_noise = shot_noise
+        self.electronic_noise = electronic_noise
+        self.seed = seed
+        self.start()
+
+    def start(self):
+        """Restart the noise sequence"""
+        self.rng = np.random.default_rng(self.seed)
+
+    def baseline(self, temperature_program, times):
+        """Noise-free bleed plus drift at the given run times (s)"""
+        table = temperature_program.table
+        temperature = np.interp(times, table.times, table.values)
+        bleed = self.bleed * np.exp2((temperature - self.bleed_reference) / self.bleed_doubling)
+        return bleed + self.drift * (temperature - table.values[0]) / 100
+
+    def degrade(self, signal, temperature_program, times):
+        """Add baseline and noise to clean signal samples taken at times"""
+        level = signal + self.baseline(temperature_program, times)
+        noise = (self.shot_noise * np.sqrt(np.maximum(level, 0)) * self.rng.standard_normal(len(level)) +
+                 self.electronic_noise * self.rng.standard_normal(len(level)))
+        return level + noise
+
+
+def stream_signal(engine, detector, dt=0.5, max_time=3600):
+    """Inject and run engine headless, yielding (times, values) chunks from detector"""
+    engine.physics_only = True
+    engine.inject_particles()
+    detector.start()
+    position = 0
+    while engine.simulation_time < max_time and not engine.is_complete():
+        engine.step(dt)
+        if detector.acquire(engine.detections, engine.simulation_time, engine.temperature_program):
+            times, values, position = detector.ring.read(position)
+            yield times, values
+    # Close the window the last event fell in
+    if detector.acquire(engine.detections, engine.simulation_time + 1 / detector.rate,
+                        engine.temperature_program):
+        times, values, position = detector.ring.read(position)
+        yield times, values
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a synthetic FID trace to CSV")
+    parser.add_argument('method', help="Method .json or .toml file")
+    parser.add_argument('--seed', type=int, default=None, help="Random seed")
+    parser.add_argument('--rate', type=float, default=10.0, help="Acquisition rate (Hz)")
+    parser.add_argument('--out', default='trace.csv', help="Output CSV file")
+    parser.add_argument('--max-time', type=float, default=3600, help="Run cut-off (s)")
+    args = parser.parse_args()
+
+    engine = Method.load(args.method).configure(SimulationEngine(seed=args.seed))
+    detector = FID(engine.registry, rate=args.rate, time_constant=0.0,
+                   signal=SignalGenerator(seed=args.seed))
+    samples = 0
+    with open(args.out, 'w', encoding='utf-8') as f:
+        f.write("time_s,signal\n")
+        for times, values in stream_signal(engine, detector, max_time=args.max_time):
+            np.savetxt(f, np.column_stack([times, values[:, 0]]), fmt='%.3f,%.6g')
+            samples += len(times)
+    print(f"Wrote {samples} samples to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
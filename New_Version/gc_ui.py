@@ -1,6 +1,7 @@
 # gc_ui.py
 import pygame
 import math
+import numpy as np
 
 # Constants
 WINDOW_WIDTH = 1600
@@ -11,21 +12,15 @@ GRAPH_WIDTH = 400
 GRAPH_HEIGHT = 300
 GRAPH_X = 900
 GRAPH_Y = 150
+DENSITY_HEIGHT = 70
+DENSITY_GAP = 25
+DENSITY_BIN_WIDTH = 4  # Column pixels per density bin
 
 # Colors
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 GRAY = (200, 200, 200)
-COLORS = {
-    'solvent': (255, 0, 0),
-    'nonpolar1': (0, 255, 0),
-    'nonpolar2': (0, 0, 255),
-    'semipolar1': (255, 255, 0),
-    'semipolar2': (255, 0, 255),
-    'polar1': (0, 255, 255),
-    'polar2': (128, 0, 0),
-    'verypolar': (0, 128, 0)
-}
+PREVIEW_COLOR = (120, 120, 220)
 
 
 class Slider:
@@ -112,14 +107,47 @@ class ToggleButton(Button):
         return False
 
 
+class DensityStrip:
+    """Per-analyte occupancy along the column, stacked as filled bands above it"""
+
+    def draw(self, screen, density, colors, x_start, x_end, column_y):
+        total = density.sum(axis=0)
+        peak = total.max() if len(total) else 0
+        if peak <= 0:
+            return
+
+        bins = density.shape[1]
+        base_y = column_y - DENSITY_GAP
+        x = np.linspace(x_start, x_end, bins + 1)
+        x = np.repeat(x, 2)[1:-1]  # Step outline: both edges of every bin
+        lower = np.zeros(bins)
+        for code in np.flatnonzero(density.sum(axis=1) > 0):
+            upper = lower + density[code] / peak * DENSITY_HEIGHT
+            top = np.column_stack([x, base_y - np.repeat(upper, 2)])
+            bottom = np.column_stack([x[::-1], base_y - np.repeat(lower, 2)[::-1]])
+            pygame.draw.polygon(screen, tuple(colors[code]), np.vstack([top, bottom]).tolist())
+            lower = upper
+        pygame.draw.line(screen, BLACK, (x_start, base_y), (x_end, base_y))
+
+
 class ChromatogramDisplay:
     def __init__(self):
         self.font = pygame.font.SysFont(None, 24)
+        self.time_label = self.font.render("Time (min)", True, BLACK)
+        self.intensity_label = pygame.transform.rotate(
+            self.font.render("Intensity", True, BLACK), 90)
 
-    def draw(self, screen, chromatogram):
-        if not chromatogram:
+    def draw(self, screen, chromatogram, preview=None, log_scale=False):
+        if not chromatogram and not preview:
             return
 
+        if log_scale:
+            # Weighted runs span many decades; show log10 intensity above a 1e-7 floor
+            peak = max([p[1] for p in (chromatogram or []) + (preview or [])] + [1e-12])
+            floor = peak * 1e-7
+            chromatogram = [(t, math.log10(max(v, floor) / floor)) for t, v in chromatogram or []]
+            preview = [(t, math.log10(max(v, floor) / floor)) for t, v in preview or []]
+
         # Draw axes
         pygame.draw.line(screen, BLACK,
                          (GRAPH_X, GRAPH_Y + GRAPH_HEIGHT),
@@ -129,27 +157,29 @@ class ChromatogramDisplay:
                          (GRAPH_X, GRAPH_Y + GRAPH_HEIGHT))
 
         # Draw labels
-        time_label = self.font.render("Time (min)", True, BLACK)
-        screen.blit(time_label, (GRAPH_X + GRAPH_WIDTH // 2 - 30,
-                                 GRAPH_Y + GRAPH_HEIGHT + 30))
+        screen.blit(self.time_label, (GRAPH_X + GRAPH_WIDTH // 2 - 30,
+                                      GRAPH_Y + GRAPH_HEIGHT + 30))
+        screen.blit(self.intensity_label, (GRAPH_X - 40, GRAPH_Y + GRAPH_HEIGHT // 2 - 30))
 
-        intensity_label = self.font.render("Intensity", True, BLACK)
-        intensity_label = pygame.transform.rotate(intensity_label, 90)
-        screen.blit(intensity_label, (GRAPH_X - 40, GRAPH_Y + GRAPH_HEIGHT // 2 - 30))
-
-        # Draw data
-        max_time = max([p[0] for p in chromatogram]) if chromatogram else 1
-        max_intensity = max([p[1] for p in chromatogram]) if chromatogram else 1
+        # Draw data, scaled so the run and the preview share axes
+        everything = (chromatogram or []) + (preview or [])
+        max_time = max([p[0] for p in everything])
+        max_intensity = max([p[1] for p in everything])
 
         time_scale = GRAPH_WIDTH / max(max_time, 1)
         intensity_scale = GRAPH_HEIGHT / max(max_intensity, 1)
 
-        points = [(GRAPH_X + min(p[0] * time_scale, GRAPH_WIDTH),
-                   GRAPH_Y + GRAPH_HEIGHT - min(p[1] * intensity_scale, GRAPH_HEIGHT))
-                  for p in chromatogram]
-
-        if len(points) > 1:
-            pygame.draw.lines(screen, BLACK, False, points)
+        for data, color in ((preview, PREVIEW_COLOR), (chromatogram, BLACK)):
+            if not data:
+                continue
+            points = np.asarray(data, dtype=float)
+            points[:, 0] = GRAPH_X + np.minimum(points[:, 0] * time_scale, GRAPH_WIDTH)
+            points[:, 1] = GRAPH_Y + GRAPH_HEIGHT - np.minimum(points[:, 1] * intensity_scale,
+                                                               GRAPH_HEIGHT)
+            points = points.tolist()
+
+            if len(points) > 1:
+                pygame.draw.lines(screen, color, False, points)
 
         # Draw time axis marks and labels
         num_markers = 5
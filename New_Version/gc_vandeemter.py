@@ -0,0 +1,99 @@
+# gc_vandeemter.py
+"""
+Carrier-gas and flow explorer for the simulation's van Deemter model.
+
+HETP is evaluated for every carrier gas and analyte over a dense, log-spaced
+grid of carrier velocities in one broadcast array expression, using the same
+coefficients and velocity law as ParticleArrays.move. From the curves it
+reports the optimum carrier velocity (and the head pressure that gives it)
+per gas and per analyte.
+
+Usage: python gc_vandeemter.py [method.toml]
+"""
+
+import argparse
+import numpy as np
+from gc_core import (GCParameters, VAN_DEEMTER_A, VAN_DEEMTER_B, VAN_DEEMTER_C,
+                     VELOCITY_PER_PSI)
+
+VELOCITY_GRID = np.geomspace(1e-3, 1.0, 1024)  # Carrier velocity, pixels per second
+
+
+class VanDeemterTable:
+    """HETP per (gas, type code, carrier velocity) for the current retention factors
+
+    Each particle travels at carrier_velocity / sqrt(rf) with a diffusion
+    coefficient of diffusion_base * diffusivity / rf, as ParticleManager
+    creates them; the table uses each analyte's nominal (injection) RF.
+    """
+
+    def __init__(self, gc_params, registry, settings, gases=None, velocities=VELOCITY_GRID,
+                 retention_factors=None):
+        self.gases = list(gases or gc_params.carrier_gases)
+        self.names = registry.names
+        self.velocities = velocities
+
+        rf = (retention_factors if retention_factors is not None
+              else registry.retention_factors(settings))
+        diffusion_base = np.array([gc_params.calculate_flow_parameters(
+            settings['carrier_pressure'], gas, settings['column_length'])[1]
+            for gas in self.gases])
+        diffusion_coeff = diffusion_base[:, None] * registry.diffusivity / rf  # (gas, code)
+        velocity = velocities / np.sqrt(rf)[:, None]                           # (code, grid)
+        self.hetp = (VAN_DEEMTER_A + VAN_DEEMTER_B * diffusion_coeff[:, :, None] / velocity +
+                     VAN_DEEMTER_C * velocity)
+
+    def curve(self, gas, code):
+        return self.hetp[self.gases.index(gas), code]
+
+    def optimum(self):
+        """Optimal carrier velocity and minimum HETP per (gas, type code)"""
+        best = self.hetp.argmin(axis=2)
+        return self.velocities[best], np.take_along_axis(self.hetp, best[..., None], 2)[..., 0]
+
+    def gas_optimum(self, codes=None):
+        """Per gas, the carrier velocity minimising the mean HETP over codes, and that mean"""
+        hetp = self.hetp if codes is None else self.hetp[:, codes]
+        mean = hetp.mean(axis=1)
+        best = mean.argmin(axis=1)
+        return self.velocities[best], mean[np.arange(len(self.gases)), best]
+
+    @staticmethod
+    def pressure(velocity):
+        """Head pressure (psi) giving a carrier velocity, inverse of calculate_flow_parameters"""
+        return velocity / VELOCITY_PER_PSI
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Optimal carrier velocity per gas and analyte")
+    parser.add_argument('method', nargs='?', default=None, help="Method .json or .toml file")
+    args = parser.parse_args()
+
+    from gc_engine import SimulationEngine  # gc_engine imports this module
+    from gc_method import Method
+    engine = SimulationEngine()
+    if args.method:
+        Method.load(args.method).configure(engine)
+    table = VanDeemterTable(GCParameters(), engine.registry, engine.settings,
+                            retention_factors=engine.retention_factors())
+    codes = [engine.registry.code(name) for name in engine.particle_types]
+    velocity, hetp = table.optimum()
+    gas_velocity, gas_hetp = table.gas_optimum(codes)
+    current = engine.settings['carrier_pressure']
+
+    for g, gas in enumerate(table.gases):
+        marker = " (selected)" if gas == engine.carrier_gas else ""
+        print(f"{gas}{marker}: optimum {gas_velocity[g]:.4f} px/s "
+              f"= {table.pressure(gas_velocity[g]):.2f} psi, mean HETP {gas_hetp[g]:.4f}")
+        for code in codes:
+            print(f"  {table.names[code]:<16} {velocity[g, code]:.4f} px/s "
+                  f"({table.pressure(velocity[g, code]):.2f} psi)  HETP {hetp[g, code]:.4f}")
+    current_hetp = [np.interp(current * VELOCITY_PER_PSI, table.velocities,
+                              table.hetp[g, codes].mean(axis=0)) for g in range(len(table.gases))]
+    print(f"At the current {current:g} psi: " +
+          ", ".join(f"{gas} {h:.4f}" for gas, h in zip(table.gases, current_hetp)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
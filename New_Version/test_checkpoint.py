@@ -0,0 +1,43 @@
+# test_checkpoint.py
+import os
+import numpy as np
+import pytest
+from gc_checkpoint import load_checkpoint, run_checkpointed, save_checkpoint
+from gc_engine import SimulationEngine
+from gc_method import Method
+
+METHOD = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'methods', 'default.toml')
+
+
+def engine(seed=1, count=5000):
+    simulation = Method.load(METHOD).configure(SimulationEngine(seed=seed))
+    simulation.settings['count'] = count
+    return simulation
+
+
+def test_resumed_run_is_bit_identical(tmp_path):
+    expected = engine().run_headless(1.0, 3000)
+
+    interrupted = engine()
+    interrupted.physics_only = True
+    interrupted.inject_particles()
+    for _ in range(400):
+        interrupted.update(1.0)
+    path = str(tmp_path / 'run.ckpt.npz')
+    save_checkpoint(interrupted, path)
+
+    resumed = engine(seed=99)  # Every random state must come from the checkpoint
+    load_checkpoint(resumed, path)
+    while resumed.simulation_time < 3000 and not resumed.is_complete():
+        resumed.update(1.0)
+    result = resumed.result()
+    np.testing.assert_array_equal(result.event_times, expected.event_times)
+    np.testing.assert_array_equal(result.event_types, expected.event_types)
+    assert result.chromatogram == expected.chromatogram
+
+
+def test_checkpoint_of_another_run_is_refused(tmp_path):
+    path = str(tmp_path / 'run.ckpt.npz')
+    run_checkpointed(engine(), path, 1.0, 3000)
+    with pytest.raises(ValueError):
+        run_checkpointed(engine(count=6000), path, 1.0, 3000)
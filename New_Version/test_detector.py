@@ -0,0 +1,18 @@
+# test_detector.py
+import numpy as np
+from gc_analytes import default_registry
+from gc_detector import FID
+
+
+def test_smoothing_matches_the_recursive_filter_across_chunks():
+    signal = np.random.default_rng(0).normal(5, 3, (3000, 1))
+    fid = FID(default_registry(), rate=20.0, time_constant=2.0)
+    smoothed = np.concatenate([fid.smooth(signal[:1234]), fid.smooth(signal[1234:])])
+
+    decay = np.exp(-1 / (20.0 * 2.0))
+    state = signal[0]
+    expected = np.empty_like(signal)
+    for i, sample in enumerate(signal):
+        state = decay * state + (1 - decay) * sample
+        expected[i] = state
+    np.testing.assert_allclose(smoothed, expected, rtol=1e-12)
@@ -0,0 +1,39 @@
+# test_engine.py
+import os
+import numpy as np
+from gc_engine import SimulationEngine
+from gc_method import Method
+from gc_preview import AnalyticPreview
+
+METHOD = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'methods', 'default.toml')
+
+
+def solvent_times(column_length):
+    """(headless median, preview apex) solvent retention on the default method"""
+    method = Method.load(METHOD)
+    engine = method.configure(SimulationEngine(seed=1))
+    engine.settings['column_length'] = column_length
+    engine.settings['count'] = 5000
+    result = engine.run_headless(1.0, 3000)
+    times, types = np.asarray(result.event_times), np.asarray(result.event_types)
+    headless = np.median(times[types == engine.registry.code('solvent')])
+
+    preview = AnalyticPreview()
+    method.configure(preview.engine)
+    preview.engine.settings['column_length'] = column_length
+    names, apex, _ = preview.retention()
+    return headless, apex[list(names).index('solvent')]
+
+
+def test_headless_retention_scales_with_column_length():
+    for length in (0.3, 1.0, 1.25):
+        headless, expected = solvent_times(length)
+        assert abs(headless - expected) < 0.02 * expected
+
+
+def test_headless_runs_repeat_on_one_engine():
+    engine = Method.load(METHOD).configure(SimulationEngine(seed=1))
+    engine.settings['count'] = 5000
+    first = np.mean(engine.run_headless(1.0, 3000).event_times)
+    second = np.mean(engine.run_headless(1.0, 3000).event_times)
+    assert abs(second - first) < 0.02 * first
@@ -0,0 +1,49 @@
+# test_export.py
+import base64
+import os
+import xml.etree.ElementTree as ET
+import numpy as np
+from gc_engine import SimulationEngine
+from gc_export import convert_result, export_run
+from gc_method import Method
+from gc_sequence import Sample, SequenceRunner
+
+METHOD = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'methods', 'default.toml')
+NS = '{http://psi.hupo.org/ms/mzml}'
+
+
+def continuum_engine():
+    method = Method.load(METHOD)
+    method.solver = 'continuum'
+    return method, method.configure(SimulationEngine(seed=1))
+
+
+def fid_trace(path):
+    """(times, intensities) of the FID chromatogram in an mzML file"""
+    for chromatogram in ET.parse(path).getroot().iter(NS + 'chromatogram'):
+        if chromatogram.get('id') == 'FID':
+            times, values = [np.frombuffer(base64.b64decode(array.find(NS + 'binary').text),
+                                           dtype=dtype)
+                             for array, dtype in zip(chromatogram.iter(NS + 'binaryDataArray'),
+                                                     ('<f8', '<f4'))]
+            return times, values
+    raise AssertionError("No FID chromatogram")
+
+
+def test_converted_result_matches_live_export(tmp_path):
+    method, engine = continuum_engine()
+    live = export_run(engine, str(tmp_path / 'live'), dt=1.0, max_time=3000)
+    assert all(open(path, 'rb').read(4) == b'CDF\x02' for path in live if path.endswith('.cdf'))
+
+    _, engine = continuum_engine()
+    result = engine.run_headless(1.0, 3000)
+    runner = SequenceRunner([], str(tmp_path))
+    path = runner.write_result(Sample('stored', METHOD, 1), method.to_dict(), result)
+    convert_result(path, str(tmp_path))
+
+    live_times, live_fid = fid_trace(tmp_path / 'live.mzML')
+    times, fid = fid_trace(tmp_path / 'stored.mzML')
+    np.testing.assert_array_equal(times, live_times[:len(times)])
+    np.testing.assert_allclose(fid, live_fid[:len(fid)], rtol=1e-4, atol=1e-6)
+    # The FID area is the weighted on-column amount, not a count of events
+    assert abs(fid.sum() / 20.0 - np.sum(result.event_weights)) < 0.01 * np.sum(result.event_weights)
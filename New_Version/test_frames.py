@@ -0,0 +1,49 @@
+# test_frames.py
+import os
+import subprocess
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')  # Must be set before pygame.init
+
+from GC_SIM import GCMSSimulation
+from gc_method import Method
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+METHOD = os.path.join(HERE, 'methods', 'default.toml')
+
+
+def test_method_renders_headless(tmp_path):
+    out = tmp_path / 'frames'
+    env = dict(os.environ, SDL_VIDEODRIVER='dummy', PYTHONPATH=HERE)
+    subprocess.run([sys.executable, os.path.join(HERE, 'gc_frames.py'), '--method', METHOD,
+                    '--frames', '3', '--out', str(out)], check=True, env=env,
+                   capture_output=True)
+    assert len(os.listdir(out)) == 3
+
+
+def test_sync_controls_follows_method_analytes():
+    data = Method.load(METHOD).to_dict()
+    data['analytes'] = [{'name': 'solvent', 'rf': 0.2}, {'name': 'polar1', 'rf': 3.0}]
+    simulation = GCMSSimulation()
+    try:
+        Method.from_dict(data).configure(simulation)
+        simulation.sync_controls()
+        assert simulation.rf_names == ['solvent', 'polar1']
+        assert 'verypolar' not in simulation.sliders
+        assert simulation.sliders['polar1'].value == 3.0
+    finally:
+        simulation.preview_worker.stop()
+
+
+def test_method_rfs_override_earlier_slider_positions():
+    simulation = GCMSSimulation()
+    try:
+        simulation.sliders['solvent'].value = 0.3
+        simulation.read_settings()
+        method = Method.load(METHOD)
+        method.configure(simulation)
+        assert 'solvent' not in simulation.settings
+        rf = simulation.registry.retention_factors(simulation.settings)
+        assert rf[simulation.registry.code('solvent')] == 0.1
+    finally:
+        simulation.preview_worker.stop()
@@ -6,35 +6,7 @@ class ParametersInterface(ABC):
         pass
 
     @abstractmethod
-    def get_solvent_rf(self):
-        pass
-
-    @abstractmethod
-    def get_nonpolar1_rf(self):
-        pass
-
-    @abstractmethod
-    def get_nonpolar2_rf(self):
-        pass
-
-    @abstractmethod
-    def get_semipolar1_rf(self):
-        pass
-
-    @abstractmethod
-    def get_semipolar2_rf(self):
-        pass
-
-    @abstractmethod
-    def get_polar1_rf(self):
-        pass
-
-    @abstractmethod
-    def get_polar2_rf(self):
-        pass
-
-    @abstractmethod
-    def get_verypolar_rf(self):
+    def get_retention_factor(self, analyte):
         pass
 
     @abstractmethod